@@ -0,0 +1,82 @@
+"""
+Database settings helpers: DATABASE_URL parsing and the named profiles
+selected with the DB_PROFILE environment variable.
+
+DATABASE_URL connections are persistent (CONN_MAX_AGE, default 600 s) with
+health checks. With DATABASE_POOL=True a PostgreSQL URL uses Django's
+connection pool instead, which needs psycopg 3 (``psycopg[pool]``) rather
+than psycopg2; pool sizes come from DATABASE_POOL_MIN_SIZE/MAX_SIZE.
+
+sqlite-prod: SQLite tuned for several gunicorn workers writing to one file.
+  - WAL journal: readers never block the writer and vice versa.
+  - synchronous=NORMAL: safe with WAL, fsyncs only at checkpoints.
+  - mmap_size / cache_size: serve hot pages from memory.
+  - busy_timeout: a writer waits for the lock instead of failing at once.
+  - BEGIN IMMEDIATE for every atomic block: the write lock is taken up
+    front, so two transactions never both read and then deadlock upgrading
+    to a write ("database is locked").
+  - Persistent connections (CONN_MAX_AGE) with health checks, so the PRAGMAs
+    run once per connection rather than once per request.
+"""
+import os
+
+import dj_database_url
+
+SQLITE_PROD_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64000,  # KiB
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,  # ms
+    "foreign_keys": "ON",
+}
+
+
+def from_url(url):
+    """A DATABASES entry for ``url``."""
+    database = dj_database_url.parse(
+        url,
+        conn_max_age=int(os.environ.get("CONN_MAX_AGE", 600)),
+        conn_health_checks=True,
+    )
+    if os.environ.get("DATABASE_POOL") == "True" and database["ENGINE"] == "django.db.backends.postgresql":
+        database["CONN_MAX_AGE"] = 0  # the pool replaces persistent connections
+        database.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": int(os.environ.get("DATABASE_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.environ.get("DATABASE_POOL_MAX_SIZE", 10)),
+        }
+    return database
+
+
+def sqlite_prod(database):
+    """Return ``database`` (a DATABASES entry) with the sqlite-prod settings applied."""
+    if database["ENGINE"] != "django.db.backends.sqlite3":
+        raise ValueError(f"DB_PROFILE sqlite-prod does not apply to {database['ENGINE']}")
+    timeout = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", SQLITE_PROD_PRAGMAS["busy_timeout"]))
+    pragmas = dict(SQLITE_PROD_PRAGMAS, busy_timeout=timeout)
+    options = dict(database.get("OPTIONS", {}))
+    options.update({
+        "init_command": "".join(f"PRAGMA {name}={value};" for name, value in pragmas.items()),
+        "transaction_mode": "IMMEDIATE",
+        "timeout": timeout / 1000,
+    })
+    return {
+        **database,
+        "CONN_MAX_AGE": int(os.environ.get("CONN_MAX_AGE", 600)),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": options,
+    }
+
+
+PROFILES = {
+    "default": lambda database: database,
+    "sqlite-prod": sqlite_prod,
+}
+
+
+def apply_profile(database, name):
+    try:
+        return PROFILES[name](database)
+    except KeyError:
+        raise ValueError(f"Unknown DB_PROFILE {name!r}; expected one of {', '.join(PROFILES)}")
@@ -0,0 +1,19 @@
+"""
+Gunicorn settings, read from the environment.
+
+WSGI (default):  gunicorn -c backend/gunicorn.conf.py backend.wsgi:application
+ASGI:            GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \
+                 gunicorn -c backend/gunicorn.conf.py backend.asgi:application
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 0))
+accesslog = os.environ.get("GUNICORN_ACCESSLOG")
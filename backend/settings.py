@@ -2,6 +2,8 @@ from datetime import timedelta
 from pathlib import Path
 import os
 
+from backend.db_profiles import apply_profile, from_url
+
 # ---------------------------
 # Base directory
 # ---------------------------
@@ -29,6 +31,7 @@ INSTALLED_APPS = [
     # Third-party
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'django_filters',
 
@@ -49,8 +52,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.instrumentation.QueryStatsMiddleware',  # inactive unless QUERY_STATS_ENABLED
+    'core.routers.PinAfterWriteMiddleware',  # read-your-writes with DATABASE_REPLICAS
 ]
 
+# Per-endpoint latency/query histograms (api/stats/) and slow request logging
+QUERY_STATS_ENABLED = os.environ.get("QUERY_STATS_ENABLED", "False") == "True"
+QUERY_STATS_SLOW_MS = int(os.environ.get("QUERY_STATS_SLOW_MS", 500))
+QUERY_STATS_MAX_QUERIES = int(os.environ.get("QUERY_STATS_MAX_QUERIES", 30))
+
 # ---------------------------
 # URL and templates
 # ---------------------------
@@ -74,14 +84,63 @@ TEMPLATES = [
 WSGI_APPLICATION = 'backend.wsgi.application'
 
 # ---------------------------
-# Database (SQLite for dev, can switch to Postgres in prod)
+# Database (SQLite for dev, DATABASE_URL for Postgres in prod)
 # ---------------------------
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+if os.environ.get("DATABASE_URL"):
+    DATABASES = {'default': from_url(os.environ["DATABASE_URL"])}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
     }
+
+# Read replicas (comma-separated URLs) serve the catalog list endpoints;
+# everything else, and a user's reads right after their own writes, use
+# the primary (see core/routers.py)
+DATABASE_REPLICAS = []
+for i, url in enumerate(filter(None, os.environ.get("DATABASE_REPLICA_URLS", "").split(",")), start=1):
+    DATABASES[f'replica{i}'] = {**from_url(url.strip()), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{i}')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Upper bound on replication lag: how long a writer reads from the primary, and
+# how long after a catalog change cached responses are filled from the primary
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 10))
+
+# DB_PROFILE=sqlite-prod: WAL, BEGIN IMMEDIATE, busy timeout and persistent
+# connections for multi-worker deployments (see backend/db_profiles.py)
+DB_PROFILE = os.environ.get("DB_PROFILE", "default")
+DATABASES = {alias: apply_profile(database, DB_PROFILE) for alias, database in DATABASES.items()}
+
+# ---------------------------
+# Cache (catalog responses, category tree, revoked tokens)
+# ---------------------------
+# Local memory by default; point CACHE_BACKEND/LOCATION and
+# CATALOG_CACHE_BACKEND/LOCATION at a shared backend (e.g.
+# django.core.cache.backends.redis.RedisCache) so every worker sees the same
+# catalog version and token revocations.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get("CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get("CACHE_LOCATION", ''),
+    },
+    'catalog': {
+        'BACKEND': os.environ.get("CATALOG_CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get("CATALOG_CACHE_LOCATION", 'catalog'),
+        'TIMEOUT': 300,
+    },
 }
+CATALOG_CACHE_ALIAS = 'catalog'
+# False serves every catalog GET from the database (benchmarks' --cold runs)
+CATALOG_RESPONSE_CACHE = os.environ.get("CATALOG_RESPONSE_CACHE", "True") == "True"
+
+# ---------------------------
+# Stock reservations
+# ---------------------------
+# How long api/cart/reserve/ holds stock; run `manage.py expire_reservations
+# --loop` (or cron it every minute) to give expired holds back
+STOCK_RESERVATION_TTL = int(os.environ.get("STOCK_RESERVATION_TTL", 900))
 
 # ---------------------------
 # Password validators
@@ -111,13 +170,23 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# core.media.serve_media: set MEDIA_ACCEL_REDIRECT to an internal nginx
+# location aliased to MEDIA_ROOT to hand file bodies off to nginx.
+SERVE_MEDIA = os.environ.get("SERVE_MEDIA", "True") == "True"
+MEDIA_ACCEL_REDIRECT = os.environ.get("MEDIA_ACCEL_REDIRECT") or None
+MEDIA_MAX_AGE = int(os.environ.get("MEDIA_MAX_AGE", 3600))
 
 # ---------------------------
 # REST Framework + JWT
 # ---------------------------
+# Stateless mode builds request.user from the token claims instead of
+# loading the User row on every request (see core.authentication).
+JWT_STATELESS_AUTH = os.environ.get("JWT_STATELESS_AUTH", "False") == "True"
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.StatelessJWTAuthentication' if JWT_STATELESS_AUTH
+        else 'core.authentication.JWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -126,14 +195,25 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Serialize read-heavy list endpoints through precompiled field plans
+# (core.fast_serializers); output is identical to the DRF serializers.
+FAST_SERIALIZATION = os.environ.get("FAST_SERIALIZATION", "False") == "True"
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=7),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_OBTAIN_SERIALIZER": "core.authentication.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "core.authentication.RevocationCheckingTokenRefreshSerializer",
+    "TOKEN_USER_CLASS": "core.authentication.CachedTokenUser",
 }
 
+# Revoked tokens, per-user token cutoffs and cached users; must be shared between workers
+AUTH_CACHE_ALIAS = 'default'
+AUTH_USER_CACHE_TIMEOUT = 60
+
 # ---------------------------
 # CORS (React frontend)
 # ---------------------------
@@ -157,3 +237,17 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 # Default auto field
 # ---------------------------
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# ---------------------------
+# Logging
+# ---------------------------
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "core": {"handlers": ["console"], "level": os.environ.get("CORE_LOG_LEVEL", "WARNING")},
+    },
+}
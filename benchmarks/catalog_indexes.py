@@ -0,0 +1,139 @@
+"""
+Before/after latency of typical catalog filter URLs for the Product indexes
+added in core/migrations/0006_product_catalog_indexes.py.
+
+    python -m benchmarks.catalog_indexes --products 1000000
+
+Migrates a scratch SQLite database, drops the Product indexes, seeds it,
+times each URL through the Django test client with the catalog response
+cache off, recreates the indexes, runs ANALYZE and times the same URLs again.
+"""
+import argparse
+import json
+import random
+from datetime import timedelta
+
+from .common import migrate, setup_django, summarize, timed
+
+URLS = [
+    "/api/products/",
+    "/api/products/?ordering=price",
+    "/api/products/?ordering=-rating",
+    "/api/products/?category=3",
+    "/api/products/?category=3&ordering=price",
+    "/api/products/?category=3&ordering=effective_price",
+    "/api/products/?size=M&color=Red",
+    "/api/products/?color=Blue&ordering=-created_at",
+    "/api/products/?price__gte=20&price__lte=40&ordering=price",
+    "/api/products/?pagination=cursor&ordering=-created_at",
+    "/api/products/?pagination=cursor&ordering=discount_price",
+    "/api/products/?pagination=cursor&ordering=effective_price",
+]
+
+
+def seed(products, categories, batch_size=20000):
+    from django.db import connection, transaction
+    from django.utils import timezone
+
+    from core.models import Category, Product
+
+    rng = random.Random(42)
+    sizes = [s for s, _ in Product.SIZE_CHOICES]
+    colors = [c for c, _ in Product.COLOR_CHOICES]
+    category_ids = [Category.objects.create(name=f"Category {i}").pk for i in range(categories)]
+    now = timezone.now()
+
+    # Raw INSERTs over every stored column, so created_at keeps its spread
+    # (auto_now_add would overwrite it) and model defaults fill the rest
+    fields = [
+        f for f in Product._meta.concrete_fields
+        if not f.primary_key and not getattr(f, "generated", False)
+    ]
+    columns = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+    sql = f"INSERT INTO {Product._meta.db_table} ({columns}) VALUES ({', '.join(['%s'] * len(fields))})"
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, products, batch_size):
+            rows = []
+            for i in range(start, min(products, start + batch_size)):
+                price = round(rng.uniform(5, 200), 2)
+                created = now - timedelta(seconds=rng.randint(0, 365 * 86400))
+                product = Product(
+                    name=f"Product {i}", description="Benchmark product", price=price,
+                    discount_price=round(price * 0.8, 2) if rng.random() < 0.3 else None,
+                    rating=round(rng.uniform(0, 5), 2), stock=rng.randint(0, 500),
+                    category_id=rng.choice(category_ids), size=rng.choice(sizes), color=rng.choice(colors),
+                    image="products/bench.png", created_at=created, updated_at=created,
+                    is_available=rng.random() < 0.95,
+                )
+                rows.append([f.get_db_prep_save(getattr(product, f.attname), connection) for f in fields])
+            cursor.executemany(sql, rows)
+
+
+def set_indexes(enabled):
+    """Add or drop the Product indexes (the 0006 migration's) on the live schema."""
+    from django.db import connection
+
+    from core.models import Product
+
+    with connection.schema_editor() as editor:
+        for index in Product._meta.indexes:
+            if enabled:
+                editor.add_index(Product, index)
+            else:
+                editor.remove_index(Product, index)
+
+
+def measure(client, repeat):
+    results = {}
+    for url in URLS:
+        client.get(url)  # warm connection and statement caches
+        results[url] = summarize(timed(lambda: client.get(url), repeat))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--db", help="Scratch SQLite path (default: a temp file)")
+    args = parser.parse_args()
+
+    db_path = setup_django(args.db)
+    from django.conf import settings
+    from django.db import connection
+    from django.test import Client
+
+    # Time the queries, not the catalog response cache
+    settings.CATALOG_RESPONSE_CACHE = False
+
+    migrate()
+    set_indexes(False)
+    seed(args.products, args.categories)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+    client = Client()
+    before = measure(client, args.repeat)
+    set_indexes(True)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    after = measure(client, args.repeat)
+
+    report = {
+        "database": str(db_path),
+        "products": args.products,
+        "urls": {
+            url: {
+                "before": before[url],
+                "after": after[url],
+                "speedup": round(before[url]["median_ms"] / max(after[url]["median_ms"], 1e-6), 2),
+            }
+            for url in URLS
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Shared helpers for the benchmark scripts. Every benchmark runs against its own
+scratch SQLite file so the development database is never touched.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(db_path=None, **db_overrides):
+    """Point the default database at ``db_path`` (a temp file by default) and set up Django."""
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "bench.sqlite3")
+
+    import django
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = str(db_path)
+    settings.DATABASES["default"].update(db_overrides)
+    settings.ALLOWED_HOSTS = ["*"]
+    django.setup()
+    return db_path
+
+
+def migrate(target=None):
+    from django.core.management import call_command
+
+    if target:
+        call_command("migrate", "core", target, verbosity=0)
+    else:
+        call_command("migrate", verbosity=0)
+
+
+def timed(fn, repeat):
+    """Run ``fn`` ``repeat`` times and return the samples in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "max_ms": round(max(samples), 3),
+    }
@@ -0,0 +1,159 @@
+"""
+Deterministic test data for the benchmark suite: a category tree, products
+with searchable names, users, carts and orders with lines.
+
+    python -m benchmarks.datagen --scale medium --db /tmp/shop.sqlite3
+
+``--scale`` picks the counts below; any of them can be overridden. The same
+``--seed`` always produces the same rows, so two suite runs against freshly
+generated databases are comparable.
+"""
+import argparse
+import io
+import json
+import random
+import time
+from decimal import Decimal
+
+from .common import migrate, setup_django
+
+SCALES = {
+    "small": {"categories": 20, "products": 2_000, "users": 50, "cart_items": 3, "orders": 2},
+    "medium": {"categories": 60, "products": 20_000, "users": 500, "cart_items": 4, "orders": 4},
+    "large": {"categories": 200, "products": 200_000, "users": 5_000, "cart_items": 5, "orders": 6},
+}
+
+# Product names are "<adjective> <material> <noun>", so searches have hits of varying size
+ADJECTIVES = ["classic", "slim", "vintage", "sport", "summer", "winter", "relaxed", "premium", "basic", "urban"]
+MATERIALS = ["cotton", "linen", "denim", "wool", "leather", "silk", "canvas", "fleece"]
+NOUNS = ["shirt", "jacket", "dress", "sneaker", "boot", "scarf", "hoodie", "skirt", "short", "cap", "bag", "belt"]
+SEARCH_TERMS = ADJECTIVES + MATERIALS + NOUNS + ["cotton shirt", "leather boot", "vintage denim jacket"]
+
+PASSWORD = "bench-password"
+# The checkout scenario's hot product: always available, little stock
+HOT_SKU = "BENCH-0000000"
+HOT_STOCK = 25
+
+
+def scale_counts(scale, **overrides):
+    counts = dict(SCALES[scale])
+    counts.update({k: v for k, v in overrides.items() if v is not None})
+    return counts
+
+
+def generate(categories, products, users, cart_items, orders, seed=42, batch_size=5000):
+    """Fill the (migrated, empty) database and return the row counts."""
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import transaction
+
+    from core.models import CartItem, Category, Order, OrderLine, Product
+    from core.search import get_search_backend
+
+    rng = random.Random(seed)
+    sizes = [s for s, _ in Product.SIZE_CHOICES]
+    colors = [c for c, _ in Product.COLOR_CHOICES]
+
+    with transaction.atomic():
+        # A tree up to three levels deep: the first tenth are roots
+        category_ids = []
+        for i in range(categories):
+            parent = rng.choice(category_ids) if i >= max(1, categories // 10) else None
+            category_ids.append(Category.objects.create(name=f"Category {i}", parent_id=parent).pk)
+
+        for start in range(0, products, batch_size):
+            batch = []
+            for i in range(start, min(products, start + batch_size)):
+                price = Decimal(rng.randint(500, 25000)) / 100
+                batch.append(Product(
+                    sku=f"BENCH-{i:07d}",
+                    name=f"{rng.choice(ADJECTIVES)} {rng.choice(MATERIALS)} {rng.choice(NOUNS)}".title(),
+                    description=f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} for every day",
+                    price=price,
+                    discount_price=(price * Decimal("0.8")).quantize(Decimal("0.01")) if rng.random() < 0.3 else None,
+                    rating=Decimal(rng.randint(0, 500)) / 100,
+                    stock=HOT_STOCK if i == 0 else rng.randint(20, 500),
+                    category_id=rng.choice(category_ids),
+                    size=rng.choice(sizes),
+                    color=rng.choice(colors),
+                    image="products/bench.png",
+                    is_available=i == 0 or rng.random() < 0.95,
+                ))
+            Product.objects.bulk_create(batch)
+        product_ids = list(Product.objects.filter(is_available=True).values_list("pk", flat=True))
+        prices = dict(Product.objects.values_list("pk", "price"))
+
+        password = make_password(PASSWORD)  # hash once, not once per user
+        User.objects.bulk_create(
+            User(username=f"bench{i}", email=f"bench{i}@example.com", password=password) for i in range(users)
+        )
+        user_ids = list(User.objects.filter(username__startswith="bench").values_list("pk", flat=True))
+
+        CartItem.objects.bulk_create(
+            CartItem(user_id=user_id, product_id=product_id, quantity=rng.randint(1, 3))
+            for user_id in user_ids
+            for product_id in rng.sample(product_ids, min(cart_items, len(product_ids)))
+        )
+
+        statuses = [s for s, _ in Order.STATUS_CHOICES]
+        for start in range(0, len(user_ids), 500):
+            order_rows, line_rows = [], []
+            for user_id in user_ids[start:start + 500]:
+                for _ in range(orders):
+                    lines = [(pk, rng.randint(1, 2)) for pk in rng.sample(product_ids, min(3, len(product_ids)))]
+                    order_rows.append((Order(
+                        user_id=user_id, status=rng.choice(statuses), shipping_address="1 Bench St",
+                        total_amount=sum(prices[pk] * qty for pk, qty in lines),
+                    ), lines))
+            Order.objects.bulk_create([order for order, _ in order_rows])
+            for order, lines in order_rows:
+                line_rows += [
+                    OrderLine(order=order, product_id=pk, product_name=f"Product {pk}", unit_price=prices[pk],
+                              quantity=qty, line_total=prices[pk] * qty)
+                    for pk, qty in lines
+                ]
+            OrderLine.objects.bulk_create(line_rows)
+
+    if get_search_backend() is not None:
+        call_command("rebuild_search_index", stdout=io.StringIO())
+    return {
+        "categories": Category.objects.count(),
+        "products": Product.objects.count(),
+        "users": len(user_ids),
+        "cart_items": CartItem.objects.count(),
+        "orders": Order.objects.count(),
+    }
+
+
+def build(db_path=None, scale="small", seed=42, **overrides):
+    """Set up Django on ``db_path``, migrate and generate; returns ``(db_path, counts)``."""
+    db_path = setup_django(db_path)
+    migrate()
+    return db_path, generate(seed=seed, **scale_counts(scale, **overrides))
+
+
+def add_arguments(parser):
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    for name in SCALES["small"]:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, help=f"Override the scale's {name}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="SQLite path to create (default: a temp file)")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    db_path, counts = build(
+        args.db, args.scale, args.seed, **{name: getattr(args, name) for name in SCALES["small"]}
+    )
+    print(json.dumps({
+        "database": str(db_path), "rows": counts, "seconds": round(time.perf_counter() - started, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
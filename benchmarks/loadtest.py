@@ -0,0 +1,227 @@
+"""
+Requests/sec and latency of the WSGI deployment (sync workers, sync views)
+against the ASGI one (uvicorn workers, /api/async/ views) at high concurrency.
+
+    python -m benchmarks.loadtest --concurrency 200 --duration 20 --workers 4
+
+Seeds a scratch SQLite database, starts gunicorn once per deployment with
+backend/gunicorn.conf.py, and drives it with an asyncio HTTP/1.1 client that
+keeps ``--concurrency`` connections busy for ``--duration`` seconds per URL.
+The servers load the app through the ``wsgi()`` / ``asgi()`` factories below
+so they use the same scratch database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from .common import BASE_DIR, migrate, percentile, setup_django
+
+DB_ENV = "BENCH_DB_PATH"
+
+DEPLOYMENTS = {
+    "wsgi": {
+        "app": "benchmarks.loadtest:wsgi()",
+        "worker_class": "sync",
+        "prefix": "/api/",
+    },
+    "asgi": {
+        "app": "benchmarks.loadtest:asgi()",
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "prefix": "/api/async/",
+    },
+}
+
+PATHS = [
+    ("products/", False),
+    ("products/?ordering=price&page=3", False),
+    ("categories/", False),
+    ("cart/view/", True),
+    ("order/track/", True),
+]
+
+
+# ---------------------------
+# Server side
+# ---------------------------
+def wsgi():
+    setup_django(os.environ[DB_ENV])
+    from django.core.wsgi import get_wsgi_application
+    return get_wsgi_application()
+
+
+def asgi():
+    setup_django(os.environ[DB_ENV])
+    from django.core.asgi import get_asgi_application
+    return get_asgi_application()
+
+
+def seed(products, categories, users):
+    from decimal import Decimal
+
+    from django.contrib.auth.models import User
+    from django.db import transaction
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from core.models import CartItem, Category, Order, OrderLine, Product
+
+    rng = random.Random(7)
+    with transaction.atomic():
+        category_ids = [Category.objects.create(name=f"Category {i}").pk for i in range(categories)]
+        Product.objects.bulk_create(
+            Product(
+                name=f"Product {i}", description="Load test product",
+                price=Decimal(rng.randint(500, 20000)) / 100, stock=1000,
+                category_id=rng.choice(category_ids),
+                size=rng.choice(Product.SIZE_CHOICES)[0], color=rng.choice(Product.COLOR_CHOICES)[0],
+            )
+            for i in range(products)
+        )
+        product_ids = list(Product.objects.values_list("id", flat=True))
+        tokens = []
+        for i in range(users):
+            user = User.objects.create_user(f"load{i}", password="load-test")
+            CartItem.objects.bulk_create(
+                CartItem(user=user, product_id=pk, quantity=rng.randint(1, 3))
+                for pk in rng.sample(product_ids, 5)
+            )
+            for _ in range(3):
+                order = Order.objects.create(user=user, total_amount=Decimal("30.00"), shipping_address="1 Load St")
+                OrderLine.objects.bulk_create(
+                    OrderLine(order=order, product_id=pk, product_name=f"Product {pk}",
+                              unit_price=Decimal("10.00"), quantity=1, line_total=Decimal("10.00"))
+                    for pk in rng.sample(product_ids, 3)
+                )
+            tokens.append(str(AccessToken.for_user(user)))
+    return tokens
+
+
+def start_server(deployment, port, workers, db_path):
+    env = dict(
+        os.environ,
+        **{DB_ENV: str(db_path)},
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_WORKERS=str(workers),
+        GUNICORN_WORKER_CLASS=deployment["worker_class"],
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", str(BASE_DIR / "backend" / "gunicorn.conf.py"), deployment["app"]],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_up(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+# ---------------------------
+# Client side
+# ---------------------------
+async def fetch(connection, host, port, path, headers):
+    """One GET over ``connection`` (reopened if the server closed it); returns ``(status, connection)``."""
+    if connection is None:
+        connection = await asyncio.open_connection(host, port)
+    reader, writer = connection
+    extra = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n{extra}\r\n".encode())
+    await writer.drain()
+
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    fields = {k.strip().lower(): v.strip() for k, _, v in (line.partition(":") for line in lines[1:] if line)}
+    if "content-length" in fields:
+        await reader.readexactly(int(fields["content-length"]))
+    else:
+        await reader.read()
+        fields["connection"] = "close"
+    if fields.get("connection", "").lower() == "close":
+        writer.close()
+        connection = None
+    return status, connection
+
+
+async def run_load(url, concurrency, duration, headers):
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    samples, errors = [], 0
+    deadline = time.monotonic() + duration
+
+    async def client():
+        nonlocal errors
+        connection = None
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                status, connection = await fetch(connection, parts.hostname, parts.port, path, headers)
+            except (OSError, asyncio.IncompleteReadError):
+                errors += 1
+                connection = None
+                continue
+            if status != 200:
+                errors += 1
+            samples.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(percentile(samples, 50), 2) if samples else None,
+        "p99_ms": round(percentile(samples, 99), 2) if samples else None,
+    }
+
+
+async def benchmark(args, db_path, tokens):
+    results = {}
+    for offset, (name, deployment) in enumerate(DEPLOYMENTS.items()):
+        port = args.port + offset
+        server = start_server(deployment, port, args.workers, db_path)
+        try:
+            await wait_until_up("127.0.0.1", port)
+            results[name] = {}
+            for i, (path, authenticated) in enumerate(PATHS):
+                headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"} if authenticated else {}
+                url = f"http://127.0.0.1:{port}{deployment['prefix']}{path}"
+                results[name][path] = await run_load(url, args.concurrency, args.duration, headers)
+        finally:
+            server.terminate()
+            server.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    db_path = setup_django()
+    migrate()
+    tokens = seed(args.products, args.categories, args.users)
+    results = asyncio.run(benchmark(args, db_path, tokens))
+    print(json.dumps({"args": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
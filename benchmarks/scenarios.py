@@ -0,0 +1,104 @@
+"""
+Request mixes for benchmarks.suite. Each scenario is an endless generator of
+Request tuples drawn from a seeded RNG, so a run is reproducible; the
+endpoint names are the URL names in core/urls.py.
+
+- browse: anonymous catalog traffic (pages, filters, search, facets,
+  keyset pages, the category tree).
+- cart_churn: signed-in users adding, changing, removing and viewing cart lines.
+- checkout: bursts of fill cart -> reserve -> place order, a share of them
+  on one hot product, so stock runs out and conflicts (409) show up.
+"""
+from collections import namedtuple
+from urllib.parse import urlencode
+
+from .datagen import HOT_SKU, SEARCH_TERMS
+
+Request = namedtuple("Request", "endpoint method path data user")
+
+
+class Catalog:
+    """Ids the scenarios pick from, read once from the generated database."""
+
+    def __init__(self):
+        from django.contrib.auth.models import User
+
+        from core.models import Category, Product
+
+        self.category_ids = list(Category.objects.values_list("pk", flat=True))
+        self.product_ids = list(Product.objects.filter(is_available=True).values_list("pk", flat=True))
+        self.user_ids = list(User.objects.filter(username__startswith="bench").values_list("pk", flat=True))
+        if not (self.category_ids and self.product_ids and self.user_ids):
+            raise RuntimeError("Empty benchmark database; generate one with benchmarks.datagen")
+        self.hot_product_id = Product.objects.get(sku=HOT_SKU).pk
+
+
+def products(**params):
+    return f"/api/products/?{urlencode(params)}" if params else "/api/products/"
+
+
+def browse(catalog, rng):
+    while True:
+        roll = rng.random()
+        if roll < 0.25:
+            yield Request("product-list", "GET", products(page=rng.randint(1, 20)), None, None)
+        elif roll < 0.40:
+            params = {"category_tree": rng.choice(catalog.category_ids)}
+            if rng.random() < 0.5:
+                params["ordering"] = rng.choice(["effective_price", "-effective_price", "-rating"])
+            yield Request("product-list", "GET", products(**params), None, None)
+        elif roll < 0.50:
+            yield Request("product-list", "GET", products(size=rng.choice("SML"), color="Red"), None, None)
+        elif roll < 0.60:
+            low = rng.randint(5, 150)
+            yield Request("product-list", "GET",
+                          products(price__gte=low, price__lte=low + 30, ordering="price"), None, None)
+        elif roll < 0.75:
+            yield Request("product-list", "GET", products(search=rng.choice(SEARCH_TERMS)), None, None)
+        elif roll < 0.85:
+            yield Request("product-list", "GET",
+                          products(facets="true", category_tree=rng.choice(catalog.category_ids)), None, None)
+        elif roll < 0.93:
+            yield Request("product-list", "GET", products(pagination="cursor", ordering="-created_at"), None, None)
+        else:
+            yield Request("category-list", "GET", "/api/categories/?tree=true", None, None)
+
+
+def cart_churn(catalog, rng):
+    while True:
+        user = rng.choice(catalog.user_ids)
+        roll = rng.random()
+        if roll < 0.4:
+            data = {"product_id": rng.choice(catalog.product_ids), "quantity": rng.randint(1, 2)}
+            yield Request("add-to-cart", "POST", "/api/cart/add/", data, user)
+        elif roll < 0.7:
+            operations = [
+                {"action": rng.choice(["add", "update", "remove"]), "product_id": pk, "quantity": rng.randint(1, 3)}
+                for pk in rng.sample(catalog.product_ids, min(3, len(catalog.product_ids)))
+            ]
+            yield Request("bulk-update-cart", "POST", "/api/cart/bulk/", {"operations": operations}, user)
+        else:
+            yield Request("view-cart", "GET", "/api/cart/view/", None, user)
+
+
+def checkout(catalog, rng, hot_share=0.3):
+    users = list(catalog.user_ids)
+    while True:
+        rng.shuffle(users)
+        for user in users:
+            picks = rng.sample(catalog.product_ids, min(2, len(catalog.product_ids)))
+            if rng.random() < hot_share:
+                picks[0] = catalog.hot_product_id
+            # Drop a hot line left over from a failed checkout, so it only recurs when picked
+            operations = [{"action": "remove", "product_id": catalog.hot_product_id}]
+            operations += [{"action": "add", "product_id": pk, "quantity": 1} for pk in sorted(set(picks))]
+            yield Request("bulk-update-cart", "POST", "/api/cart/bulk/", {"operations": operations}, user)
+            yield Request("reserve-cart", "POST", "/api/cart/reserve/", None, user)
+            yield Request("place-order", "POST", "/api/order/place/", {"shipping_address": "1 Bench St"}, user)
+
+
+SCENARIOS = {
+    "browse": browse,
+    "cart_churn": cart_churn,
+    "checkout": checkout,
+}
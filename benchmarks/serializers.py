@@ -0,0 +1,92 @@
+"""
+Throughput of the DRF serializers versus the compiled plans in
+core.fast_serializers, for pages of 10, 50 and 500 items.
+
+    python -m benchmarks.serializers --repeat 50
+
+Rows are fetched once per page size; only serialization is timed.
+"""
+import argparse
+import json
+import time
+from decimal import Decimal
+
+from .common import migrate, setup_django
+
+PAGE_SIZES = (10, 50, 500)
+
+
+def seed(count):
+    from django.contrib.auth.models import User
+
+    from core.models import CartItem, Category, Order, OrderLine, Product
+
+    root = Category.objects.create(name="Bench")
+    categories = [Category.objects.create(name=f"Bench {i}", parent=root) for i in range(10)]
+    Product.objects.bulk_create([
+        Product(
+            name=f"Product {i}", description="Benchmark product", price=Decimal("19.99"),
+            discount_price=Decimal("14.99") if i % 3 else None, rating=Decimal("4.20"),
+            stock=100, category=categories[i % 10], size="M", color="Red", image="products/bench.png",
+        )
+        for i in range(count)
+    ])
+    user = User.objects.create_user("bench", password="bench")
+    products = list(Product.objects.all()[:count])
+    CartItem.objects.bulk_create([CartItem(user=user, product=p, quantity=2) for p in products])
+    orders = Order.objects.bulk_create([
+        Order(user=user, total_amount=Decimal("29.98"), shipping_address="Bench St") for _ in range(count)
+    ])
+    OrderLine.objects.bulk_create([
+        OrderLine(order=o, product=p, product_name=p.name, unit_price=p.price, quantity=2,
+                  line_total=p.price * 2)
+        for o, p in zip(orders, products)
+    ])
+    return user
+
+
+def throughput(fn, items, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = time.perf_counter() - start
+    return round(items * repeat / elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    migrate()
+    user = seed(max(PAGE_SIZES))
+
+    from core.fast_serializers import SerializationPlan
+    from core.models import CartItem, Order, Product
+    from core.serializers import CartItemSerializer, OrderSerializer, ProductSerializer
+
+    querysets = {
+        "product": (ProductSerializer, Product.objects.select_related("category")),
+        "cart_item": (CartItemSerializer, CartItem.objects.filter(user=user).select_related("product__category")),
+        "order": (OrderSerializer, Order.objects.select_related("user").prefetch_related("lines")),
+    }
+    report = {}
+    for name, (serializer_class, queryset) in querysets.items():
+        for size in PAGE_SIZES:
+            rows = list(queryset[:size])
+            drf = lambda: serializer_class(rows, many=True, context={}).data
+            fast = lambda: SerializationPlan(serializer_class(context={})).serialize_many(rows)
+            assert json.dumps(drf()) == json.dumps(fast())
+            drf_rate = throughput(drf, size, args.repeat)
+            fast_rate = throughput(fast, size, args.repeat)
+            report[f"{name}/{size}"] = {
+                "drf_items_per_s": drf_rate,
+                "fast_items_per_s": fast_rate,
+                "speedup": round(fast_rate / drf_rate, 2),
+            }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
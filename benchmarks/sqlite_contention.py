@@ -0,0 +1,116 @@
+"""
+Write contention of several worker processes on one SQLite file, with the
+default database settings against DB_PROFILE=sqlite-prod.
+
+    python -m benchmarks.sqlite_contention --processes 8 --requests 200
+
+Each process plays one shopper: it adds products to its cart through
+``POST /api/cart/add/`` and checks out through ``POST /api/order/place/``
+every ``--checkout-every`` requests, all through the Django test client with
+a JWT, like separate gunicorn workers would. Reports throughput, latency
+percentiles and failed requests (mostly "database is locked") per profile.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+from .common import migrate, percentile, setup_django
+
+PROFILES = ("default", "sqlite-prod")
+
+
+def prepare(db_path, profile, processes, products):
+    os.environ["DB_PROFILE"] = profile
+    setup_django(db_path)
+    migrate()
+
+    from decimal import Decimal
+
+    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from core.models import Category, Product
+
+    category = Category.objects.create(name="Contention")
+    Product.objects.bulk_create(
+        Product(name=f"Item {i}", description="", price=Decimal("9.99"), stock=10**6,
+                category=category, size="M", color="Red")
+        for i in range(products)
+    )
+    product_ids = list(Product.objects.values_list("id", flat=True))
+    users = [User.objects.create_user(f"writer{i}", password="x") for i in range(processes)]
+    return [str(AccessToken.for_user(u)) for u in users], product_ids
+
+
+def worker(args):
+    db_path, profile, index, token, product_ids, requests, checkout_every, start_at = args
+    os.environ["DB_PROFILE"] = profile
+    setup_django(db_path)
+    from django.test import Client
+
+    client = Client(raise_request_exception=False, HTTP_AUTHORIZATION=f"Bearer {token}")
+    samples, failures = [], 0
+    while time.time() < start_at:  # start every process together
+        time.sleep(0.001)
+    for i in range(requests):
+        started = time.perf_counter()
+        if checkout_every and i % checkout_every == checkout_every - 1:
+            response = client.post("/api/order/place/", {"shipping_address": "1 Bench St"},
+                                   content_type="application/json")
+            ok = response.status_code == 201
+        else:
+            product_id = product_ids[(i * 7 + index * 13) % len(product_ids)]
+            response = client.post("/api/cart/add/", {"product_id": product_id, "quantity": 1},
+                                   content_type="application/json")
+            ok = response.status_code == 200
+        samples.append((time.perf_counter() - started) * 1000)
+        failures += not ok
+    return samples, failures
+
+
+def run_profile(profile, args):
+    import tempfile
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix=f"contention-{profile}-"), "bench.sqlite3")
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:  # prepare in a clean process so each profile starts fresh
+        tokens, product_ids = pool.apply(prepare, (db_path, profile, args.processes, args.products))
+
+    start_at = time.time() + 3
+    jobs = [
+        (db_path, profile, index, token, product_ids, args.requests, args.checkout_every, start_at)
+        for index, token in enumerate(tokens)
+    ]
+    with ctx.Pool(args.processes) as pool:
+        results = pool.map(worker, jobs)
+    elapsed = time.time() - start_at
+
+    samples = [s for worker_samples, _ in results for s in worker_samples]
+    failures = sum(f for _, f in results)
+    return {
+        "requests": len(samples),
+        "failed": failures,
+        "throughput_rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(percentile(samples, 50), 2),
+        "p99_ms": round(percentile(samples, 99), 2),
+        "max_ms": round(max(samples), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per process.")
+    parser.add_argument("--checkout-every", type=int, default=5)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=list(PROFILES))
+    args = parser.parse_args()
+
+    report = {"args": vars(args), "profiles": {p: run_profile(p, args) for p in args.profiles}}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Reproducible API benchmark: runs the scenarios in benchmarks/scenarios.py
+and writes a JSON report, or compares two reports and flags regressions.
+
+    python -m benchmarks.suite run --scale small --requests 500 --output before.json
+    python -m benchmarks.suite run --scale small --requests 500 --output after.json
+    python -m benchmarks.suite compare before.json after.json --threshold 0.15
+
+``run`` generates a fresh database (benchmarks.datagen) unless ``--db``
+points at one; reuse a database only for read-only scenarios, as cart and
+checkout traffic changes it. Requests go through the Django test client,
+which also counts the SQL queries of every request, or with ``--base-url``
+to a running server, e.g. one started on the same database with
+
+    BENCH_DB_PATH=/tmp/shop.sqlite3 gunicorn -c backend/gunicorn.conf.py 'benchmarks.loadtest:wsgi()'
+
+in which case ``--concurrency`` threads share the work and query counts are
+not available. ``--cold`` turns the catalog response cache off
+(CATALOG_RESPONSE_CACHE) so every GET reaches the database; start the server
+with ``CATALOG_RESPONSE_CACHE=False`` to do the same with ``--base-url``.
+
+``compare`` exits with status 1 when an endpoint's p50/p99 latency grew by
+more than ``--threshold`` (and ``--min-ms``), its queries per request went
+up, or a scenario's throughput dropped by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.client import HTTPConnection
+from itertools import islice
+from urllib.parse import urlsplit
+
+from . import datagen
+from .common import percentile, setup_django
+from .scenarios import SCENARIOS, Catalog
+
+
+# ---------------------------
+# Transports
+# ---------------------------
+class ClientTransport:
+    """In-process requests through the Django test client, counting queries."""
+    concurrency = 1
+
+    def __init__(self, tokens):
+        from django.test import Client
+
+        self.client = Client()
+        self.tokens = tokens
+
+    def __call__(self, request):
+        from django.db import connection
+
+        from core.instrumentation import RequestStats
+
+        headers = {"authorization": f"Bearer {self.tokens[request.user]}"} if request.user else {}
+        stats = RequestStats()
+        start = time.perf_counter()
+        with connection.execute_wrapper(stats):
+            response = self.client.generic(
+                request.method, request.path,
+                data=json.dumps(request.data) if request.data is not None else "",
+                content_type="application/json", headers=headers,
+            )
+        return response.status_code, time.perf_counter() - start, len(stats.queries)
+
+
+class HTTPTransport:
+    """Requests to a running server over one keep-alive connection per thread."""
+
+    def __init__(self, tokens, base_url, concurrency):
+        self.tokens = tokens
+        self.address = urlsplit(base_url)
+        self.concurrency = concurrency
+        self.local = threading.local()
+
+    def connection(self):
+        if getattr(self.local, "connection", None) is None:
+            self.local.connection = HTTPConnection(self.address.hostname, self.address.port or 80, timeout=60)
+        return self.local.connection
+
+    def __call__(self, request):
+        headers = {"Content-Type": "application/json"}
+        if request.user:
+            headers["Authorization"] = f"Bearer {self.tokens[request.user]}"
+        body = json.dumps(request.data) if request.data is not None else None
+        start = time.perf_counter()
+        try:
+            conn = self.connection()
+            conn.request(request.method, request.path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except OSError:
+            self.local.connection = None
+            status = 599  # connection error
+        return status, time.perf_counter() - start, None
+
+
+# ---------------------------
+# Running
+# ---------------------------
+def run_scenario(name, transport, catalog, requests, warmup, seed):
+    stream = SCENARIOS[name](catalog, random.Random(seed))
+    for request in islice(stream, warmup):
+        transport(request)
+
+    batch = list(islice(stream, requests))
+    started = time.perf_counter()
+    if transport.concurrency > 1:
+        with ThreadPoolExecutor(transport.concurrency) as pool:
+            results = list(pool.map(transport, batch))
+    else:
+        results = [transport(request) for request in batch]
+    elapsed = time.perf_counter() - started
+    return summarize(batch, results, elapsed)
+
+
+def latency(durations):
+    ms = [d * 1000 for d in durations]
+    return {
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p90_ms": round(percentile(ms, 90), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3),
+        "mean_ms": round(sum(ms) / len(ms), 3),
+    }
+
+
+def queries(counts):
+    if any(c is None for c in counts):
+        return None
+    return {"mean": round(sum(counts) / len(counts), 2), "p99": percentile(counts, 99), "max": max(counts)}
+
+
+def summarize(batch, results, elapsed):
+    by_endpoint = defaultdict(list)
+    for request, result in zip(batch, results):
+        by_endpoint[request.endpoint].append(result)
+    statuses = Counter(status for status, _, _ in results)
+    return {
+        "requests": len(results),
+        "server_errors": sum(n for status, n in statuses.items() if status >= 500),
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 1),
+        "latency": latency([d for _, d, _ in results]),
+        "queries": queries([q for _, _, q in results]),
+        "endpoints": {
+            endpoint: {
+                "requests": len(rows),
+                "statuses": {str(s): n for s, n in sorted(Counter(s for s, _, _ in rows).items())},
+                "latency": latency([d for _, d, _ in rows]),
+                "queries": queries([q for _, _, q in rows]),
+            }
+            for endpoint, rows in sorted(by_endpoint.items())
+        },
+    }
+
+
+def run(args):
+    if args.db and os.path.exists(args.db):
+        db_path, rows = setup_django(args.db), None
+    else:
+        overrides = {name: getattr(args, name) for name in datagen.SCALES["small"]}
+        db_path, rows = datagen.build(args.db, args.scale, args.seed, **overrides)
+
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    if args.cold:
+        settings.CATALOG_RESPONSE_CACHE = False
+
+    catalog = Catalog()
+    tokens = {user.pk: str(AccessToken.for_user(user)) for user in User.objects.filter(pk__in=catalog.user_ids)}
+    if args.base_url:
+        transport = HTTPTransport(tokens, args.base_url, args.concurrency)
+    else:
+        transport = ClientTransport(tokens)
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "database": str(db_path),
+            "rows": rows,
+            "target": args.base_url or "django-test-client",
+            "concurrency": transport.concurrency,
+            "requests": args.requests,
+            "seed": args.seed,
+            "cold": args.cold,
+            "python": platform.python_version(),
+            "fast_serialization": settings.FAST_SERIALIZATION,
+            "git": git_revision(),
+        },
+        "scenarios": {},
+    }
+    for name in args.scenarios:
+        report["scenarios"][name] = run_scenario(
+            name, transport, catalog, args.requests, args.warmup, args.seed
+        )
+    return report
+
+
+def git_revision():
+    import subprocess
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---------------------------
+# Comparing
+# ---------------------------
+def change(before, after):
+    return (after - before) / before if before else (0.0 if after == before else float("inf"))
+
+
+def compare(base, head, threshold=0.15, min_ms=0.5):
+    """``{"regressions": [...], "improvements": [...], "scenarios": {...}}`` for two reports."""
+    regressions, improvements, scenarios = [], [], {}
+    for name, after in head["scenarios"].items():
+        before = base["scenarios"].get(name)
+        if before is None:
+            continue
+        rows = {}
+        checks = [(name, "throughput_rps", before["throughput_rps"], after["throughput_rps"], True)]
+        for endpoint, a in after["endpoints"].items():
+            b = before["endpoints"].get(endpoint)
+            if b is None:
+                continue
+            for metric in ("p50_ms", "p99_ms"):
+                checks.append((f"{name}/{endpoint}", metric, b["latency"][metric], a["latency"][metric], False))
+            if a["queries"] and b["queries"]:
+                checks.append((f"{name}/{endpoint}", "queries", b["queries"]["mean"], a["queries"]["mean"], False))
+
+        for where, metric, b, a, higher_is_better in checks:
+            delta = change(b, a)
+            rows[f"{where} {metric}"] = {"before": b, "after": a, "change": round(delta, 3)}
+            entry = {"where": where, "metric": metric, "before": b, "after": a, "change": round(delta, 3)}
+            if metric == "queries":
+                worse, better = a > b, a < b  # any extra query per request counts
+            else:
+                significant = abs(delta) > threshold and (higher_is_better or abs(a - b) >= min_ms)
+                worse = significant and (delta < 0 if higher_is_better else delta > 0)
+                better = significant and not worse
+            if worse:
+                regressions.append(entry)
+            elif better:
+                improvements.append(entry)
+        scenarios[name] = rows
+    return {"regressions": regressions, "improvements": improvements, "scenarios": scenarios}
+
+
+# ---------------------------
+# Command line
+# ---------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run scenarios and write a JSON report.")
+    run_parser.add_argument("--db", help="SQLite database to use, generated there if missing (default: temp file)")
+    datagen.add_arguments(run_parser)
+    run_parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    run_parser.add_argument("--requests", type=int, default=500, help="Timed requests per scenario.")
+    run_parser.add_argument("--warmup", type=int, default=50)
+    run_parser.add_argument("--cold", action="store_true", help="Bypass the catalog response cache.")
+    run_parser.add_argument("--base-url", help="Drive a running server instead of the test client.")
+    run_parser.add_argument("--concurrency", type=int, default=8, help="Threads with --base-url.")
+    run_parser.add_argument("--output", help="Write the report here instead of stdout.")
+
+    compare_parser = commands.add_parser("compare", help="Compare two reports; exit 1 on regressions.")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--threshold", type=float, default=0.15, help="Relative change to flag.")
+    compare_parser.add_argument("--min-ms", type=float, default=0.5, help="Ignore smaller latency changes.")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        report = run(args)
+        text = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        return 0
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    result = compare(base, head, args.threshold, args.min_ms)
+    print(json.dumps(result, indent=2))
+    return 1 if result["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
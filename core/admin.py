@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Category, Product
+from .images import smallest_variant
+from .models import Category, Product, OutboundEmail, StockReservation
 
 # ---------------------------
 # Subcategory Inline for CategoryAdmin
@@ -25,23 +26,47 @@ class CategoryAdmin(admin.ModelAdmin):
 # ---------------------------
 class ProductAdmin(admin.ModelAdmin):
     list_display = (
-        'name', 'price', 'discount_price', 'stock', 'rating',
+        'name', 'sku', 'price', 'discount_price', 'stock', 'reserved', 'rating',
         'category', 'size', 'color', 'is_available', 'image_tag', 'created_at', 'updated_at'
     )
     list_filter = ('category', 'size', 'color', 'is_available')
-    search_fields = ('name', 'description')
-    readonly_fields = ('created_at', 'updated_at')
+    search_fields = ('name', 'sku', 'description')
+    readonly_fields = ('created_at', 'updated_at', 'image_variants')
     ordering = ('name', 'category')
 
-    # Show image thumbnail
+    # Show image thumbnail (smallest rendition, falling back to the upload)
     def image_tag(self, obj):
+        thumbnail = smallest_variant(obj.image_variants)
+        if thumbnail:
+            return format_html('<img src="{}" width="50" height="50" />', obj.image.storage.url(thumbnail))
         if obj.image:
             return format_html('<img src="{}" width="50" height="50" />', obj.image.url)
         return "-"
     image_tag.short_description = 'Image'
 
+# ---------------------------
+# Stock Reservation Admin
+# ---------------------------
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('product', 'user', 'quantity', 'expires_at', 'created_at')
+    list_select_related = ('product', 'user')
+    search_fields = ('product__name', 'product__sku', 'user__username')
+    # Edit holds through core.inventory so Product.reserved stays in step
+    readonly_fields = ('user', 'product', 'quantity', 'expires_at', 'created_at')
+
+# ---------------------------
+# Outbound Email Admin
+# ---------------------------
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'from_email', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'from_email')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+
 # ---------------------------
 # Register Admin Models
 # ---------------------------
 admin.site.register(Category, CategoryAdmin)
 admin.site.register(Product, ProductAdmin)
+admin.site.register(OutboundEmail, OutboundEmailAdmin)
+admin.site.register(StockReservation, StockReservationAdmin)
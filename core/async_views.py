@@ -0,0 +1,177 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .category_tree import CategoryTree
+from .facets import ProductFacets
+from .fast_serializers import serialize
+from .models import CartItem, Order
+from .pagination import KeysetPagination
+from .serializers import CartItemSerializer, CategorySerializer, OrderSerializer, ProductSerializer
+from .views import ProductListAPIView
+
+# Async counterparts of the read endpoints, for deployments that run
+# backend.asgi under an ASGI server. Queries go through the async ORM; the
+# remaining sync pieces (JWT user lookup, filter validation, category tree
+# refresh, keyset pages, facets) are wrapped in sync_to_async. Responses
+# match the sync views; product_list's differences are in its docstring.
+
+
+def render(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type="application/json")
+
+
+def error(detail, status):
+    return render({"detail": detail}, status=status)
+
+
+async def authenticate(request):
+    """Run the configured DRF authenticators; returns ``(drf_request, user or None)``."""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    user = await sync_to_async(lambda: drf_request.user)()
+    return drf_request, (user if user.is_authenticated else None)
+
+
+# ---------------------------
+# Catalog
+# ---------------------------
+def product_view(drf_request):
+    """A ProductListAPIView bound to the request, for its filters, paginator and facets."""
+    return ProductListAPIView(request=drf_request, format_kwarg=None, args=(), kwargs={})
+
+
+def filtered_products(view):
+    """The view's queryset with its filter backends applied (lazy)."""
+    return view.filter_queryset(view.get_queryset())
+
+
+def keyset_page(view, queryset, context):
+    # One LIMIT query and no COUNT(*), so the sync paginator runs as is
+    paginator = view.paginator
+    products = paginator.paginate_queryset(queryset, view.request, view)
+    context["category_tree"] = CategoryTree.get()
+    return paginator.get_paginated_response(serialize(ProductSerializer, products, many=True, context=context)).data
+
+
+async def page_number_page(view, queryset, context):
+    """The page-number body through the async ORM, or None for a page out of range."""
+    request = view.request
+    page_size = view.paginator.get_page_size(request)
+    page = request.query_params.get(view.paginator.page_query_param, 1)
+    count = await queryset.acount()
+    try:
+        page = int(page)
+    except ValueError:
+        if page not in view.paginator.last_page_strings:
+            return None
+        page = -1
+    last_page = max(1, -(-count // page_size))
+    if page == -1:
+        page = last_page
+    if page < 1 or page > last_page:
+        return None
+
+    offset = (page - 1) * page_size
+    products = [p async for p in queryset[offset:offset + page_size]]
+    context["category_tree"] = await sync_to_async(CategoryTree.get)()
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, "page", page + 1) if page < last_page else None
+    previous_url = None
+    if page > 1:
+        previous_url = remove_query_param(url, "page") if page == 2 else replace_query_param(url, "page", page - 1)
+    return {
+        "count": count,
+        "next": next_url,
+        "previous": previous_url,
+        "results": serialize(ProductSerializer, products, many=True, context=context),
+    }
+
+
+async def product_list(request):
+    """
+    Takes the same query parameters as ProductListAPIView (filters, search,
+    ordering, ``page``/``page_size``, ``pagination=cursor`` and ``facets``)
+    and returns the same body. Unlike the sync view it does not go through
+    the catalog response cache, so there are no ETag/Last-Modified headers
+    or 304s, and it always reads from the primary database.
+    """
+    if request.method != "GET":
+        return error(f'Method "{request.method}" not allowed.', 405)
+    drf_request = Request(request)
+    view = product_view(drf_request)
+    try:
+        queryset = await sync_to_async(filtered_products)(view)
+    except exceptions.ValidationError as e:
+        return render(e.detail, status=400)
+
+    context = {"request": drf_request}
+    if isinstance(view.paginator, KeysetPagination):
+        try:
+            body = await sync_to_async(keyset_page)(view, queryset, context)
+        except exceptions.NotFound as e:
+            return error(e.detail, 404)
+    else:
+        body = await page_number_page(view, queryset, context)
+        if body is None:
+            return error("Invalid page.", 404)
+
+    if request.GET.get("facets") in ("1", "true"):
+        body["facets"] = await sync_to_async(ProductFacets(view, drf_request).get)()
+    return render(body)
+
+
+async def category_list(request):
+    if request.method != "GET":
+        return error(f'Method "{request.method}" not allowed.', 405)
+    tree = await sync_to_async(CategoryTree.get)()
+    if request.GET.get("tree") in ("1", "true"):
+        return render(tree.as_nested())
+    context = {"category_tree": tree}
+    return render(serialize(CategorySerializer, tree.categories(), many=True, context=context))
+
+
+# ---------------------------
+# Cart & Orders
+# ---------------------------
+async def view_cart(request):
+    if request.method != "GET":
+        return error(f'Method "{request.method}" not allowed.', 405)
+    try:
+        _, user = await authenticate(request)
+    except exceptions.APIException as e:
+        return error(e.detail, e.status_code)
+    if user is None:
+        return error("Authentication credentials were not provided.", 401)
+
+    cart_items = CartItem.objects.filter(user_id=user.pk)
+    items = [item async for item in cart_items.for_display()]
+    totals = await cart_items.atotals()
+    tree = await sync_to_async(CategoryTree.get)()
+    return render({
+        "cart": serialize(CartItemSerializer, items, many=True, context={"category_tree": tree}),
+        "total_amount": totals["total_amount"],
+        "item_count": totals["item_count"],
+    })
+
+
+async def track_orders(request):
+    if request.method != "GET":
+        return error(f'Method "{request.method}" not allowed.', 405)
+    try:
+        _, user = await authenticate(request)
+    except exceptions.APIException as e:
+        return error(e.detail, e.status_code)
+    if user is None:
+        return error("Authentication credentials were not provided.", 401)
+
+    orders = (
+        Order.objects.filter(user_id=user.pk)
+        .select_related("user")
+        .prefetch_related("lines")
+        .order_by("-ordered_at")
+    )
+    return render(serialize(OrderSerializer, [o async for o in orders], many=True))
@@ -0,0 +1,128 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.functional import cached_property
+from rest_framework_simplejwt import authentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+REVOKED_KEY = "core:revoked-jti:{}"
+NOT_BEFORE_KEY = "core:tokens-not-before:{}"
+USER_KEY = "core:user:{}"
+
+
+def auth_cache():
+    return caches[getattr(settings, "AUTH_CACHE_ALIAS", "default")]
+
+
+# ---------------------------
+# Token Claims
+# ---------------------------
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Login tokens carry the claims ``TokenUser`` reads (username, is_staff)."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["username"] = user.get_username()
+        token["is_staff"] = user.is_staff
+        return token
+
+
+# ---------------------------
+# Revocation
+# ---------------------------
+def revoke_token(token):
+    """Deny ``token``'s jti until it would have expired anyway."""
+    jti = token.get(jwt_settings.JTI_CLAIM)
+    ttl = int(token.get("exp", 0) - time.time())
+    if jti and ttl > 0:
+        auth_cache().set(REVOKED_KEY.format(jti), True, ttl)
+
+
+def revoke_user_tokens(user_id):
+    """
+    Deny every token issued to ``user_id`` until now, access and refresh, e.g.
+    when the user is deactivated or loses staff status: claims-only
+    authentication would otherwise trust them until they expire.
+    """
+    lifetime = max(jwt_settings.ACCESS_TOKEN_LIFETIME, jwt_settings.REFRESH_TOKEN_LIFETIME)
+    auth_cache().set(NOT_BEFORE_KEY.format(user_id), time.time(), int(lifetime.total_seconds()))
+
+
+def is_revoked(token):
+    revoked_key = REVOKED_KEY.format(token.get(jwt_settings.JTI_CLAIM))
+    not_before_key = NOT_BEFORE_KEY.format(token.get(jwt_settings.USER_ID_CLAIM))
+    found = auth_cache().get_many([revoked_key, not_before_key])
+    if revoked_key in found:
+        return True
+    return not_before_key in found and token.get("iat", 0) < found[not_before_key]
+
+
+class JWTAuthentication(authentication.JWTAuthentication):
+    """simplejwt's authentication (one User query per request) plus the revocation check."""
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_revoked(token):
+            raise InvalidToken({"detail": "Token has been revoked", "code": "token_revoked"})
+        return token
+
+
+class RevocationCheckingTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuses refresh tokens denied by ``revoke_user_tokens``."""
+
+    def validate(self, attrs):
+        if is_revoked(self.token_class(attrs["refresh"])):
+            raise InvalidToken({"detail": "Token has been revoked", "code": "token_revoked"})
+        return super().validate(attrs)
+
+
+class StatelessJWTAuthentication(JWTAuthentication, authentication.JWTStatelessUserAuthentication):
+    """
+    Builds ``request.user`` from the signed claims instead of loading the
+    User row; see ``CachedTokenUser``. Enabled with ``JWT_STATELESS_AUTH``.
+    """
+
+
+# ---------------------------
+# Token User
+# ---------------------------
+def get_cached_user(user_id):
+    """
+    User for ``user_id``, cached for ``AUTH_USER_CACHE_TIMEOUT`` seconds. The
+    password hash is deferred, so it never lands in the shared cache.
+    """
+    cache = auth_cache()
+    key = USER_KEY.format(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = get_user_model().objects.defer("password").get(pk=user_id)
+        cache.set(key, user, getattr(settings, "AUTH_USER_CACHE_TIMEOUT", 60))
+    return user
+
+
+def forget_cached_user(user_id):
+    auth_cache().delete(USER_KEY.format(user_id))
+
+
+class CachedTokenUser(TokenUser):
+    """TokenUser (id, username, is_staff from claims) with ``.user`` for the full row."""
+
+    @cached_property
+    def id(self):
+        # Claims hold the id as a string; keep it typed like User.pk
+        return get_user_model()._meta.pk.to_python(self.token[jwt_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def user(self):
+        return get_cached_user(self.pk)
+
+
+def full_user(user):
+    """``request.user`` as a User instance, whichever authentication produced it."""
+    return user.user if isinstance(user, TokenUser) else user
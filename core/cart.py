@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+
+from .models import CartItem
+
+ADD, UPDATE, REMOVE = "add", "update", "remove"
+
+
+# ---------------------------
+# Cart Operations
+# ---------------------------
+def collapse_operations(operations):
+    """
+    Fold an ordered list of ``{"action", "product_id", "quantity"}`` into one
+    final change per product: ``("add", n)``, ``("update", n)`` or ``("remove", None)``.
+    """
+    changes = {}
+    for op in operations:
+        product_id, quantity = op["product_id"], op.get("quantity", 1)
+        action, current = changes.get(product_id, (None, 0))
+        if op["action"] == REMOVE:
+            changes[product_id] = (REMOVE, None)
+        elif op["action"] == UPDATE:
+            changes[product_id] = (UPDATE, quantity)
+        elif action == REMOVE:
+            changes[product_id] = (UPDATE, quantity)
+        elif action == UPDATE:
+            changes[product_id] = (UPDATE, current + quantity)
+        else:
+            changes[product_id] = (ADD, current + quantity)
+    return changes
+
+
+def apply_cart_operations(user, operations):
+    """
+    Apply many cart changes in one transaction with a fixed number of
+    statements: one DELETE, one upsert for absolute quantities, and an
+    insert-if-missing plus a single ``quantity = quantity + CASE ...`` UPDATE
+    for increments, so concurrent adds never lose each other's updates.
+    """
+    changes = collapse_operations(operations)
+    removes = [pk for pk, (action, _) in changes.items() if action == REMOVE]
+    updates = {pk: qty for pk, (action, qty) in changes.items() if action == UPDATE}
+    adds = {pk: qty for pk, (action, qty) in changes.items() if action == ADD}
+
+    with transaction.atomic():
+        items = CartItem.objects.filter(user_id=user.pk)
+        if removes:
+            items.filter(product_id__in=removes).delete()
+        if updates:
+            CartItem.objects.bulk_create(
+                [CartItem(user_id=user.pk, product_id=pk, quantity=qty) for pk, qty in updates.items()],
+                update_conflicts=True,
+                unique_fields=["user", "product"],
+                update_fields=["quantity"],
+            )
+        if adds:
+            CartItem.objects.bulk_create(
+                [CartItem(user_id=user.pk, product_id=pk, quantity=0) for pk in adds],
+                ignore_conflicts=True,
+            )
+            increment = Case(
+                *[When(product_id=pk, then=Value(qty)) for pk, qty in adds.items()],
+                output_field=PositiveIntegerField(),
+            )
+            items.filter(product_id__in=adds).update(quantity=F("quantity") + increment)
@@ -0,0 +1,288 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from .category_tree import CategoryTree
+from .images import delete_renditions, render_in_background
+from .models import Category, Product
+from .response_cache import invalidate_catalog
+from .search import get_search_backend
+
+FORMATS = ("csv", "jsonl")
+# Output formats of the streaming export endpoints (ndjson is jsonl by another name)
+CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson", "ndjson": "application/x-ndjson"}
+
+# Column order of both formats; ``category`` is the tree label ("Clothing > Shirts")
+COLUMNS = [
+    "sku", "name", "description", "price", "discount_price", "rating", "stock",
+    "category", "size", "color", "image", "is_available",
+]
+# ``updated_at`` keeps Last-Modified/ETags right for re-imported products;
+# ``image`` is only updated by rows that carry one (see import_chunk)
+UPDATE_FIELDS = [c if c != "category" else "category_id" for c in COLUMNS if c not in ("sku", "image")] + ["updated_at"]
+
+TRUE_VALUES = {"1", "true", "yes", "y", "t"}
+FALSE_VALUES = {"0", "false", "no", "n", "f"}
+
+
+class RowError(ValueError):
+    pass
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# ---------------------------
+# Reading
+# ---------------------------
+def read_rows(stream, fmt):
+    """Yield ``(line number, dict)`` from a text stream, one row at a time."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for line_num, line in enumerate(stream, start=1):
+            if line.strip():
+                yield line_num, json.loads(line)
+    else:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+
+class CategoryResolver:
+    """
+    In-memory category name -> id map, loaded once from the category tree.
+    Names are unique, so either the name or the full tree label
+    ("Clothing > Shirts", as exported) resolves; the last label part wins.
+    With ``create=True`` unknown categories are created along the label.
+    """
+
+    def __init__(self, create=False):
+        self.create = create
+        self.by_name = {c.name: c.pk for c in CategoryTree.get().categories()}
+
+    def resolve(self, value):
+        path = [part.strip() for part in str(value or "").split(">") if part.strip()]
+        if not path:
+            raise RowError("category is required")
+        category_id = self.by_name.get(path[-1])
+        if category_id is None:
+            if not self.create:
+                raise RowError(f"unknown category {path[-1]!r}")
+            category_id = self.create_path(path)
+        return category_id
+
+    def create_path(self, path):
+        parent_id = None
+        for name in path:
+            if name not in self.by_name:
+                self.by_name[name] = Category.objects.create(name=name, parent_id=parent_id).pk
+            parent_id = self.by_name[name]
+        return parent_id
+
+
+# ---------------------------
+# Import
+# ---------------------------
+class ProductImporter:
+    """
+    Upserts products by SKU in fixed-size chunks: each chunk is parsed,
+    validated and written with one ``bulk_create(update_conflicts=True)`` in
+    its own transaction, then re-indexed for search. Only one chunk is held
+    in memory at a time. Rows that fail validation are skipped; the first
+    ``max_errors`` are kept for reporting.
+    """
+    max_errors = 100
+
+    def __init__(self, chunk_size=1000, create_categories=False, progress=None):
+        self.chunk_size = chunk_size
+        self.categories = CategoryResolver(create=create_categories)
+        self.progress = progress
+        self.search = get_search_backend()
+        self.created = self.updated = self.skipped = 0
+        self.errors = []
+
+    def run(self, rows):
+        for chunk in chunked(rows, self.chunk_size):
+            self.import_chunk(chunk)
+            if self.progress:
+                self.progress(self)
+        invalidate_catalog()
+        return self
+
+    @property
+    def processed(self):
+        return self.created + self.updated + self.skipped
+
+    def import_chunk(self, chunk):
+        products = {}
+        for line_num, row in chunk:
+            try:
+                product = self.build(row)
+            except RowError as e:
+                self.skipped += 1
+                if len(self.errors) < self.max_errors:
+                    self.errors.append((line_num, str(e)))
+                continue
+            products[product.sku] = product  # last row wins within a chunk
+
+        if not products:
+            return
+        with transaction.atomic():
+            stored = {
+                sku: (image, variants)
+                for sku, image, variants in Product.objects.filter(sku__in=products).values_list(
+                    "sku", "image", "image_variants"
+                )
+            }
+            # A blank or missing image cell leaves the stored image alone; a new
+            # one drops the renditions of the old (bulk writes send no post_save)
+            new_image = [p for p in products.values() if p.image and p.image.name != stored.get(p.sku, ("",))[0]]
+            for product in new_image:
+                product.image_variants = {}
+            new_skus = {p.sku for p in new_image}
+            same_image = [p for p in products.values() if p.sku not in new_skus]
+            for batch, update_fields in (
+                (new_image, UPDATE_FIELDS + ["image", "image_variants"]), (same_image, UPDATE_FIELDS),
+            ):
+                if batch:
+                    Product.objects.bulk_create(
+                        batch, update_conflicts=True, unique_fields=["sku"], update_fields=update_fields,
+                    )
+            if self.search is not None:
+                self.search.index(Product.objects.filter(sku__in=products).only("id", "name", "description"))
+            if new_image:
+                rerender = list(Product.objects.filter(sku__in=new_skus).values_list("pk", flat=True))
+                replaced = [stored[sku][1] for sku in new_skus if sku in stored]
+                transaction.on_commit(lambda: self.replace_renditions(rerender, replaced))
+        self.updated += len(stored)
+        self.created += len(products) - len(stored)
+
+    @staticmethod
+    def replace_renditions(product_pks, replaced):
+        for variants in replaced:
+            delete_renditions(variants)
+        for pk in product_pks:
+            render_in_background(pk)
+
+    def build(self, row):
+        sku = str(row.get("sku") or "").strip()
+        if not sku:
+            raise RowError("sku is required")
+        name = str(row.get("name") or "").strip()
+        if not name:
+            raise RowError("name is required")
+        product = Product(
+            sku=sku,
+            name=name,
+            description=str(row.get("description") or ""),
+            price=self.decimal(row, "price"),
+            discount_price=self.decimal(row, "discount_price", required=False),
+            rating=self.decimal(row, "rating", required=False) or Decimal("0"),
+            stock=self.integer(row, "stock"),
+            category_id=self.categories.resolve(row.get("category")),
+            size=self.choice(row, "size", Product.SIZE_CHOICES),
+            color=self.choice(row, "color", Product.COLOR_CHOICES),
+            image=str(row.get("image") or "").strip(),
+            is_available=self.boolean(row, "is_available", default=True),
+        )
+        return product
+
+    @staticmethod
+    def decimal(row, field, required=True):
+        value = row.get(field)
+        if value in (None, ""):
+            if required:
+                raise RowError(f"{field} is required")
+            return None
+        try:
+            return Decimal(str(value))
+        except InvalidOperation:
+            raise RowError(f"invalid {field} {value!r}")
+
+    @staticmethod
+    def integer(row, field):
+        value = row.get(field) or 0
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            raise RowError(f"invalid {field} {value!r}")
+        if number < 0:
+            raise RowError(f"{field} must not be negative")
+        return number
+
+    @staticmethod
+    def choice(row, field, choices):
+        value = row.get(field)
+        if value not in {c for c, _ in choices}:
+            raise RowError(f"invalid {field} {value!r}")
+        return value
+
+    @staticmethod
+    def boolean(row, field, default):
+        value = row.get(field)
+        if isinstance(value, bool):
+            return value
+        text = str(value if value is not None else "").strip().lower()
+        if not text:
+            return default
+        if text in TRUE_VALUES:
+            return True
+        if text in FALSE_VALUES:
+            return False
+        raise RowError(f"invalid {field} {value!r}")
+
+
+# ---------------------------
+# Export
+# ---------------------------
+def export_rows(queryset=None, chunk_size=2000):
+    """
+    Yield product dicts in COLUMNS order, streaming the rows with
+    ``.iterator()``. Products without a SKU are left out, as the import could
+    not match them (see ``without_sku``).
+    """
+    if queryset is None:
+        queryset = Product.objects.all()
+    tree = CategoryTree.get()
+    fields = [c if c != "category" else "category_id" for c in COLUMNS]
+    queryset = queryset.filter(sku__gt="")
+    for values in queryset.order_by("pk").values_list(*fields).iterator(chunk_size=chunk_size):
+        row = dict(zip(COLUMNS, values))
+        category = tree.nodes.get(row["category"])
+        row["category"] = tree.label(category) if category else ""
+        yield row
+
+
+def without_sku(queryset=None):
+    """Products export_rows skips: no SKU, so an import could not match them."""
+    if queryset is None:
+        queryset = Product.objects.all()
+    return queryset.exclude(sku__gt="")
+
+
+def render_rows(rows, fmt, columns=COLUMNS):
+    """Yield an export as text chunks (header first for CSV), one line per row."""
+    if fmt in ("jsonl", "ndjson"):
+        for row in rows:
+            yield json.dumps(row, default=str, ensure_ascii=False) + "\n"
+        return
+    if fmt != "csv":
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(CONTENT_TYPES)}")
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
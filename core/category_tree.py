@@ -0,0 +1,77 @@
+import threading
+import uuid
+
+VERSION_CACHE_KEY = "core:category-tree-version"
+
+
+# ---------------------------
+# Category Tree
+# ---------------------------
+class CategoryTree:
+    """
+    In-process snapshot of the whole category hierarchy, loaded with a single
+    query. The snapshot is shared between requests and rebuilt whenever the
+    version stored in the cache changes (see ``invalidate``).
+    """
+    _lock = threading.Lock()
+    _instance = None
+    _version = None
+
+    def __init__(self, categories):
+        self.nodes = {c.pk: c for c in categories}
+        self._children = {}
+        for category in sorted(self.nodes.values(), key=lambda c: c.pk):
+            self._children.setdefault(category.parent_id, []).append(category)
+
+    @classmethod
+    def get(cls):
+        from .response_cache import catalog_cache
+        version = catalog_cache().get(VERSION_CACHE_KEY)
+        if version is None:
+            version = cls.invalidate()
+        tree = cls._instance
+        if tree is None or cls._version != version:
+            from .models import Category
+            from .routers import replica_reads
+            # Shared by every request until the next change, so never built from a lagging replica
+            with cls._lock, replica_reads(False):
+                tree = cls(Category.objects.all())
+                cls._instance, cls._version = tree, version
+        return tree
+
+    @classmethod
+    def invalidate(cls):
+        from .response_cache import catalog_cache
+        version = uuid.uuid4().hex
+        catalog_cache().set(VERSION_CACHE_KEY, version, None)
+        return version
+
+    def categories(self):
+        return sorted(self.nodes.values(), key=lambda c: c.pk)
+
+    def children(self, category_id):
+        return self._children.get(category_id, [])
+
+    def ancestors(self, category):
+        return [self.nodes[pk] for pk in category.ancestor_ids if pk in self.nodes]
+
+    def label(self, category):
+        names = [a.name for a in self.ancestors(category)]
+        return " > ".join(names + [category.name])
+
+    def descendant_ids(self, category_id):
+        """Ids of ``category_id`` and everything below it, or [] if unknown."""
+        root = self.nodes.get(category_id)
+        if root is None:
+            return []
+        return [pk for pk, c in self.nodes.items() if c.path.startswith(root.path)]
+
+    def as_nested(self, parent_id=None):
+        return [
+            {
+                "id": c.pk,
+                "name": c.name,
+                "children": self.as_nested(c.pk),
+            }
+            for c in self.children(parent_id)
+        ]
@@ -0,0 +1,118 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .category_tree import CategoryTree
+from .filters import ProductSearchFilter
+from .models import Product
+from .response_cache import catalog_cache, catalog_version
+
+DEFAULT_PRICE_BUCKETS = (0, 25, 50, 100, 200, None)
+
+# Facet name -> the query parameters that filter on it. Each facet is counted
+# under every current filter except its own, so picking "Red" still shows how
+# many products the other colors would give.
+FACET_PARAMS = {
+    "size": ("size",),
+    "color": ("color",),
+    "category": ("category", "category_tree"),
+    "price": ("price__gte", "price__lte"),
+}
+
+# Parameters that change the page but not the matching set
+NON_FILTER_PARAMS = {"page", "page_size", "ordering", "cursor", "pagination", "count", "facets", "format"}
+
+
+def price_buckets():
+    return tuple(getattr(settings, "PRODUCT_PRICE_BUCKETS", DEFAULT_PRICE_BUCKETS))
+
+
+def filter_key(params):
+    """Stable key for the filtering parameters only (sorted, paging and ordering dropped)."""
+    items = sorted(
+        (key, value)
+        for key in params
+        if key not in NON_FILTER_PARAMS
+        for value in params.getlist(key)
+    )
+    return hashlib.sha1(repr(items).encode()).hexdigest()
+
+
+# ---------------------------
+# Facet Counts
+# ---------------------------
+class ProductFacets:
+    """
+    Facet counts for ProductListAPIView's current filters: one grouped
+    aggregate per facet (four queries), cached under the catalog version and
+    the filter key so every page and ordering of a listing shares them.
+    """
+    cache_timeout = 300
+
+    def __init__(self, view, request):
+        self.view = view
+        self.request = request
+
+    def get(self):
+        params = self.request.query_params
+        key = f"core:facets:{catalog_version()['version']}:{filter_key(params)}"
+        cache = catalog_cache()
+        facets = cache.get(key)
+        if facets is None:
+            facets = {
+                "size": self.value_counts("size", Product.SIZE_CHOICES),
+                "color": self.value_counts("color", Product.COLOR_CHOICES),
+                "category": self.category_counts(),
+                "price": self.price_counts(),
+            }
+            cache.set(key, facets, self.cache_timeout)
+        return facets
+
+    def queryset_without(self, facet):
+        """The view's base queryset with every filter applied except ``facet``'s own."""
+        view, request = self.view, self.request
+        data = request.query_params.copy()
+        for param in FACET_PARAMS[facet]:
+            data.pop(param, None)
+        queryset = view.filterset_class(data=data, queryset=view.get_queryset(), request=request).qs
+        search = ProductSearchFilter()
+        if search.get_search_terms(request):
+            queryset = search.filter_queryset(request, queryset, view)
+        return queryset.order_by()
+
+    def value_counts(self, field, choices):
+        rows = self.queryset_without(field).values(field).annotate(count=Count("pk")).values_list(field, "count")
+        counts = dict(rows)
+        return [{"value": value, "count": counts.get(value, 0)} for value, _ in choices]
+
+    def category_counts(self):
+        rows = self.queryset_without("category").values("category_id").annotate(count=Count("pk"))
+        tree = CategoryTree.get()
+        # Roll each category's count up into its ancestors (category_tree semantics)
+        totals = {}
+        for category_id, count in rows.values_list("category_id", "count"):
+            node = tree.nodes.get(category_id)
+            ids = [category_id] + (list(node.ancestor_ids) if node else [])
+            for pk in ids:
+                totals[pk] = totals.get(pk, 0) + count
+        return [
+            {"id": pk, "name": tree.nodes[pk].name, "parent": tree.nodes[pk].parent_id, "count": totals[pk]}
+            for pk in sorted(totals)
+            if pk in tree.nodes
+        ]
+
+    def price_counts(self):
+        buckets = price_buckets()
+        ranges = list(zip(buckets, buckets[1:]))
+        aggregates = {}
+        for i, (low, high) in enumerate(ranges):
+            condition = Q(price__gte=low)
+            if high is not None:
+                condition &= Q(price__lt=high)
+            aggregates[f"bucket_{i}"] = Count("pk", filter=condition)
+        counts = self.queryset_without("price").aggregate(**aggregates)
+        return [
+            {"min": low, "max": high, "count": counts[f"bucket_{i}"]}
+            for i, (low, high) in enumerate(ranges)
+        ]
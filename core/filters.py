@@ -0,0 +1,71 @@
+import django_filters
+from rest_framework import filters
+
+from .category_tree import CategoryTree
+from .models import Order, Product
+from .search import get_search_backend, tokenize
+
+
+# ---------------------------
+# Product Filters
+# ---------------------------
+class ProductFilter(django_filters.FilterSet):
+    # Category plus all of its descendants, resolved from the cached tree
+    category_tree = django_filters.NumberFilter(method='filter_category_tree')
+    # Generated columns; django-filter cannot derive filters for them from Meta.fields
+    effective_price__gte = django_filters.NumberFilter(field_name='effective_price', lookup_expr='gte')
+    effective_price__lte = django_filters.NumberFilter(field_name='effective_price', lookup_expr='lte')
+    discount_percent__gte = django_filters.NumberFilter(field_name='discount_percent', lookup_expr='gte')
+
+    class Meta:
+        model = Product
+        fields = {
+            'category': ['exact'],
+            'size': ['exact'],
+            'color': ['exact'],
+            'price': ['gte', 'lte'],
+            'rating': ['gte', 'lte'],
+        }
+
+    def filter_category_tree(self, queryset, name, value):
+        return queryset.filter(category_id__in=CategoryTree.get().descendant_ids(int(value)))
+
+
+# ---------------------------
+# Order Export Filters
+# ---------------------------
+class OrderExportFilter(django_filters.FilterSet):
+    # ?ordered_at__gte=2025-01-01&ordered_at__lt=2025-02-01&status=Shipped&status=Delivered
+    status = django_filters.MultipleChoiceFilter(choices=Order.STATUS_CHOICES)
+
+    class Meta:
+        model = Order
+        fields = {
+            'ordered_at': ['gte', 'lt'],
+            'user': ['exact'],
+        }
+
+
+# ---------------------------
+# Product Search
+# ---------------------------
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    Same ``?search=`` contract as DRF's SearchFilter, answered from the full-text
+    index. Results are ranked by relevance unless the client passes ``ordering``;
+    must therefore run after OrderingFilter. Falls back to ``icontains`` over
+    ``search_fields`` on databases without a search backend.
+    """
+    def filter_queryset(self, request, queryset, view):
+        backend = get_search_backend()
+        if backend is None:
+            return super().filter_queryset(request, queryset, view)
+
+        terms = tokenize(" ".join(self.get_search_terms(request)))
+        if not terms:
+            return queryset
+
+        queryset = backend.search(queryset, terms)
+        if not request.query_params.get(filters.OrderingFilter.ordering_param):
+            queryset = queryset.order_by('-search_rank', 'pk')
+        return queryset
@@ -0,0 +1,223 @@
+import hashlib
+import io
+import logging
+import posixpath
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_DIR = "products/renditions"
+DEFAULT_WIDTHS = (160, 320, 640, 1280)
+ENCODER_OPTIONS = {
+    "webp": {"quality": 80, "method": 6},
+    "avif": {"quality": 60},
+}
+
+
+def rendition_widths():
+    return tuple(getattr(settings, "PRODUCT_IMAGE_WIDTHS", DEFAULT_WIDTHS))
+
+
+def rendition_formats():
+    """WebP always; AVIF when this Pillow build can encode it."""
+    formats = ["webp"]
+    if features.check("avif"):
+        formats.append("avif")
+    return formats
+
+
+# ---------------------------
+# Rendering (runs in worker processes)
+# ---------------------------
+def render_image(content, widths, formats):
+    """
+    Resize ``content`` (encoded image bytes) to each of ``widths`` that is
+    not wider than the original, and encode every size in every format.
+    Returns ``[(format, width, data), ...]``.
+    """
+    with Image.open(io.BytesIO(content)) as source:
+        image = ImageOps.exif_transpose(source)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    targets = sorted({min(width, image.width) for width in widths})
+    renditions = []
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt in formats:
+            buffer = io.BytesIO()
+            resized.save(buffer, format=fmt.upper(), **ENCODER_OPTIONS.get(fmt, {}))
+            renditions.append((fmt, width, buffer.getvalue()))
+    return renditions
+
+
+def rendition_name(source_name, fmt, width, data):
+    """Content-hashed name, so a rendition URL never changes meaning and can be cached forever."""
+    stem = posixpath.splitext(posixpath.basename(source_name))[0]
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    return f"{RENDITIONS_DIR}/{stem}.{width}w.{digest}.{fmt}"
+
+
+# ---------------------------
+# Pipeline
+# ---------------------------
+def needs_renditions(product):
+    return bool(product.image) and (product.image_variants or {}).get("source") != product.image.name
+
+
+def store_renditions(product, renditions, storage=default_storage):
+    """Save ``renditions`` for ``product``, drop the ones they replace and return the variants map."""
+    variants = {"source": product.image.name}
+    for fmt, width, data in renditions:
+        name = rendition_name(product.image.name, fmt, width, data)
+        if not storage.exists(name):
+            name = storage.save(name, ContentFile(data))
+        variants.setdefault(fmt, {})[str(width)] = name
+
+    kept = {name for fmt in variants.values() if isinstance(fmt, dict) for name in fmt.values()}
+    for old in iter_variant_names(product.image_variants):
+        if old not in kept:
+            storage.delete(old)
+    return variants
+
+
+def iter_variant_names(variants):
+    for value in (variants or {}).values():
+        if isinstance(value, dict):
+            yield from value.values()
+
+
+def read_source(product, storage=default_storage):
+    try:
+        with storage.open(product.image.name, "rb") as f:
+            return f.read()
+    except (FileNotFoundError, OSError):
+        logger.warning("Missing image %s for product %s", product.image.name, product.pk)
+        return None
+
+
+def generate_renditions(products, workers=None, storage=default_storage):
+    """
+    Render and store the variants of ``products`` and save ``image_variants``
+    with queryset updates (no post_save, so no re-indexing). ``workers=0``
+    renders inline; otherwise a process pool of ``workers`` processes is used
+    (``None`` = CPU count). Returns the number of products updated.
+    """
+    from .models import Product
+    from .response_cache import invalidate_catalog
+
+    widths, formats = rendition_widths(), rendition_formats()
+    jobs = [(product, read_source(product, storage)) for product in products]
+    jobs = [(product, content) for product, content in jobs if content is not None]
+    if not jobs:
+        return 0
+
+    contents = [content for _, content in jobs]
+    if workers == 0 or len(jobs) == 1:
+        results = [safe_render(content, widths, formats) for content in contents]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(safe_render, contents, [widths] * len(jobs), [formats] * len(jobs)))
+
+    updated = 0
+    for (product, _), renditions in zip(jobs, results):
+        if renditions is None:
+            logger.warning("Could not render image %s for product %s", product.image.name, product.pk)
+            continue
+        product.image_variants = store_renditions(product, renditions, storage)
+        Product.objects.filter(pk=product.pk).update(image_variants=product.image_variants)
+        updated += 1
+    if updated:
+        invalidate_catalog()
+    return updated
+
+
+def delete_renditions(variants, storage=default_storage):
+    """Delete the files of a stored variants map, e.g. once its product is gone."""
+    for name in iter_variant_names(variants):
+        storage.delete(name)
+
+
+def drop_renditions(product, storage=default_storage):
+    """Delete ``product``'s renditions and clear ``image_variants`` (queryset update, no post_save)."""
+    from .models import Product
+    from .response_cache import invalidate_catalog
+
+    delete_renditions(product.image_variants, storage)
+    product.image_variants = {}
+    Product.objects.filter(pk=product.pk).update(image_variants={})
+    invalidate_catalog()
+
+
+def safe_render(content, widths, formats):
+    try:
+        return render_image(content, widths, formats)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+# ---------------------------
+# Background Rendering
+# ---------------------------
+@cache
+def render_pool():
+    return ThreadPoolExecutor(
+        max_workers=getattr(settings, "PRODUCT_IMAGE_RENDER_THREADS", 2), thread_name_prefix="renditions"
+    )
+
+
+def render_in_background(product_pk):
+    """
+    Render ``product_pk``'s variants on a small thread pool in this process,
+    so the request that saved the image does not wait for the encoders
+    (Pillow releases the GIL while resizing and encoding). Work lost with
+    the process is picked up by the generate_image_renditions backfill.
+    Returns the Future.
+    """
+    return render_pool().submit(render_in_thread, product_pk)
+
+
+def render_in_thread(product_pk):
+    try:
+        render_product(product_pk)
+    finally:
+        connections.close_all()  # this pool thread's connections only
+
+
+def render_product(product_pk):
+    """Render the product's variants unless it is gone or they are already current."""
+    from .models import Product
+
+    try:
+        product = Product.objects.only("id", "image", "image_variants").filter(pk=product_pk).first()
+        if product is not None and needs_renditions(product):
+            generate_renditions([product], workers=0)
+    except Exception:
+        logger.exception("Rendering images for product %s failed", product_pk)
+
+
+# ---------------------------
+# Srcset
+# ---------------------------
+def srcset(variants, url=None):
+    """``{"webp": "<url> 160w, <url> 320w", ...}`` for a stored variants map."""
+    url = url or default_storage.url
+    return {
+        fmt: ", ".join(f"{url(name)} {width}w" for width, name in sorted(sizes.items(), key=lambda i: int(i[0])))
+        for fmt, sizes in (variants or {}).items()
+        if isinstance(sizes, dict)
+    }
+
+
+def smallest_variant(variants, fmt="webp"):
+    sizes = (variants or {}).get(fmt) or {}
+    if not sizes:
+        return None
+    return sizes[min(sizes, key=int)]
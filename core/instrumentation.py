@@ -0,0 +1,248 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger("core.slow_requests")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# Histogram name -> (buckets, help text); durations are in seconds
+METRICS = {
+    "request_duration_seconds": (DURATION_BUCKETS, "Wall time per request."),
+    "db_duration_seconds": (DURATION_BUCKETS, "Time spent in database queries per request."),
+    "serializer_duration_seconds": (DURATION_BUCKETS, "Time spent serializing per request."),
+    "db_queries": (COUNT_BUCKETS, "Database queries per request."),
+    "db_duplicate_queries": (COUNT_BUCKETS, "Repeats of an already executed SQL statement per request."),
+}
+
+_current = ContextVar("core_request_stats", default=None)
+
+
+# ---------------------------
+# Per-request Recording
+# ---------------------------
+class RequestStats:
+    """What one request spent: set as the current stats while it is handled."""
+
+    def __init__(self):
+        self.queries = []  # (sql, duration)
+        self.serializer_time = 0.0
+        self._serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def db_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    @property
+    def duplicate_count(self):
+        return sum(n - 1 for n in Counter(sql for sql, _ in self.queries).values() if n > 1)
+
+
+@contextmanager
+def serializer_timer():
+    """Add the enclosed time to the current request's serializer time (outermost call only)."""
+    stats = _current.get()
+    if stats is None or stats._serializing:
+        yield
+        return
+    stats._serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_time += time.perf_counter() - start
+        stats._serializing = False
+
+
+class TimedSerializerMixin:
+    """Counts a serializer's ``to_representation`` towards the request's serializer time."""
+
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+
+# ---------------------------
+# Aggregated Histograms
+# ---------------------------
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        total, result = 0, []
+        for le, n in zip(list(self.buckets) + ["+Inf"], self.counts):
+            total += n
+            result.append((le, total))
+        return result
+
+
+class StatsRegistry:
+    """In-process histograms per ``(endpoint, metric)``; each worker keeps its own."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, endpoint, values):
+        with self._lock:
+            for metric, value in values.items():
+                key = (endpoint, metric)
+                if key not in self._histograms:
+                    self._histograms[key] = Histogram(METRICS[metric][0])
+                self._histograms[key].observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def snapshot(self):
+        """``{endpoint: {metric: {"count", "sum", "buckets"}}}``"""
+        with self._lock:
+            result = {}
+            for (endpoint, metric), h in sorted(self._histograms.items()):
+                result.setdefault(endpoint, {})[metric] = {
+                    "count": h.count,
+                    "sum": round(h.sum, 6),
+                    "buckets": [[str(le), n] for le, n in h.cumulative()],
+                }
+            return result
+
+    def prometheus(self):
+        lines = []
+        with self._lock:
+            for metric, (_, help_text) in METRICS.items():
+                name = f"core_{metric}"
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (endpoint, key), h in sorted(self._histograms.items()):
+                    if key != metric:
+                        continue
+                    label = f'endpoint="{endpoint}"'
+                    for le, n in h.cumulative():
+                        lines.append(f'{name}_bucket{{{label},le="{le}"}} {n}')
+                    lines.append(f"{name}_sum{{{label}}} {h.sum:.6f}")
+                    lines.append(f"{name}_count{{{label}}} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = StatsRegistry()
+
+
+# ---------------------------
+# Middleware
+# ---------------------------
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper on every connection; counts towards the current request, if any."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class QueryStatsMiddleware:
+    """
+    Opt-in (``QUERY_STATS_ENABLED``) per-endpoint timing: wall time, DB time,
+    query and duplicate-query counts and serializer time, keyed by the
+    resolved URL name. Requests over ``QUERY_STATS_SLOW_MS`` or
+    ``QUERY_STATS_MAX_QUERIES`` are logged with their SQL. Streaming bodies
+    are not included: timing stops when the view returns the response.
+
+    Queries are recorded by a wrapper installed on every connection, which
+    follows the request's stats into ``sync_to_async`` threads, so async
+    views are measured without adapting the handler to sync.
+    """
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_STATS_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.slow_ms = getattr(settings, "QUERY_STATS_SLOW_MS", 500)
+        self.max_queries = getattr(settings, "QUERY_STATS_MAX_QUERIES", 30)
+        connection_created.connect(install_query_recorder, dispatch_uid="core.query_stats")
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, stats, time.perf_counter() - start)
+        return response
+
+    def record(self, request, stats, elapsed):
+        match = getattr(request, "resolver_match", None)
+        endpoint = (match.url_name or match.view_name) if match else "unresolved"
+        registry.observe(endpoint, {
+            "request_duration_seconds": elapsed,
+            "db_duration_seconds": stats.db_time,
+            "serializer_duration_seconds": stats.serializer_time,
+            "db_queries": len(stats.queries),
+            "db_duplicate_queries": stats.duplicate_count,
+        })
+        if elapsed * 1000 > self.slow_ms or len(stats.queries) > self.max_queries:
+            self.log_slow(request, endpoint, elapsed, stats)
+
+    def log_slow(self, request, endpoint, elapsed, stats):
+        statements = Counter(sql for sql, _ in stats.queries)
+        slowest = sorted(stats.queries, key=lambda q: q[1], reverse=True)[:5]
+        logger.warning(
+            "Slow request %s %s (%s): %.1f ms, %d queries (%d duplicates) in %.1f ms, serializer %.1f ms\n"
+            "Slowest:\n%s\nMost repeated:\n%s",
+            request.method, request.get_full_path(), endpoint, elapsed * 1000,
+            len(stats.queries), stats.duplicate_count, stats.db_time * 1000, stats.serializer_time * 1000,
+            "\n".join(f"  {duration * 1000:.1f} ms  {sql}" for sql, duration in slowest),
+            "\n".join(f"  x{n}  {sql}" for sql, n in statements.most_common(3) if n > 1) or "  -",
+        )
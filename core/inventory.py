@@ -0,0 +1,181 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, PositiveIntegerField, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Product, StockReservation
+from .response_cache import invalidate_catalog
+
+
+class InsufficientStock(Exception):
+    """Raised when at least one product cannot cover the requested quantity."""
+
+    def __init__(self, shortages):
+        super().__init__("Insufficient stock")
+        self.shortages = shortages
+
+
+# ---------------------------
+# Stock
+# ---------------------------
+def _stock_changed():
+    # Bulk update() sends no post_save, so drop cached catalog responses
+    # (which show stock) here, once the change is committed
+    transaction.on_commit(invalidate_catalog)
+
+
+def _per_product(quantities):
+    return Case(
+        *[When(pk=pk, then=Value(qty)) for pk, qty in quantities.items()],
+        output_field=PositiveIntegerField(),
+    )
+
+
+def decrement_stock(quantities, held=None):
+    """
+    Take ``{product_id: quantity}`` out of stock with one conditional UPDATE
+    (``SET stock = stock - qty WHERE stock - reserved >= qty``). Units the
+    buyer holds (``held``, ``{product_id: quantity}``) count as available to
+    them and are released in the same statement. Either every product is
+    decremented or InsufficientStock is raised; call it inside ``atomic()`` so
+    the partial update is rolled back.
+    """
+    held = held or {}
+    requested = _per_product(quantities)
+    released = _per_product({pk: held.get(pk, 0) for pk in quantities})
+    updated = Product.objects.filter(
+        pk__in=quantities, is_available=True, stock__gte=F('reserved') - released + requested
+    ).update(stock=F('stock') - requested, reserved=F('reserved') - released)
+    if updated != len(quantities):
+        raise InsufficientStock(stock_shortages(quantities, held))
+    _stock_changed()
+
+
+def stock_shortages(quantities, held=None):
+    held = held or {}
+    available = {
+        pk: stock - reserved + held.get(pk, 0)
+        for pk, stock, reserved in Product.objects.filter(
+            pk__in=quantities, is_available=True
+        ).values_list('pk', 'stock', 'reserved')
+    }
+    return [
+        {"product_id": pk, "requested": qty, "available": available.get(pk, 0)}
+        for pk, qty in sorted(quantities.items())
+        if available.get(pk, 0) < qty
+    ]
+
+
+# ---------------------------
+# Reservations
+# ---------------------------
+def reservation_ttl():
+    return timedelta(seconds=getattr(settings, "STOCK_RESERVATION_TTL", 900))
+
+
+def reserve_stock(user_id, quantities, ttl=None):
+    """
+    Make ``user_id``'s holds exactly ``{product_id: quantity}``, expiring
+    ``ttl`` from now. Only the difference to the current holds touches
+    ``Product.reserved``: increases with one conditional UPDATE
+    (``WHERE stock - reserved >= delta``), decreases with another, so a busy
+    product row is locked for two short statements rather than a
+    read-modify-write. Raises InsufficientStock when an increase cannot be
+    covered; call it inside ``atomic()``. Returns the expiry time.
+    """
+    # Serialize per user first: with no holds yet, locking them locks nothing,
+    # and two concurrent calls would both reserve the full quantities
+    User.objects.select_for_update().filter(pk=user_id).exists()
+    holds = StockReservation.objects.select_for_update().filter(user_id=user_id)
+    current = dict(holds.values_list('product_id', 'quantity'))
+    deltas = {pk: quantities.get(pk, 0) - current.get(pk, 0) for pk in current.keys() | quantities.keys()}
+
+    grow = {pk: delta for pk, delta in deltas.items() if delta > 0}
+    if grow:
+        requested = _per_product(grow)
+        updated = Product.objects.filter(
+            pk__in=grow, is_available=True, stock__gte=F('reserved') + requested
+        ).update(reserved=F('reserved') + requested)
+        if updated != len(grow):
+            raise InsufficientStock(stock_shortages({pk: quantities[pk] for pk in grow}, current))
+    shrink = {pk: -delta for pk, delta in deltas.items() if delta < 0}
+    if shrink:
+        Product.objects.filter(pk__in=shrink).update(reserved=F('reserved') - _per_product(shrink))
+    if grow or shrink:
+        _stock_changed()
+
+    expires_at = timezone.now() + (ttl or reservation_ttl())
+    holds.exclude(product_id__in=quantities).delete()
+    StockReservation.objects.bulk_create(
+        [StockReservation(user_id=user_id, product_id=pk, quantity=qty, expires_at=expires_at)
+         for pk, qty in quantities.items()],
+        update_conflicts=True,
+        unique_fields=["user", "product"],
+        update_fields=["quantity", "expires_at"],
+    )
+    return expires_at
+
+
+def checkout_stock(user_id, quantities):
+    """
+    Take an order's ``{product_id: quantity}`` out of stock, converting
+    ``user_id``'s holds into the sale; holds on products that are not in the
+    order are released. Call it inside ``atomic()``.
+    """
+    holds = StockReservation.objects.select_for_update().filter(user_id=user_id)
+    current = dict(holds.values_list('product_id', 'quantity'))
+    held = {pk: qty for pk, qty in current.items() if pk in quantities}
+    decrement_stock(quantities, held)
+    if current:
+        holds.filter(product_id__in=held).delete()
+        release_reservations(holds)
+
+
+def release_reservations(reservations):
+    """Delete ``reservations`` (a queryset) and give their units back. Returns how many were released."""
+    rows = list(reservations.select_for_update().values_list('pk', 'product_id', 'quantity'))
+    if not rows:
+        return 0
+    released = defaultdict(int)
+    for _, product_id, quantity in rows:
+        released[product_id] += quantity
+    Product.objects.filter(pk__in=released).update(reserved=F('reserved') - _per_product(released))
+    StockReservation.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+    _stock_changed()
+    return len(rows)
+
+
+def expire_reservations(batch_size=500, now=None):
+    """Release holds that expired by ``now``, ``batch_size`` per transaction. Returns the total."""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                StockReservation.objects.filter(expires_at__lte=now)
+                .order_by('expires_at').values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                return total
+            # Re-check the expiry: a hold renewed since the SELECT stays
+            total += release_reservations(StockReservation.objects.filter(pk__in=batch, expires_at__lte=now))
+
+
+def reconcile_reserved():
+    """
+    Reset every ``Product.reserved`` to the sum of its ledger rows, e.g.
+    after holds were removed by a cascade delete. Returns the products fixed.
+    """
+    held = Coalesce(Subquery(
+        StockReservation.objects.filter(product=OuterRef('pk'))
+        .values('product').annotate(total=Sum('quantity')).values('total')
+    ), 0)
+    fixed = Product.objects.exclude(reserved=held).update(reserved=held)
+    if fixed:
+        _stock_changed()
+    return fixed
@@ -0,0 +1,96 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+
+# ---------------------------
+# Outbox
+# ---------------------------
+def enqueue_email(subject, body, to, from_email=None, reply_to=None):
+    """Store an email for the ``send_queued_email`` worker and return immediately."""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+        reply_to=list(reply_to or []),
+    )
+
+
+def claim_due_emails(batch_size, lease):
+    """
+    Lock up to ``batch_size`` due messages and push their next attempt past the
+    lease, so another worker will not pick them up while they are being sent.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status="Pending", next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        OutboundEmail.objects.filter(id__in=ids).update(next_attempt_at=now + lease)
+    return list(OutboundEmail.objects.filter(id__in=ids).order_by("id"))
+
+
+def record_failure(email, error, max_attempts, backoff):
+    """Count a failed attempt: retry after ``backoff * 2 ** (attempts - 1)``, or mark Failed."""
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= max_attempts:
+        email.status = "Failed"
+    else:
+        email.next_attempt_at = timezone.now() + backoff * 2 ** (email.attempts - 1)
+
+
+def send_queued_emails(batch_size=50, max_attempts=5, backoff=timedelta(minutes=1), lease=timedelta(minutes=5)):
+    """
+    Deliver one batch over a single SMTP connection. Failures, including
+    failing to connect, are retried with exponential backoff
+    (``backoff * 2 ** (attempts - 1)``) until ``max_attempts``, after which
+    the message is marked Failed.
+    Returns ``(sent, failed)`` counts for the batch.
+    """
+    emails = claim_due_emails(batch_size, lease)
+    if not emails:
+        return 0, 0
+
+    sent = failed = 0
+    pending = list(emails)
+    connection = get_connection()
+    try:
+        connection.open()
+        while pending:
+            email = pending.pop(0)
+            message = EmailMessage(
+                email.subject, email.body, email.from_email, email.to,
+                reply_to=email.reply_to or None, connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as e:
+                failed += 1
+                record_failure(email, e, max_attempts, backoff)
+            else:
+                sent += 1
+                email.attempts += 1
+                email.status = "Sent"
+                email.sent_at = timezone.now()
+                email.last_error = ""
+    except Exception as e:
+        # No connection: what is left of the batch counts as one failed attempt each
+        for email in pending:
+            record_failure(email, e, max_attempts, backoff)
+        failed += len(pending)
+    finally:
+        connection.close()
+        OutboundEmail.objects.bulk_update(
+            emails, ["status", "attempts", "next_attempt_at", "last_error", "sent_at"]
+        )
+    return sent, failed
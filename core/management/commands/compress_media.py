@@ -0,0 +1,33 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from whitenoise.compress import Compressor
+
+
+class Command(BaseCommand):
+    help = "Write .br/.gz siblings next to compressible files in MEDIA_ROOT for serve_media."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Recompress files that already have siblings.")
+
+    def handle(self, *args, **options):
+        # WhiteNoise's compressor: skips already-compressed formats (images,
+        # video, archives) and keeps a sibling only if it is actually smaller
+        compressor = Compressor(quiet=True)
+        written = 0
+        for root, _, files in os.walk(settings.MEDIA_ROOT):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith((".br", ".gz")) or not compressor.should_compress(name):
+                    continue
+                if not options["force"] and self.up_to_date(path):
+                    continue
+                written += len(compressor.compress(path))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} compressed files"))
+
+    @staticmethod
+    def up_to_date(path):
+        mtime = os.path.getmtime(path)
+        siblings = [path + suffix for suffix in (".br", ".gz") if os.path.exists(path + suffix)]
+        return bool(siblings) and all(os.path.getmtime(s) >= mtime for s in siblings)
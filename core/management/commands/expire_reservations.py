@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.inventory import expire_reservations, reconcile_reserved
+
+
+class Command(BaseCommand):
+    help = "Release expired stock reservations in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--loop", action="store_true", help="Keep sweeping instead of exiting when idle.")
+        parser.add_argument("--interval", type=float, default=30.0, help="Seconds to sleep between sweeps.")
+        parser.add_argument(
+            "--reconcile", action="store_true",
+            help="Also recompute Product.reserved from the reservation ledger.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            released = expire_reservations(batch_size=options["batch_size"])
+            if released:
+                self.stdout.write(f"Released {released} expired reservations")
+            if options["reconcile"]:
+                fixed = reconcile_reserved()
+                if fixed:
+                    self.stdout.write(f"Reconciled reserved stock of {fixed} products")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,42 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.catalog_io import FORMATS, export_rows, render_rows, without_sku
+
+
+class Command(BaseCommand):
+    help = "Stream every product to a CSV or JSON Lines file (same columns import_products reads)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Output file, or - for stdout.")
+        parser.add_argument("--format", choices=FORMATS, help="Default: from the file extension.")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+        if fmt not in FORMATS:
+            raise CommandError(f"Cannot tell the format of {path!r}; pass --format.")
+
+        exported = 0
+
+        def counted(rows):
+            nonlocal exported
+            for row in rows:
+                exported += 1
+                yield row
+
+        stream = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+        try:
+            for chunk in render_rows(counted(export_rows(chunk_size=options["chunk_size"])), fmt):
+                stream.write(chunk)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        if path != "-":
+            self.stdout.write(self.style.SUCCESS(f"Exported {exported} products to {path}"))
+        skipped = without_sku().count()
+        if skipped:
+            self.stderr.write(f"Skipped {skipped} products without a SKU; set one to export them")
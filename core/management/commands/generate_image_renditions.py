@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.images import generate_renditions, needs_renditions
+from core.models import Product
+
+
+class Command(BaseCommand):
+    help = "Render resized WebP/AVIF variants for product images that do not have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=200)
+        parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count, 0 = inline).")
+        parser.add_argument("--force", action="store_true", help="Re-render products that already have variants.")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        products = Product.objects.exclude(image="").only("id", "image", "image_variants").order_by("pk")
+        chunk, updated = [], 0
+        for product in products.iterator(chunk_size=chunk_size):
+            if options["force"] or needs_renditions(product):
+                chunk.append(product)
+            if len(chunk) >= chunk_size:
+                updated += generate_renditions(chunk, workers=options["workers"])
+                chunk = []
+        updated += generate_renditions(chunk, workers=options["workers"])
+        self.stdout.write(self.style.SUCCESS(f"Rendered images for {updated} products"))
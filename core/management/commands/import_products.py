@@ -0,0 +1,46 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.catalog_io import FORMATS, ProductImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = "Upsert products by SKU from a CSV or JSON Lines file, streaming it in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Input file, or - for stdin.")
+        parser.add_argument("--format", choices=FORMATS, help="Default: from the file extension.")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--create-categories", action="store_true",
+                            help="Create categories that are not in the tree yet.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+        if fmt not in FORMATS:
+            raise CommandError(f"Cannot tell the format of {path!r}; pass --format.")
+
+        def progress(importer):
+            self.stdout.write(f"  {importer.processed} rows processed")
+
+        importer = ProductImporter(
+            chunk_size=options["chunk_size"],
+            create_categories=options["create_categories"],
+            progress=progress,
+        )
+        stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        try:
+            importer.run(read_rows(stream, fmt))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for line_num, error in importer.errors:
+            self.stderr.write(f"line {line_num}: {error}")
+        if importer.skipped > len(importer.errors):
+            self.stderr.write(f"... and {importer.skipped - len(importer.errors)} more errors")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {importer.created}, updated {importer.updated}, skipped {importer.skipped} products"
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Product
+from core.response_cache import invalidate_catalog
+from core.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product full-text search index from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        if backend is None:
+            raise CommandError("No full-text search backend for this database.")
+
+        chunk_size = options["chunk_size"]
+        backend.clear()
+        chunk, total = [], 0
+        products = Product.objects.only("id", "name", "description").order_by("pk")
+        for product in products.iterator(chunk_size=chunk_size):
+            chunk.append(product)
+            if len(chunk) >= chunk_size:
+                backend.index(chunk)
+                total += len(chunk)
+                chunk = []
+        backend.index(chunk)
+        total += len(chunk)
+        invalidate_catalog()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} products"))
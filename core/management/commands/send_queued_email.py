@@ -0,0 +1,31 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.mail import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbound email in batches over a reused SMTP connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--max-attempts", type=int, default=5)
+        parser.add_argument("--backoff", type=int, default=60, help="Base retry delay in seconds.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting when idle.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds to sleep when idle.")
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_queued_emails(
+                batch_size=options["batch_size"],
+                max_attempts=options["max_attempts"],
+                backoff=timedelta(seconds=options["backoff"]),
+            )
+            if sent or failed:
+                self.stdout.write(f"Sent {sent}, failed {failed}")
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
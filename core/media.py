@@ -0,0 +1,183 @@
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+
+# Names carrying a content hash (core.images renditions, ManifestStaticFilesStorage)
+HASHED_NAME = re.compile(r"\.[0-9a-f]{12}\.\w+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Precompressed siblings tried in order, as WhiteNoise does for static files
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+def cache_control(path):
+    if HASHED_NAME.search(path):
+        return IMMUTABLE
+    return f"public, max-age={getattr(settings, 'MEDIA_MAX_AGE', 3600)}"
+
+
+def quality(params):
+    """The ``q`` weight among an Accept-Encoding entry's parameters (1 when absent, 0 when malformed)."""
+    for param in params:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def accepted_encodings(request):
+    """``{encoding: weight}`` the client accepts (weight > 0); ``*`` stands for any not listed."""
+    weights = {}
+    for part in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        name, *params = part.split(";")
+        name = name.strip().lower()
+        if name:
+            weights[name] = quality(params)
+    if "*" in weights:
+        for encoding, _ in ENCODINGS:
+            weights.setdefault(encoding, weights["*"])
+    return {name: q for name, q in weights.items() if q > 0}
+
+
+def find_variant(request, full_path):
+    """``(path, encoding)`` of the best precompressed file the client accepts, else the original."""
+    accepted = accepted_encodings(request)
+    # Highest weight first; ties keep the ENCODINGS order
+    for encoding, suffix in sorted(ENCODINGS, key=lambda e: -accepted.get(e[0], 0)):
+        if encoding in accepted and os.path.isfile(full_path + suffix):
+            return full_path + suffix, encoding
+    return full_path, None
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` inclusive for a single ``bytes=`` range, ``None`` to
+    ignore the header (multiple ranges, bad syntax), or ``"unsatisfiable"``.
+    """
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        start, end = max(0, size - int(last)), size - 1
+        if int(last) == 0:
+            return "unsatisfiable"
+    if start >= size:
+        return "unsatisfiable"
+    return start, end
+
+
+def if_range_matches(request, etag, mtime):
+    value = request.META.get("HTTP_IF_RANGE")
+    if value is None:
+        return True
+    if value.startswith('"'):
+        return value == etag
+    date = parse_http_date_safe(value)
+    return date is not None and int(mtime) <= date
+
+
+def read_range(path, start, length, block_size=64 * 1024):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(block_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+# ---------------------------
+# Media View
+# ---------------------------
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT with a strong ETag, Last-Modified,
+    conditional 304s, single byte-range requests and precompressed
+    ``.br``/``.gz`` siblings. With ``MEDIA_ACCEL_REDIRECT`` set (an internal
+    nginx location mapped to MEDIA_ROOT) the body is handed off to nginx
+    via X-Accel-Redirect instead of being streamed by the worker.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Not found")
+    if not os.path.isfile(full_path):
+        raise Http404("Not found")
+
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+    accel_prefix = getattr(settings, "MEDIA_ACCEL_REDIRECT", None)
+    if accel_prefix:
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + path.lstrip("/")
+        response["Cache-Control"] = cache_control(path)
+        return response
+
+    file_path, encoding = find_variant(request, full_path)
+    st = os.stat(file_path)
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404("Not found")
+    size, mtime = st.st_size, st.st_mtime
+    etag = f'"{st.st_mtime_ns:x}-{size:x}{"-" + encoding if encoding else ""}"'
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(mtime),
+        "Cache-Control": cache_control(path),
+        "Accept-Ranges": "bytes",
+    }
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(mtime))
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified[header] = value
+        return not_modified
+
+    byte_range = None
+    if "HTTP_RANGE" in request.META and if_range_matches(request, etag, mtime):
+        byte_range = parse_range(request.META["HTTP_RANGE"], size)
+
+    if byte_range == "unsatisfiable":
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+    elif byte_range is not None:
+        start, end = byte_range
+        length = end - start + 1
+        body = [] if request.method == "HEAD" else read_range(file_path, start, length)
+        response = StreamingHttpResponse(body, status=206, content_type=content_type)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(length)
+    elif request.method == "HEAD":
+        response = HttpResponse(content_type=content_type)
+        response["Content-Length"] = str(size)
+    else:
+        # FileResponse goes through wsgi.file_wrapper (sendfile) when the server offers it
+        response = FileResponse(open(file_path, "rb"), content_type=content_type)
+        response["Content-Length"] = str(size)
+
+    for header, value in headers.items():
+        response[header] = value
+    if encoding:
+        response["Content-Encoding"] = encoding
+    if os.path.isfile(full_path + ".br") or os.path.isfile(full_path + ".gz"):
+        patch_vary_headers(response, ["Accept-Encoding"])
+    return response
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:00
+
+from django.db import migrations, models
+
+
+def build_paths(apps, schema_editor):
+    Category = apps.get_model('core', 'Category')
+    categories = {c.pk: c for c in Category.objects.all()}
+
+    def path_of(category, seen=()):
+        if category.parent_id is None or category.parent_id not in categories or category.pk in seen:
+            return f"/{category.pk}/"
+        parent = categories[category.parent_id]
+        return f"{path_of(parent, seen + (category.pk,))}{category.pk}/"
+
+    for category in categories.values():
+        category.path = path_of(category)
+    Category.objects.bulk_update(categories.values(), ['path'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_cartitem_options_alter_category_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(build_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from core.search import get_search_backend
+
+
+def create_search_index(apps, schema_editor):
+    backend = get_search_backend(schema_editor.connection)
+    if backend is None:
+        return
+    Product = apps.get_model('core', 'Product')
+    backend.create_index(schema_editor, Product)
+    backend.index(
+        Product.objects.using(schema_editor.connection.alias).only('id', 'name', 'description').iterator()
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    backend = get_search_backend(schema_editor.connection)
+    if backend is not None:
+        backend.drop_index(schema_editor, apps.get_model('core', 'Product'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_category_path'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
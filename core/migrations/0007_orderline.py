@@ -0,0 +1,50 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_order_products(apps, schema_editor):
+    """Turn the cart items still attached to existing orders into order lines."""
+    Order = apps.get_model('core', 'Order')
+    OrderLine = apps.get_model('core', 'OrderLine')
+    through = Order.products.through
+    lines = []
+    for link in through.objects.select_related('cartitem__product').iterator():
+        item = link.cartitem
+        unit_price = item.product.discount_price or item.product.price
+        lines.append(OrderLine(
+            order_id=link.order_id,
+            product_id=item.product_id,
+            product_name=item.product.name,
+            unit_price=unit_price,
+            quantity=item.quantity,
+            line_total=unit_price * item.quantity,
+        ))
+    OrderLine.objects.bulk_create(lines, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_product_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_name', models.CharField(max_length=200)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.PositiveIntegerField()),
+                ('line_total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='core.order')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.product')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(copy_order_products, migrations.RunPython.noop),
+    ]
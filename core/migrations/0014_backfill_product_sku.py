@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.db.models import Q
+
+
+def backfill_skus(apps, schema_editor):
+    # Products created before 0011 have no SKU, which import_products needs
+    # to match exported rows back to them
+    Product = apps.get_model('core', 'Product')
+    products = Product.objects.using(schema_editor.connection.alias)
+    taken = set(products.exclude(sku=None).values_list('sku', flat=True))
+    missing = list(products.filter(Q(sku=None) | Q(sku='')).only('id'))
+    for product in missing:
+        sku = f"P{product.pk:06d}"
+        while sku in taken:
+            sku += "-1"
+        taken.add(sku)
+        product.sku = sku
+    products.bulk_update(missing, ['sku'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_product_effective_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_skus, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models import Case, F, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Concat, Round, Substr
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 # ---------------------------
 # Category Model
@@ -9,12 +12,39 @@ class Category(models.Model):
     parent = models.ForeignKey(
         'self', on_delete=models.SET_NULL, blank=True, null=True, related_name='subcategories'
     )
+    # Materialized path of ancestor ids including self, e.g. "/1/4/9/"
+    path = models.CharField(max_length=255, db_index=True, editable=False, blank=True)
 
     class Meta:
         verbose_name_plural = "Categories"
 
     def __str__(self):
-        return self.name if not self.parent else f"{self.parent} > {self.name}"
+        from .category_tree import CategoryTree
+        return CategoryTree.get().label(self)
+
+    def save(self, *args, **kwargs):
+        parent_path = "/"
+        if self.parent_id:
+            parent_path = Category.objects.values_list('path', flat=True).get(pk=self.parent_id)
+            if self.pk and f"/{self.pk}/" in parent_path:
+                raise ValueError("A category cannot be moved under its own descendant")
+
+        old_path = self.path
+        super().save(*args, **kwargs)
+        new_path = f"{parent_path}{self.pk}/"
+
+        if new_path != old_path:
+            Category.objects.filter(pk=self.pk).update(path=new_path)
+            if old_path:
+                # Re-root every descendant in a single UPDATE
+                Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(Value(new_path), Substr('path', len(old_path) + 1))
+                )
+            self.path = new_path
+
+    @property
+    def ancestor_ids(self):
+        return [int(pk) for pk in self.path.strip("/").split("/")[:-1] if pk]
 
 
 # ---------------------------
@@ -29,22 +59,76 @@ class Product(models.Model):
         ('Black','Black'), ('White','White')
     ]
 
+    # Supplier stock-keeping unit; the upsert key of import_products
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=200)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     discount_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    # What the customer pays and the discount off ``price`` in whole percent,
+    # computed and stored by the database, so every write path (save, update(),
+    # bulk_create upserts) keeps them in step and they can be indexed
+    effective_price = models.GeneratedField(
+        expression=Coalesce('discount_price', 'price'),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
+    discount_percent = models.GeneratedField(
+        expression=Case(
+            When(discount_price__lt=F('price'),
+                 # 100.0: SQLite stores whole-number decimals as integers and would divide as such
+                 then=Cast(Round((F('price') - F('discount_price')) * Value(100.0) / F('price')),
+                           models.IntegerField())),
+            default=Value(0),
+        ),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
     stock = models.PositiveIntegerField(default=0)
+    # Units held by StockReservations (core.inventory); available = stock - reserved
+    reserved = models.PositiveIntegerField(default=0, editable=False)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     size = models.CharField(max_length=2, choices=SIZE_CHOICES)
     color = models.CharField(max_length=20, choices=COLOR_CHOICES)
     image = models.ImageField(upload_to='products/')
+    # Resized WebP/AVIF renditions of ``image`` (see core.images):
+    # {"source": <image name>, "webp": {"<width>": <name>, ...}, ...}
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_available = models.BooleanField(default=True)
 
     class Meta:
         ordering = ['-created_at']
+        # Partial indexes over the storefront's rows (is_available=True). The
+        # single-column orderings end in the id tiebreaker, so sorted pages
+        # (page-number or keyset) are index range scans; the composite ones
+        # lead with a filter column and end in the column it is sorted by.
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='product_avail_created_idx',
+                         condition=models.Q(is_available=True)),
+            models.Index(fields=['price', 'id'], name='product_avail_price_idx',
+                         condition=models.Q(is_available=True)),
+            models.Index(fields=['rating', 'id'], name='product_avail_rating_idx',
+                         condition=models.Q(is_available=True)),
+            models.Index(fields=['discount_price', 'id'], name='product_avail_discount_idx',
+                         condition=models.Q(is_available=True)),
+            models.Index(fields=['effective_price', 'id'], name='product_avail_eff_price_idx',
+                         condition=models.Q(is_available=True)),
+            models.Index(fields=['discount_percent', 'id'], name='product_avail_disc_pct_idx',
+                         condition=models.Q(is_available=True)),
+            models.Index(fields=['category', 'effective_price'], name='product_avail_cat_eff_idx',
+                         condition=models.Q(is_available=True)),
+            models.Index(fields=['category', 'created_at'], name='product_avail_cat_created_idx',
+                         condition=models.Q(is_available=True)),
+            models.Index(fields=['category', 'price'], name='product_avail_cat_price_idx',
+                         condition=models.Q(is_available=True)),
+            models.Index(fields=['size', 'color', 'created_at'], name='product_avail_size_color_idx',
+                         condition=models.Q(is_available=True)),
+            models.Index(fields=['color', 'created_at'], name='product_avail_color_idx',
+                         condition=models.Q(is_available=True)),
+        ]
 
     def __str__(self):
         return self.name
@@ -53,12 +137,45 @@ class Product(models.Model):
 # ---------------------------
 # Cart Item
 # ---------------------------
+class CartItemQuerySet(models.QuerySet):
+    unit_price = F('product__effective_price')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+
+    def with_line_totals(self):
+        """Annotate ``unit_price`` (discount price when set) and ``line_total``."""
+        return self.annotate(
+            unit_price=self.unit_price,
+            line_total=models.ExpressionWrapper(F('quantity') * self.unit_price, output_field=self.amount),
+        )
+
+    def for_display(self):
+        """Everything CartItemSerializer renders, in one query."""
+        return self.select_related('product__category').with_line_totals()
+
+    def _totals(self):
+        return {
+            'item_count': Coalesce(Sum('quantity'), 0),
+            'total_amount': Coalesce(
+                Sum(F('quantity') * self.unit_price, output_field=self.amount), Value(0), output_field=self.amount
+            ),
+        }
+
+    def totals(self):
+        """Item count and amount due, summed in the database."""
+        return self.aggregate(**self._totals())
+
+    async def atotals(self):
+        return await self.aaggregate(**self._totals())
+
+
 class CartItem(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="cart_items")
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
     added_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         unique_together = ("user", "product")  # One product per user in cart
         ordering = ['-added_at']
@@ -67,6 +184,24 @@ class CartItem(models.Model):
         return f"{self.product.name} x {self.quantity}"
 
 
+# ---------------------------
+# Stock Reservation
+# ---------------------------
+class StockReservation(models.Model):
+    """A cart's time-limited hold on stock; the held units are counted in ``Product.reserved``."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="stock_reservations")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="reservations")
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("user", "product")
+
+    def __str__(self):
+        return f"{self.product_id} x {self.quantity} for {self.user_id} until {self.expires_at}"
+
+
 # ---------------------------
 # Order
 # ---------------------------
@@ -79,7 +214,6 @@ class Order(models.Model):
     ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")
-    products = models.ManyToManyField(CartItem)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     shipping_address = models.TextField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="Pending")
@@ -90,3 +224,55 @@ class Order(models.Model):
 
     def __str__(self):
         return f"Order #{self.id} - {self.user.username} - {self.status}"
+
+
+# ---------------------------
+# Order Line
+# ---------------------------
+class OrderLine(models.Model):
+    """Snapshot of a purchased product, independent of later cart or catalog changes."""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="lines")
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, blank=True, null=True, related_name="+")
+    product_name = models.CharField(max_length=200)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField()
+    line_total = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.product_name} x {self.quantity}"
+
+
+# ---------------------------
+# Outbound Email
+# ---------------------------
+class OutboundEmail(models.Model):
+    """Queued email, delivered by the ``send_queued_email`` worker."""
+    STATUS_CHOICES = [
+        ("Pending", "Pending"),
+        ("Sent", "Sent"),
+        ("Failed", "Failed"),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    reply_to = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="Pending")
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
@@ -0,0 +1,50 @@
+from .models import Order
+
+# One CSV row per order line (order columns repeated); an order without lines
+# still gets a row. NDJSON nests the lines under each order instead.
+ORDER_COLUMNS = [
+    "order_id", "ordered_at", "status", "total_amount", "shipping_address",
+    "user_id", "username", "email",
+]
+LINE_COLUMNS = ["product_id", "product_name", "unit_price", "quantity", "line_total"]
+CSV_COLUMNS = ORDER_COLUMNS + [f"line_{c}" for c in LINE_COLUMNS]
+
+
+def iter_orders(queryset=None, chunk_size=2000):
+    """
+    Yield ``(order dict, [line dicts])`` oldest first. ``.iterator()`` runs on
+    a server-side cursor where the database has one, and lines are prefetched
+    per chunk, so memory stays flat however many orders match.
+    """
+    if queryset is None:
+        queryset = Order.objects.all()
+    orders = (
+        queryset.select_related("user")
+        .prefetch_related("lines")
+        .order_by("ordered_at", "pk")
+        .iterator(chunk_size=chunk_size)
+    )
+    for order in orders:
+        yield (
+            {
+                "order_id": order.pk,
+                "ordered_at": order.ordered_at.isoformat(),
+                "status": order.status,
+                "total_amount": order.total_amount,
+                "shipping_address": order.shipping_address,
+                "user_id": order.user_id,
+                "username": order.user.username,
+                "email": order.user.email,
+            },
+            [{c: getattr(line, c) for c in LINE_COLUMNS} for line in order.lines.all()],
+        )
+
+
+def order_rows(orders, fmt):
+    """Shape ``iter_orders`` output for ``render_rows``: flat lines for CSV, nested for NDJSON."""
+    for order, lines in orders:
+        if fmt == "csv":
+            for line in lines or [{}]:
+                yield {**order, **{f"line_{c}": line.get(c, "") for c in LINE_COLUMNS}}
+        else:
+            yield {**order, "lines": lines}
@@ -0,0 +1,168 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+# ---------------------------
+# Page Number Pagination
+# ---------------------------
+class StandardResultsSetPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+
+# ---------------------------
+# Keyset (Cursor) Pagination
+# ---------------------------
+class KeysetPagination(BasePagination):
+    """
+    Seek-based pagination on ``(ordering field, pk)``. Each page is a
+    ``WHERE (field, pk) > (last value, last pk) ... LIMIT n`` query, so its cost
+    does not grow with depth and no ``COUNT(*)`` runs unless ``?count=true``.
+
+    The ordering comes from the view's OrderingFilter (one field out of
+    ``ordering_fields``), with the primary key as a unique tiebreaker. NULLs
+    sort first ascending and last descending on every database.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.field, self.descending = self.get_ordering(request, queryset, view)
+
+        cursor = self.decode_cursor(request, queryset.model)
+        reverse = cursor is not None and cursor['r']
+        descending = self.descending != reverse
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = queryset.count()
+
+        if cursor is not None:
+            queryset = queryset.filter(self.seek(cursor['v'], cursor['pk'], descending))
+        queryset = queryset.order_by(*self.order_by(descending))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = cursor is not None and (has_more if reverse else True)
+        self.first = results[0] if results else None
+        self.last = results[-1] if results else None
+        return results
+
+    def get_paginated_response(self, data):
+        body = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            body['count'] = self.count
+        body['results'] = data
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = []
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view) or []
+                break
+        field = ordering[0] if ordering else '-pk'
+        return field.lstrip('-'), field.startswith('-')
+
+    def order_by(self, descending):
+        if descending:
+            return [F(self.field).desc(nulls_last=True), F('pk').desc()]
+        return [F(self.field).asc(nulls_first=True), F('pk').asc()]
+
+    def seek(self, value, pk, descending):
+        """Rows strictly after ``(value, pk)`` in the given direction."""
+        field = self.field
+        if descending:
+            if value is None:
+                return Q(**{f'{field}__isnull': True, 'pk__lt': pk})
+            return (
+                Q(**{f'{field}__lt': value})
+                | Q(**{field: value, 'pk__lt': pk})
+                | Q(**{f'{field}__isnull': True})
+            )
+        if value is None:
+            return Q(**{f'{field}__isnull': True, 'pk__gt': pk}) | Q(**{f'{field}__isnull': False})
+        return Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+
+    def ordering_key(self):
+        return f"{'-' if self.descending else ''}{self.field}"
+
+    def encode_cursor(self, instance, reverse):
+        value = getattr(instance, self.field)
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        payload = {'o': self.ordering_key(), 'v': value, 'pk': instance.pk, 'r': reverse}
+        token = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode())
+        return replace_query_param(self.base_url, self.cursor_query_param, token.decode())
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(token.encode()))
+            if cursor['o'] != self.ordering_key() or type(cursor['pk']) is not int:
+                raise ValueError
+            # Back to the ordering field's type, so a tampered value is a 404, not a query error
+            field = model._meta.pk if self.field == 'pk' else model._meta.get_field(self.field)
+            cursor['v'] = getattr(field, 'output_field', field).to_python(cursor['v'])
+            cursor['r'] = bool(cursor['r'])
+        except (binascii.Error, ValueError, KeyError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.last, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.first, reverse=True)
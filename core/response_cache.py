@@ -0,0 +1,152 @@
+import hashlib
+import time
+import uuid
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .routers import is_pinned, replica_reads, replicas, replication_lag
+
+VERSION_CACHE_KEY = "core:catalog-version"
+
+
+def catalog_cache():
+    return caches[getattr(settings, "CATALOG_CACHE_ALIAS", "default")]
+
+
+# ---------------------------
+# Catalog Version
+# ---------------------------
+def catalog_version():
+    """
+    Current ``{"version", "changed_at"}`` state of the catalog. Every cached
+    response is keyed by the version, so bumping it invalidates them all.
+    """
+    state = catalog_cache().get(VERSION_CACHE_KEY)
+    if state is None:
+        state = bump_catalog_version()
+    return state
+
+
+def bump_catalog_version():
+    state = {"version": uuid.uuid4().hex, "changed_at": time.time()}
+    catalog_cache().set(VERSION_CACHE_KEY, state, None)
+    return state
+
+
+def invalidate_catalog():
+    """
+    Bump now, and again once the surrounding transaction commits so nothing
+    cached from pre-commit reads survives.
+    """
+    bump_catalog_version()
+    transaction.on_commit(bump_catalog_version)
+
+
+def catalog_last_modified(state):
+    """Newest ``Product.updated_at`` (or the last version bump), once per version."""
+    key = f"core:catalog-last-modified:{state['version']}"
+    cache = catalog_cache()
+    last_modified = cache.get(key)
+    if last_modified is None:
+        from .models import Product
+        newest = Product.objects.aggregate(newest=Max("updated_at"))["newest"]
+        last_modified = max(newest.timestamp() if newest else 0, state["changed_at"])
+        cache.set(key, last_modified)
+    return last_modified
+
+
+def response_cache_key(request, version, allowed):
+    """
+    Key on scheme, host, path, renderer and the ``allowed`` query parameters,
+    sorted. Bodies carry absolute URLs (pagination links, image srcsets), so
+    the host is part of the key; parameters the view ignores are left out so
+    they cannot fill the cache with copies of the same response.
+    """
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        if key in allowed
+        for value in request.query_params.getlist(key)
+    )
+    digest = hashlib.sha1(repr(params).encode()).hexdigest()
+    renderer = getattr(request, "accepted_media_type", "")
+    origin = f"{request.scheme}://{request.get_host()}"
+    return f"core:catalog:{version}:{origin}{request.path}:{renderer}:{digest}"
+
+
+# ---------------------------
+# Cached Catalog Views
+# ---------------------------
+class CachedCatalogMixin:
+    """
+    Caches the rendered body of successful GETs under the catalog version and
+    answers conditional requests (If-None-Match / If-Modified-Since) with a 304
+    before any queryset or serializer work. Permission checks still run first,
+    as ``get`` is only dispatched after ``initial()``.
+
+    With read replicas, a user pinned to the primary by a recent write skips
+    the shared cache, and a miss shortly after a version bump is filled from
+    the primary, so a page read from a lagging replica is never cached under
+    the new version.
+    """
+    cache_timeout = 300
+    cache_control = {"max_age": 0, "must_revalidate": True}
+    # Query parameters the view reads besides its filterset's fields
+    cache_query_params = ()
+
+    def get_cache_query_params(self):
+        params = set(self.cache_query_params)
+        filterset_class = getattr(self, "filterset_class", None)
+        if filterset_class is not None:
+            params.update(filterset_class.base_filters)
+        return params
+
+    def get_last_modified(self, state):
+        return catalog_last_modified(state)
+
+    def get(self, request, *args, **kwargs):
+        if not getattr(settings, "CATALOG_RESPONSE_CACHE", True):
+            return super().get(request, *args, **kwargs)
+        if replicas() and is_pinned(request.user.pk):
+            return super().get(request, *args, **kwargs)  # read-your-writes, from the primary
+        state = catalog_version()
+        cache = catalog_cache()
+        key = response_cache_key(request, state["version"], self.get_cache_query_params())
+        entry = cache.get(key)
+
+        if entry is None:
+            lagging = replicas() and time.time() - state["changed_at"] < replication_lag()
+            with replica_reads(False) if lagging else nullcontext():
+                response = super().get(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                response.accepted_renderer = request.accepted_renderer
+                response.accepted_media_type = request.accepted_media_type
+                response.renderer_context = self.get_renderer_context()
+                response.render()
+                entry = {
+                    "content": response.content,
+                    "content_type": response["Content-Type"],
+                    "etag": quote_etag(hashlib.sha1(response.content).hexdigest()),
+                    "last_modified": self.get_last_modified(state),
+                }
+            cache.set(key, entry, self.cache_timeout)
+
+        response = HttpResponse(entry["content"], content_type=entry["content_type"])
+        response["ETag"] = entry["etag"]
+        response["Last-Modified"] = http_date(entry["last_modified"])
+        patch_cache_control(response, **self.cache_control)
+        return get_conditional_response(
+            request._request,
+            etag=entry["etag"],
+            last_modified=int(entry["last_modified"]),
+            response=response,
+        )
+
@@ -0,0 +1,133 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY = "core:db-pin:{}"
+
+_replica_reads = ContextVar("core_replica_reads", default=False)
+
+
+def replicas():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Let reads inside the block go to a replica (writes always use the primary)."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+# ---------------------------
+# Read-your-writes Pinning
+# ---------------------------
+def pin_to_primary(user_id):
+    """Serve ``user_id``'s reads from the primary until the replicas have caught up."""
+    cache.set(PIN_KEY.format(user_id), True, replication_lag())
+
+
+def is_pinned(user_id):
+    return user_id is not None and cache.get(PIN_KEY.format(user_id)) is not None
+
+
+def replication_lag():
+    """Seconds the replicas may trail the primary; also how long a writer stays pinned."""
+    return getattr(settings, "REPLICA_PIN_SECONDS", 10)
+
+
+class PinAfterWriteMiddleware:
+    """
+    Pins a user to the primary after any successful unsafe request they make,
+    so their next catalog reads see their own writes despite replication lag.
+    Reads ``request.user`` after the view, which DRF sets once it has
+    authenticated the request. Unused without ``DATABASE_REPLICAS``; runs in
+    the handler's own mode under both WSGI and ASGI.
+    """
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        if not replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.pin_writer(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            # request.user may still be lazy, and the pin is a cache write
+            await sync_to_async(self.pin_writer)(request, response)
+        return response
+
+    @staticmethod
+    def pin_writer(request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
+
+
+class ReplicaReadsMixin:
+    """
+    For read-only API views: safe requests read from the replicas unless the
+    user is pinned to the primary by a recent write of their own.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads(False):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if replicas() and request.method in SAFE_METHODS and not is_pinned(request.user.pk):
+            _replica_reads.set(True)  # reset when dispatch() leaves replica_reads()
+
+
+# ---------------------------
+# Router
+# ---------------------------
+class ReplicaRouter:
+    """
+    Writes, migrations and ordinary reads go to ``default``. Reads made inside
+    ``replica_reads()`` (the catalog list views) go to a random alias from
+    ``DATABASE_REPLICAS``, except lookups from an instance, which stay on
+    the database the instance came from.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        aliases = replicas()
+        if aliases and _replica_reads.get():
+            return random.choice(aliases)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replicas()
@@ -0,0 +1,149 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+FTS_TABLE = "core_product_fts"
+
+
+def tokenize(query):
+    """Split a user query into plain word tokens (no search syntax allowed)."""
+    return re.findall(r"\w+", query.lower())
+
+
+# ---------------------------
+# SQLite FTS5 Backend
+# ---------------------------
+class SQLiteSearchBackend:
+    """
+    Keeps an FTS5 table (rowid = product id) in sync with ``core_product`` and
+    ranks matches with bm25, weighting the name above the description.
+    """
+    vendor = "sqlite"
+
+    def __init__(self, connection=connection):
+        self.connection = connection
+
+    def create_index(self, schema_editor, model):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5(name, description, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    def drop_index(self, schema_editor, model):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    def index(self, products):
+        rows = [(p.pk, p.name, p.description) for p in products]
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(r[0],) for r in rows])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)", rows
+            )
+
+    def remove(self, product_ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in product_ids])
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+    def match_expression(self, terms):
+        # Every term must match; the last one is treated as a prefix (typeahead)
+        tokens = [f'"{t}"' for t in terms]
+        if tokens:
+            tokens[-1] += "*"
+        return " ".join(tokens)
+
+    def search(self, queryset, terms):
+        match = self.match_expression(terms)
+        table = queryset.model._meta.db_table
+        return queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        ).annotate(
+            search_rank=RawSQL(
+                f"SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id",
+                [match],
+            )
+        )
+
+
+# ---------------------------
+# PostgreSQL Backend
+# ---------------------------
+class PostgresSearchBackend:
+    """
+    Uses a weighted ``tsvector`` expression backed by a GIN expression index,
+    so the index follows the row and no extra bookkeeping is needed on save.
+    """
+    vendor = "postgresql"
+    config = "english"
+    index_name = "core_product_search_gin"
+
+    def __init__(self, connection=connection):
+        self.connection = connection
+
+    def vector(self):
+        from django.contrib.postgres.search import SearchVector
+        return (
+            SearchVector("name", weight="A", config=self.config)
+            + SearchVector("description", weight="B", config=self.config)
+        )
+
+    def index_definition(self):
+        # Compiled from vector() itself, so the indexed expression is exactly
+        # the one search() filters on and the planner can use the index
+        from django.contrib.postgres.indexes import GinIndex
+        return GinIndex(self.vector(), name=self.index_name)
+
+    def create_index(self, schema_editor, model):
+        schema_editor.add_index(model, self.index_definition())
+
+    def drop_index(self, schema_editor, model):
+        schema_editor.remove_index(model, self.index_definition())
+
+    def index(self, products):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, queryset, terms):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        raw = " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+        query = SearchQuery(raw, search_type="raw", config=self.config)
+        vector = self.vector()
+        return queryset.annotate(search_document=vector).filter(search_document=query).annotate(
+            search_rank=SearchRank(vector, query)
+        )
+
+
+BACKENDS = {
+    "sqlite": SQLiteSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_search_backend(using=None):
+    """
+    Backend configured by ``PRODUCT_SEARCH_BACKEND`` (a dotted path), otherwise
+    the one matching the database vendor, bound to ``using`` (a connection,
+    the default one when omitted). Returns None when there is no full-text
+    backend for the database, in which case callers fall back to plain
+    ``icontains`` search.
+    """
+    using = using or connection
+    path = getattr(settings, "PRODUCT_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)(using)
+    backend = BACKENDS.get(using.vendor)
+    return backend(using) if backend else None
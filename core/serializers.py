@@ -2,7 +2,11 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from rest_framework.validators import UniqueValidator
 from django.contrib.auth.password_validation import validate_password
-from .models import Product, Category, CartItem, Order
+from django.core.files.storage import default_storage
+from .category_tree import CategoryTree
+from .images import srcset
+from .instrumentation import TimedSerializerMixin
+from .models import Product, Category, CartItem, Order, OrderLine
 
 # ---------------------------
 # User Registration Serializer
@@ -38,7 +42,7 @@ class RegisterSerializer(serializers.ModelSerializer):
 # ---------------------------
 # User Serializer
 # ---------------------------
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ("id", "username", "email")
@@ -57,52 +61,118 @@ class ContactSerializer(serializers.Serializer):
 # ---------------------------
 # Category Serializer
 # ---------------------------
-class CategorySerializer(serializers.ModelSerializer):
-    subcategories = serializers.StringRelatedField(many=True, read_only=True)
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # Read from the cached category tree instead of one query per category
+    subcategories = serializers.SerializerMethodField()
 
     class Meta:
         model = Category
         fields = ('id', 'name', 'parent', 'subcategories')
 
+    def get_subcategories(self, obj):
+        # Look the tree up once per serialization, not once per row
+        if 'category_tree' not in self.context:
+            self.context['category_tree'] = CategoryTree.get()
+        tree = self.context['category_tree']
+        return [tree.label(sub) for sub in tree.children(obj.pk)]
+
 
 # ---------------------------
 # Product Serializer
 # ---------------------------
-class ProductSerializer(serializers.ModelSerializer):
+class ImageVariantsField(serializers.ReadOnlyField):
+    """``{format: srcset}`` for the stored renditions, absolute when a request is in context."""
+
+    def to_representation(self, value):
+        request = self.context.get("request")
+        if request is None:
+            return srcset(value)
+        return srcset(value, url=lambda name: request.build_absolute_uri(default_storage.url(name)))
+
+
+class ProductSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(), source='category', write_only=True
     )
+    image_variants = ImageVariantsField()
+    # Generated columns (see Product)
+    effective_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    discount_percent = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'description', 'price', 'discount_price', 'rating',
-            'stock', 'category', 'category_id', 'size', 'color', 'image', 'is_available'
+            'id', 'sku', 'name', 'description', 'price', 'discount_price', 'effective_price',
+            'discount_percent', 'rating', 'stock', 'category', 'category_id', 'size', 'color',
+            'image', 'image_variants', 'is_available'
         ]
 
 
 # ---------------------------
 # Cart Item Serializer
 # ---------------------------
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     product_id = serializers.PrimaryKeyRelatedField(
         queryset=Product.objects.all(), source="product", write_only=True
     )
+    # Annotated by CartItemQuerySet.with_line_totals()
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    line_total = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = CartItem
-        fields = ["id", "product", "product_id", "quantity"]
+        fields = ["id", "product", "product_id", "quantity", "unit_price", "line_total"]
+
+
+# ---------------------------
+# Bulk Cart Serializer
+# ---------------------------
+class CartOperationSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=["add", "update", "remove"])
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(
+        min_value=1, default=1, error_messages={"min_value": "Quantity must be at least 1."}
+    )
+
+
+class AddToCartSerializer(CartOperationSerializer):
+    action = serializers.HiddenField(default="add")
+
+    def validate_product_id(self, product_id):
+        if not Product.objects.filter(pk=product_id, is_available=True).exists():
+            raise serializers.ValidationError("Unknown or unavailable product.")
+        return product_id
+
+
+class BulkCartSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=200)
+
+    def validate_operations(self, operations):
+        product_ids = {op["product_id"] for op in operations if op["action"] != "remove"}
+        found = set(Product.objects.filter(pk__in=product_ids, is_available=True).values_list("pk", flat=True))
+        missing = sorted(product_ids - found)
+        if missing:
+            raise serializers.ValidationError(f"Unknown or unavailable products: {missing}")
+        return operations
 
 
 # ---------------------------
 # Order Serializer
 # ---------------------------
-class OrderSerializer(serializers.ModelSerializer):
-    products = CartItemSerializer(many=True, read_only=True)
+class OrderLineSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    product_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = OrderLine
+        fields = ["product_id", "product_name", "unit_price", "quantity", "line_total"]
+
+
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    lines = OrderLineSerializer(many=True, read_only=True)
     user = UserSerializer(read_only=True)
 
     class Meta:
         model = Order
-        fields = ["id", "user", "products", "total_amount", "shipping_address", "status", "ordered_at"]
+        fields = ["id", "user", "lines", "total_amount", "shipping_address", "status", "ordered_at"]
@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.functions import Substr
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import forget_cached_user, revoke_user_tokens
+from .category_tree import CategoryTree
+from .images import delete_renditions, drop_renditions, needs_renditions, render_in_background
+from .models import Category, Product
+from .response_cache import invalidate_catalog
+from .search import get_search_backend
+
+
+# ---------------------------
+# Category Tree
+# ---------------------------
+def _invalidate_category_tree():
+    CategoryTree.invalidate()
+    transaction.on_commit(CategoryTree.invalidate)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, **kwargs):
+    _invalidate_category_tree()
+    invalidate_catalog()
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    # Children were detached by SET_NULL; re-root their subtrees.
+    if instance.path:
+        Category.objects.filter(path__startswith=instance.path).exclude(pk=instance.pk).update(
+            path=Substr('path', len(instance.path))
+        )
+    _invalidate_category_tree()
+    invalidate_catalog()
+
+
+# ---------------------------
+# Product Search Index
+# ---------------------------
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    backend = get_search_backend()
+    if backend is not None:
+        backend.index([instance])
+    invalidate_catalog()
+
+
+# ---------------------------
+# Image Renditions
+# ---------------------------
+@receiver(post_save, sender=Product)
+def render_product_image(sender, instance, raw=False, **kwargs):
+    # New or replaced upload: render its variants in the background once the
+    # row is committed (store_renditions deletes the ones they replace). A
+    # removed image takes its renditions with it.
+    if raw:
+        return
+    if not instance.image and instance.image_variants:
+        transaction.on_commit(lambda: drop_renditions(instance))
+    elif getattr(settings, "PRODUCT_IMAGE_RENDITIONS_ON_SAVE", True) and needs_renditions(instance):
+        transaction.on_commit(lambda: render_in_background(instance.pk))
+
+
+@receiver(post_delete, sender=Product)
+def delete_product_renditions(sender, instance, **kwargs):
+    variants = instance.image_variants
+    if variants:
+        transaction.on_commit(lambda: delete_renditions(variants))
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    backend = get_search_backend()
+    if backend is not None:
+        backend.remove([instance.pk])
+    invalidate_catalog()
+
+
+# ---------------------------
+# Cached Users (stateless JWT)
+# ---------------------------
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def forget_user(sender, instance, **kwargs):
+    forget_cached_user(instance.pk)
+
+
+# Token claims carry these, so a change has to invalidate the user's tokens
+ACCESS_FIELDS = ("is_active", "is_staff")
+
+
+@receiver(pre_save, sender=get_user_model())
+def note_access_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._access_changed = False
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not set(ACCESS_FIELDS) & set(update_fields):
+        return  # e.g. the last_login update on every login
+    old = sender.objects.filter(pk=instance.pk).values(*ACCESS_FIELDS).first()
+    instance._access_changed = old is not None and any(old[f] != getattr(instance, f) for f in ACCESS_FIELDS)
+
+
+@receiver(post_save, sender=get_user_model())
+def revoke_tokens_on_access_change(sender, instance, **kwargs):
+    if getattr(instance, "_access_changed", False):
+        revoke_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=get_user_model())
+def revoke_tokens_on_delete(sender, instance, **kwargs):
+    revoke_user_tokens(instance.pk)
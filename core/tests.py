@@ -1,3 +1,1705 @@
-from django.test import TestCase
+import base64
+import copy
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+from datetime import datetime, timedelta, timezone as dt_timezone
+from importlib import import_module
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.db.utils import ConnectionHandler
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend.db_profiles import apply_profile
+
+from . import views
+from .authentication import CachedTokenUser, StatelessJWTAuthentication, get_cached_user
+from .category_tree import CategoryTree
+from .images import generate_renditions, render_product
+from .instrumentation import QueryStatsMiddleware, RequestStats, install_query_recorder, registry as query_stats
+from .inventory import reconcile_reserved, reserve_stock
+from .mail import send_queued_emails
+from .models import CartItem, Category, Order, OrderLine, OutboundEmail, Product, StockReservation
+from .response_cache import VERSION_CACHE_KEY, bump_catalog_version
+from .routers import PinAfterWriteMiddleware, ReplicaRouter, pin_to_primary, replica_reads
+
+
+def make_product(category, **kwargs):
+    fields = {
+        "name": "Product",
+        "description": "A product",
+        "price": Decimal("10.00"),
+        "stock": 10,
+        "size": "M",
+        "color": "Red",
+        "image": "products/test.png",
+    }
+    fields.update(kwargs)
+    return Product.objects.create(category=category, **fields)
+
+
+class CatalogTestCase(TestCase):
+    """Starts every test with an empty catalog cache."""
+    def setUp(self):
+        caches["catalog"].clear()
+
+
+# ---------------------------
+# Product List
+# ---------------------------
+class ProductListQueryTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        root = Category.objects.create(name="Clothing")
+        men = Category.objects.create(name="Men", parent=root)
+        shirts = Category.objects.create(name="Shirts", parent=men)
+        Category.objects.create(name="Formal", parent=shirts)
+        Category.objects.create(name="Casual", parent=shirts)
+        jeans = Category.objects.create(name="Jeans", parent=men)
+        for i in range(40):
+            make_product(shirts if i % 2 else jeans, name=f"Item {i}")
+
+    def setUp(self):
+        super().setUp()
+        CategoryTree.get()
+        self.client.get(reverse("product-list"))  # warm the catalog version
+
+    def query_count(self, page_size):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("product-list"), {"page_size": page_size})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), page_size)
+        return len(ctx.captured_queries), response
+
+    def test_query_count_independent_of_page_size(self):
+        small, _ = self.query_count(2)
+        large, _ = self.query_count(40)
+        self.assertEqual(small, large)
+        # count + page; the category tree is served from memory
+        self.assertEqual(large, 2)
+
+    def test_category_paths_rendered(self):
+        _, response = self.query_count(10)
+        shirt = next(p for p in response.json()["results"] if p["category"]["name"] == "Shirts")
+        self.assertEqual(
+            sorted(shirt["category"]["subcategories"]),
+            ["Clothing > Men > Shirts > Casual", "Clothing > Men > Shirts > Formal"],
+        )
+
+
+# ---------------------------
+# Category Tree
+# ---------------------------
+class CategoryTreeTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = Category.objects.create(name="Clothing")
+        self.men = Category.objects.create(name="Men", parent=self.root)
+        self.shirts = Category.objects.create(name="Shirts", parent=self.men)
+        self.other = Category.objects.create(name="Shoes")
+
+    def test_paths_maintained_on_create(self):
+        self.assertEqual(self.shirts.path, f"/{self.root.pk}/{self.men.pk}/{self.shirts.pk}/")
+        self.assertEqual(str(self.shirts), "Clothing > Men > Shirts")
+
+    def test_move_reroots_descendants(self):
+        self.men.parent = self.other
+        self.men.save()
+        self.shirts.refresh_from_db()
+        self.assertEqual(self.shirts.path, f"/{self.other.pk}/{self.men.pk}/{self.shirts.pk}/")
+        self.assertEqual(str(self.shirts), "Shoes > Men > Shirts")
+
+    def test_cannot_move_under_descendant(self):
+        self.root.parent = self.shirts
+        with self.assertRaises(ValueError):
+            self.root.save()
+
+    def test_delete_reroots_children(self):
+        self.men.delete()
+        self.shirts.refresh_from_db()
+        self.assertIsNone(self.shirts.parent_id)
+        self.assertEqual(self.shirts.path, f"/{self.shirts.pk}/")
+        self.assertEqual(str(self.shirts), "Shirts")
+
+    def test_category_list_single_query(self):
+        CategoryTree.invalidate()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("category-list"))
+        root = next(c for c in response.json() if c["id"] == self.root.pk)
+        self.assertEqual(root["subcategories"], ["Clothing > Men"])
+
+    def test_category_list_nested(self):
+        response = self.client.get(reverse("category-list"), {"tree": "true"})
+        clothing = next(c for c in response.json() if c["id"] == self.root.pk)
+        self.assertEqual(clothing["children"][0]["children"][0]["name"], "Shirts")
+
+    def test_product_filter_includes_descendants(self):
+        make_product(self.shirts, name="Oxford")
+        make_product(self.men, name="Belt")
+        make_product(self.other, name="Boot")
+        response = self.client.get(reverse("product-list"), {"category_tree": self.root.pk})
+        names = sorted(p["name"] for p in response.json()["results"])
+        self.assertEqual(names, ["Belt", "Oxford"])
+
+
+# ---------------------------
+# Product Search
+# ---------------------------
+class ProductSearchTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Tops")
+        cls.hoodie = make_product(cls.category, name="Zip Hoodie", description="Warm fleece")
+        cls.tee = make_product(cls.category, name="Graphic Tee", description="Goes well with a hoodie")
+        make_product(cls.category, name="Denim Jacket", description="Classic blue")
+
+    def search(self, term, **params):
+        response = self.client.get(reverse("product-list"), {"search": term, **params})
+        self.assertEqual(response.status_code, 200)
+        return [p["name"] for p in response.json()["results"]]
+
+    def test_ranked_by_relevance(self):
+        self.assertEqual(self.search("hoodie"), ["Zip Hoodie", "Graphic Tee"])
+
+    def test_prefix_matching(self):
+        self.assertEqual(self.search("den"), ["Denim Jacket"])
+        self.assertEqual(self.search("warm flee"), ["Zip Hoodie"])
+
+    def test_explicit_ordering_wins(self):
+        self.tee.price = Decimal("1.00")
+        self.tee.save()
+        self.assertEqual(self.search("hoodie", ordering="price"), ["Graphic Tee", "Zip Hoodie"])
+
+    def test_index_follows_save_and_delete(self):
+        self.hoodie.name = "Pullover"
+        self.hoodie.save()
+        self.assertEqual(self.search("pullover"), ["Pullover"])
+        self.hoodie.delete()
+        self.assertEqual(self.search("pullover"), [])
+
+    def test_rebuild_command(self):
+        from .search import get_search_backend
+        get_search_backend().clear()
+        self.assertEqual(self.search("denim"), [])
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self.search("denim"), ["Denim Jacket"])
+
+    def test_postgres_index_is_the_query_expression(self):
+        from .search import PostgresSearchBackend
+        backend = PostgresSearchBackend()
+        self.assertEqual(backend.index_definition().expressions, (backend.vector(),))
+
+
+# ---------------------------
+# Keyset Pagination
+# ---------------------------
+class KeysetPaginationTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Bags")
+        for i in range(23):
+            make_product(
+                category,
+                name=f"Bag {i}",
+                price=Decimal(10 + i % 4),  # plenty of ties
+                rating=Decimal(i % 5),
+                discount_price=Decimal(5 + i % 3) if i % 2 else None,
+            )
+
+    def walk(self, ordering, page_size=4):
+        url = reverse("product-list")
+        params = {"pagination": "cursor", "ordering": ordering, "page_size": page_size}
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.json())
+            pages.append(response.json())
+            ids.extend(p["id"] for p in response.json()["results"])
+            url, params = response.json()["next"], {}
+        return ids, pages
+
+    def expected(self, ordering):
+        field = ordering.lstrip("-")
+        desc = ordering.startswith("-")
+        expr = F(field).desc(nulls_last=True) if desc else F(field).asc(nulls_first=True)
+        return list(
+            Product.objects.order_by(expr, "-pk" if desc else "pk").values_list("pk", flat=True)
+        )
+
+    def test_every_ordering_field_visits_each_row_once(self):
+        for field in ["price", "rating", "created_at", "discount_price"]:
+            for ordering in (field, f"-{field}"):
+                with self.subTest(ordering=ordering):
+                    ids, _ = self.walk(ordering)
+                    self.assertEqual(ids, self.expected(ordering))
+
+    def test_previous_link_walks_back(self):
+        _, pages = self.walk("-discount_price")
+        response = self.client.get(pages[-1]["previous"])
+        self.assertEqual(response.json()["results"], pages[-2]["results"])
+        self.assertIsNotNone(response.json()["previous"])
+
+    def test_page_queries_do_not_include_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("product-list"), {"pagination": "cursor"})
+        self.assertFalse(any("COUNT(" in q["sql"] for q in ctx.captured_queries))
+
+    def test_optional_count(self):
+        response = self.client.get(reverse("product-list"), {"pagination": "cursor", "count": "true"})
+        self.assertEqual(response.json()["count"], 23)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("product-list"), {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_tampered_cursor_values(self):
+        def cursor(ordering, value, pk=1):
+            payload = {"o": ordering, "v": value, "pk": pk, "r": False}
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        tampered = [
+            ("price", "abc"), ("price", [1]), ("rating", {"a": 1}),
+            ("-created_at", "2024-13-45T00:00:00"), ("-created_at", [1]),
+        ]
+        for ordering, value in tampered:
+            with self.subTest(ordering=ordering, value=value):
+                params = {"ordering": ordering, "cursor": cursor(ordering, value)}
+                self.assertEqual(self.client.get(reverse("product-list"), params).status_code, 404)
+        params = {"ordering": "price", "cursor": cursor("price", "12", pk=True)}
+        self.assertEqual(self.client.get(reverse("product-list"), params).status_code, 404)
+        params = {"ordering": "price", "cursor": cursor("price", "12")}
+        self.assertEqual(self.client.get(reverse("product-list"), params).status_code, 200)
+
+
+# ---------------------------
+# Catalog Response Cache
+# ---------------------------
+class CatalogResponseCacheTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Hats")
+        cls.product = make_product(cls.category, name="Beanie")
+        cls.admin = User.objects.create_user("admin", password="pw", is_staff=True)
+
+    def test_repeat_requests_hit_cache(self):
+        url = reverse("product-list")
+        first = self.client.get(url, {"color": "Red", "size": "M"})
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {"size": "M", "color": "Red"})
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_key_covers_host_but_not_unknown_params(self):
+        make_product(self.category, name="Fedora")
+        url = reverse("product-list")
+        self.client.get(url, {"page_size": 1}, HTTP_HOST="evil.example")
+        response = self.client.get(url, {"page_size": 1}, HTTP_HOST="shop.example")
+        self.assertTrue(response.json()["next"].startswith("http://shop.example/"))
+
+        self.client.get(url, {"x": 1})
+        with self.assertNumQueries(0):
+            self.client.get(url, {"x": 2})
+
+    def test_conditional_get_returns_304(self):
+        url = reverse("product-list")
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_if_modified_since(self):
+        url = reverse("category-list")
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_save_and_delete_invalidate(self):
+        url = reverse("product-list")
+        etag = self.client.get(url)["ETag"]
+        self.product.name = "Bucket Hat"
+        self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["name"], "Bucket Hat")
+
+        self.product.delete()
+        self.assertEqual(self.client.get(url).json()["results"], [])
+
+    def test_detail_still_requires_admin(self):
+        url = reverse("product-detail", args=[self.product.pk])
+        admin_client = APIClient()
+        admin_client.force_authenticate(self.admin)
+        response = admin_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("private", response["Cache-Control"])
+        # A cached body is never handed to an anonymous client
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+
+# ---------------------------
+# Orders
+# ---------------------------
+class PlaceOrderTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("buyer", password="pw")
+        category = Category.objects.create(name="Shoes")
+        cls.sneaker = make_product(category, name="Sneaker", price=Decimal("50.00"),
+                                   discount_price=Decimal("40.00"), stock=3)
+        cls.sandal = make_product(category, name="Sandal", price=Decimal("20.00"), stock=1)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def place(self):
+        return self.client.post(reverse("place-order"), {"shipping_address": "1 Main St"}, format="json")
+
+    def test_places_order_and_decrements_stock(self):
+        CartItem.objects.create(user=self.user, product=self.sneaker, quantity=2)
+        CartItem.objects.create(user=self.user, product=self.sandal, quantity=1)
+        response = self.place()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["total_amount"], "100.00")  # 2 x 40 + 20
+        self.sneaker.refresh_from_db()
+        self.sandal.refresh_from_db()
+        self.assertEqual((self.sneaker.stock, self.sandal.stock), (1, 0))
+        self.assertFalse(CartItem.objects.filter(user=self.user).exists())
+
+    def test_conflict_rolls_back_everything(self):
+        CartItem.objects.create(user=self.user, product=self.sneaker, quantity=1)
+        CartItem.objects.create(user=self.user, product=self.sandal, quantity=2)
+        response = self.place()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            response.json()["products"],
+            [{"product_id": self.sandal.pk, "requested": 2, "available": 1}],
+        )
+        self.sneaker.refresh_from_db()
+        self.assertEqual(self.sneaker.stock, 3)
+        self.assertEqual(CartItem.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(Order.objects.exists())
+
+    def test_lines_snapshot_survives_catalog_changes(self):
+        CartItem.objects.create(user=self.user, product=self.sneaker, quantity=2)
+        self.place()
+        self.sneaker.name = "Renamed"
+        self.sneaker.discount_price = None
+        self.sneaker.save()
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("track-orders"))
+        [order] = response.json()
+        self.assertEqual(order["lines"], [{
+            "product_id": self.sneaker.pk,
+            "product_name": "Sneaker",
+            "unit_price": "40.00",
+            "quantity": 2,
+            "line_total": "80.00",
+        }])
+        self.assertEqual(order["user"]["username"], "buyer")
+
+    def test_catalog_shows_stock_after_order(self):
+        def listed_stock():
+            return {p["name"]: p["stock"] for p in self.client.get(reverse("product-list")).json()["results"]}
+
+        self.assertEqual(listed_stock()["Sneaker"], 3)
+        CartItem.objects.create(user=self.user, product=self.sneaker, quantity=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.place().status_code, 201)
+        self.assertEqual(listed_stock()["Sneaker"], 1)
+
+    def test_empty_cart_and_missing_address(self):
+        self.assertEqual(self.place().status_code, 400)
+        CartItem.objects.create(user=self.user, product=self.sneaker, quantity=1)
+        response = self.client.post(reverse("place-order"), {}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class PlaceOrderConcurrencyTests(TransactionTestCase):
+    buyers = 12
+    stock = 5
+
+    def setUp(self):
+        category = Category.objects.create(name="Limited")
+        self.product = make_product(category, name="Drop", stock=self.stock)
+        self.users = []
+        for i in range(self.buyers):
+            user = User.objects.create_user(f"buyer{i}", password="pw")
+            CartItem.objects.create(user=user, product=self.product, quantity=1)
+            self.users.append(user)
+
+    # Bounded, so a real locking bug fails the test instead of hanging the suite
+    max_attempts = 1000
+
+    def retry_locked(self, fn):
+        # The shared in-memory SQLite test database fails fast on lock contention
+        for _ in range(self.max_attempts):
+            try:
+                return fn()
+            except OperationalError:
+                continue
+        raise AssertionError(f"still locked after {self.max_attempts} attempts")
+
+    def place_order_for(self, user, results):
+        client = APIClient()
+        client.force_authenticate(user)
+
+        def attempt():
+            try:
+                return client.post(reverse("place-order"), {"shipping_address": "x"}, format="json").status_code
+            except OperationalError:
+                # Only retry if the checkout itself did not commit
+                if self.retry_locked(Order.objects.filter(user=user).exists):
+                    return 201
+                raise
+
+        try:
+            results[user.pk] = self.retry_locked(attempt)
+        except AssertionError as exc:
+            results[user.pk] = str(exc)  # fails the status assertions below
+        finally:
+            connections.close_all()
+
+    def checkout_all(self):
+        results = {}
+        threads = [threading.Thread(target=self.place_order_for, args=(u, results)) for u in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_no_oversell_under_concurrent_checkout(self):
+        results = self.checkout_all()
+        self.product.refresh_from_db()
+        self.assertEqual(sorted(results.values()), [201] * self.stock + [409] * (self.buyers - self.stock))
+        self.assertEqual(self.product.stock, 0)
+        self.assertEqual(Order.objects.count(), self.stock)
+
+    def test_holders_are_served_first(self):
+        holders = self.users[-3:]
+        for user in holders:
+            reserve_stock(user.pk, {self.product.pk: 1})
+
+        results = self.checkout_all()
+        self.product.refresh_from_db()
+        self.assertEqual([results[u.pk] for u in holders], [201] * 3)
+        self.assertEqual(sorted(results.values()), [201] * self.stock + [409] * (self.buyers - self.stock))
+        self.assertEqual((self.product.stock, self.product.reserved), (0, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+
+# ---------------------------
+# Stock Reservations
+# ---------------------------
+class StockReservationTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user("alice", password="pw")
+        cls.bob = User.objects.create_user("bob", password="pw")
+        category = Category.objects.create(name="Hot")
+        cls.hot = make_product(category, name="Hot item", stock=5)
+        cls.other = make_product(category, name="Other item", stock=5)
+
+    def client_for(self, user, **cart):
+        for product, quantity in cart.items():
+            CartItem.objects.update_or_create(user=user, product=getattr(self, product),
+                                              defaults={"quantity": quantity})
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def reserved(self, product):
+        product.refresh_from_db()
+        return product.reserved
+
+    def test_holds_block_other_buyers_until_checkout(self):
+        alice = self.client_for(self.alice, hot=3)
+        response = alice.post(reverse("reserve-cart"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["reservations"], [{"product_id": self.hot.pk, "quantity": 3}])
+        self.assertEqual(self.reserved(self.hot), 3)
+
+        bob = self.client_for(self.bob, hot=3)
+        response = bob.post(reverse("reserve-cart"))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["products"], [{"product_id": self.hot.pk, "requested": 3, "available": 2}])
+        self.assertEqual(bob.post(reverse("place-order"), {"shipping_address": "x"}).status_code, 409)
+
+        self.assertEqual(alice.post(reverse("place-order"), {"shipping_address": "x"}).status_code, 201)
+        self.hot.refresh_from_db()
+        self.assertEqual((self.hot.stock, self.hot.reserved), (2, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_renewing_adjusts_only_the_difference(self):
+        alice = self.client_for(self.alice, hot=3, other=1)
+        alice.post(reverse("reserve-cart"))
+        self.client_for(self.alice, hot=1)
+        CartItem.objects.filter(user=self.alice, product=self.other).delete()
+        alice.post(reverse("reserve-cart"))
+        self.assertEqual((self.reserved(self.hot), self.reserved(self.other)), (1, 0))
+        self.assertEqual(StockReservation.objects.get().quantity, 1)
+
+        self.assertEqual(alice.delete(reverse("reserve-cart")).status_code, 204)
+        self.assertEqual(self.reserved(self.hot), 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_checkout_releases_holds_not_in_the_order(self):
+        alice = self.client_for(self.alice, hot=2, other=2)
+        alice.post(reverse("reserve-cart"))
+        CartItem.objects.filter(user=self.alice, product=self.other).delete()
+        self.assertEqual(alice.post(reverse("place-order"), {"shipping_address": "x"}).status_code, 201)
+        self.assertEqual((self.reserved(self.hot), self.reserved(self.other)), (0, 0))
+        self.assertEqual(self.hot.stock, 3)
+
+    def test_sweeper_expires_holds_in_batches(self):
+        with transaction.atomic():
+            reserve_stock(self.alice.pk, {self.hot.pk: 2, self.other.pk: 1})
+            reserve_stock(self.bob.pk, {self.hot.pk: 1}, ttl=timedelta(hours=1))
+        StockReservation.objects.filter(user=self.alice).update(expires_at=timezone.now())
+        out = StringIO()
+        call_command("expire_reservations", batch_size=1, stdout=out)
+        self.assertIn("Released 2 expired reservations", out.getvalue())
+        self.assertEqual((self.reserved(self.hot), self.reserved(self.other)), (1, 0))
+        self.assertEqual(StockReservation.objects.get().user, self.bob)
+
+    def test_reconcile_restores_the_counter(self):
+        with transaction.atomic():
+            reserve_stock(self.alice.pk, {self.hot.pk: 2})
+        Product.objects.filter(pk=self.other.pk).update(reserved=4)
+        self.assertEqual(reconcile_reserved(), 1)
+        self.assertEqual((self.reserved(self.hot), self.reserved(self.other)), (2, 0))
+
+
+# ---------------------------
+# Fast Serialization
+# ---------------------------
+class FastSerializationTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("fast", password="pw")
+        parent = Category.objects.create(name="Outdoor")
+        category = Category.objects.create(name="Tents", parent=parent)
+        Category.objects.create(name="Poles", parent=category)
+        products = [
+            make_product(category, name="Dome", discount_price=Decimal("80.5"), rating=Decimal("4.25")),
+            make_product(parent, name="Tarp", description="Ünïcode ✓", image=""),
+        ]
+        for product in products:
+            CartItem.objects.create(user=cls.user, product=product, quantity=2)
+        order = Order.objects.create(user=cls.user, total_amount=Decimal("12.30"), shipping_address="Camp")
+        OrderLine.objects.create(order=order, product=products[0], product_name="Dome",
+                                 unit_price=Decimal("80.50"), quantity=1, line_total=Decimal("80.50"))
+        OrderLine.objects.create(order=order, product=None, product_name="Gone",
+                                 unit_price=Decimal("1.00"), quantity=3, line_total=Decimal("3.00"))
+
+    def fetch(self, url, **params):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        caches["catalog"].clear()
+        with self.settings(FAST_SERIALIZATION=False):
+            slow = client.get(url, params).content
+        caches["catalog"].clear()
+        with self.settings(FAST_SERIALIZATION=True):
+            fast = client.get(url, params).content
+        return slow, fast
+
+    def test_byte_identical_output(self):
+        for url in (reverse("product-list"), reverse("view-cart"), reverse("track-orders")):
+            with self.subTest(url=url):
+                slow, fast = self.fetch(url)
+                self.assertGreater(len(slow), 50)
+                self.assertEqual(slow, fast)
+
+    def test_plan_matches_serializer_data(self):
+        from .fast_serializers import SerializationPlan
+        from .serializers import ProductSerializer
+        products = Product.objects.all()
+        plan = SerializationPlan(ProductSerializer())
+        self.assertEqual(plan.serialize_many(products), ProductSerializer(products, many=True).data)
+
+
+# ---------------------------
+# Cart
+# ---------------------------
+class ViewCartTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("shopper", password="pw")
+        parent = Category.objects.create(name="Kitchen")
+        cls.category = Category.objects.create(name="Pans", parent=parent)
+        cls.pan = make_product(cls.category, name="Pan", price=Decimal("30.00"), discount_price=Decimal("25.00"))
+        cls.lid = make_product(cls.category, name="Lid", price=Decimal("7.50"))
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        CategoryTree.get()
+
+    def test_lines_and_totals(self):
+        CartItem.objects.create(user=self.user, product=self.pan, quantity=2)
+        CartItem.objects.create(user=self.user, product=self.lid, quantity=3)
+        body = self.client.get(reverse("view-cart")).json()
+        lines = {line["product"]["name"]: line for line in body["cart"]}
+        self.assertEqual((lines["Pan"]["unit_price"], lines["Pan"]["line_total"]), ("25.00", "50.00"))
+        self.assertEqual((lines["Lid"]["unit_price"], lines["Lid"]["line_total"]), ("7.50", "22.50"))
+        self.assertEqual(body["total_amount"], 72.5)
+        self.assertEqual(body["item_count"], 5)
+
+    def test_fixed_query_count(self):
+        CartItem.objects.create(user=self.user, product=self.pan, quantity=1)
+        with self.assertNumQueries(2):
+            self.client.get(reverse("view-cart"))
+        for i in range(10):
+            CartItem.objects.create(user=self.user, product=make_product(self.category, name=f"Extra {i}"))
+        CategoryTree.get()
+        with self.assertNumQueries(2):
+            self.client.get(reverse("view-cart"))
+
+    def test_empty_cart(self):
+        body = self.client.get(reverse("view-cart")).json()
+        self.assertEqual((body["cart"], body["total_amount"], body["item_count"]), ([], 0, 0))
+
+    def test_add_returns_line_total(self):
+        response = self.client.post(reverse("add-to-cart"), {"product_id": self.lid.pk}, format="json")
+        self.assertEqual(response.json()["line_total"], "7.50")
+
+
+class BulkCartTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("syncer", password="pw")
+        category = Category.objects.create(name="Toys")
+        cls.products = [make_product(category, name=f"Toy {i}", price=Decimal("2.00")) for i in range(4)]
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, operations):
+        return self.client.post(reverse("bulk-update-cart"), {"operations": operations}, format="json")
+
+    def quantities(self):
+        return dict(CartItem.objects.filter(user=self.user).values_list("product_id", "quantity"))
+
+    def test_mixed_operations_in_one_request(self):
+        a, b, c, d = (p.pk for p in self.products)
+        CartItem.objects.create(user=self.user, product_id=a, quantity=5)
+        CartItem.objects.create(user=self.user, product_id=b, quantity=1)
+        CartItem.objects.create(user=self.user, product_id=c, quantity=1)
+        response = self.bulk([
+            {"action": "add", "product_id": a, "quantity": 2},
+            {"action": "update", "product_id": b, "quantity": 7},
+            {"action": "remove", "product_id": c},
+            {"action": "add", "product_id": d},
+            {"action": "add", "product_id": d, "quantity": 3},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {a: 7, b: 7, d: 4})
+        self.assertEqual(response.json()["item_count"], 18)
+        self.assertEqual(len(response.json()["cart"]), 3)
+
+    def test_statement_count_does_not_grow_with_operations(self):
+        CategoryTree.get()
+        operations = [{"action": "add", "product_id": p.pk, "quantity": 1} for p in self.products]
+        with CaptureQueriesContext(connection) as few:
+            self.bulk(operations[:1])
+        CartItem.objects.all().delete()
+        with CaptureQueriesContext(connection) as many:
+            self.bulk(operations * 5)
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+        self.assertEqual(set(self.quantities().values()), {5})
+
+    def test_rejects_unknown_products_without_changes(self):
+        response = self.bulk([
+            {"action": "add", "product_id": self.products[0].pk},
+            {"action": "add", "product_id": 999999},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.quantities(), {})
+
+    def test_remove_then_add(self):
+        pk = self.products[0].pk
+        CartItem.objects.create(user=self.user, product_id=pk, quantity=9)
+        self.bulk([{"action": "remove", "product_id": pk}, {"action": "add", "product_id": pk, "quantity": 2}])
+        self.assertEqual(self.quantities(), {pk: 2})
+
+    def test_add_to_cart_increments(self):
+        pk = self.products[0].pk
+        self.client.post(reverse("add-to-cart"), {"product_id": pk, "quantity": 2}, format="json")
+        response = self.client.post(reverse("add-to-cart"), {"product_id": pk, "quantity": 3}, format="json")
+        self.assertEqual(response.json()["quantity"], 5)
+
+    def test_rejects_quantities_below_one(self):
+        pk = self.products[0].pk
+        for quantity in (0, -2, "lots"):
+            response = self.client.post(reverse("add-to-cart"), {"product_id": pk, "quantity": quantity}, format="json")
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("quantity", response.json())
+        response = self.bulk([{"action": "add", "product_id": pk, "quantity": 0}])
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse("add-to-cart"), {"product_id": 999999}, format="json")
+        self.assertEqual(response.json(), {"product_id": ["Unknown or unavailable product."]})
+        self.assertEqual(self.quantities(), {})
+
+
+# ---------------------------
+# Outbound Email
+# ---------------------------
+class StatelessJWTTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("token-user", password="pw", email="t@example.com", is_staff=True)
+        category = Category.objects.create(name="Books")
+        cls.product = make_product(category, name="Novel", price=Decimal("12.00"))
+
+    def setUp(self):
+        caches["default"].clear()
+        tokens = self.client.post(reverse("login"), {"username": "token-user", "password": "pw"}).json()
+        self.access, self.refresh = tokens["access"], tokens["refresh"]
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {self.access}"}
+        stateless = [StatelessJWTAuthentication]
+        for view in (views.view_cart, views.get_user_profile, views.logout_user):
+            patcher = mock.patch.object(view.cls, "authentication_classes", stateless)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_claims_build_user_without_query(self):
+        request = APIClient().get("/").wsgi_request
+        request.META.update(self.auth)
+        with self.assertNumQueries(0):
+            user, _ = StatelessJWTAuthentication().authenticate(request)
+        self.assertIsInstance(user, CachedTokenUser)
+        self.assertEqual((user.pk, user.username, user.is_staff), (self.user.pk, "token-user", True))
+
+    def test_cart_reads_skip_user_lookup(self):
+        CartItem.objects.create(user=self.user, product=self.product, quantity=2)
+        CategoryTree.get()
+        with self.assertNumQueries(2):
+            body = self.client.get(reverse("view-cart"), **self.auth).json()
+        self.assertEqual(body["item_count"], 2)
+
+    def test_full_user_is_cached_and_refreshed_on_save(self):
+        self.assertEqual(self.client.get(reverse("profile"), **self.auth).json()["email"], "t@example.com")
+        with self.assertNumQueries(0):
+            self.client.get(reverse("profile"), **self.auth)
+        self.assertIn("password", get_cached_user(self.user.pk).get_deferred_fields())
+        self.user.email = "new@example.com"
+        self.user.save()
+        self.assertEqual(self.client.get(reverse("profile"), **self.auth).json()["email"], "new@example.com")
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        response = self.client.post(reverse("logout"), {"refresh": self.refresh}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse("view-cart"), **self.auth).status_code, 401)
+        # Default (stateful) authentication honours the revocation as well
+        self.assertEqual(self.client.get(reverse("track-orders"), **self.auth).status_code, 401)
+        response = self.client.post(reverse("token-refresh"), {"refresh": self.refresh})
+        self.assertEqual(response.status_code, 401)
+
+    def test_losing_access_revokes_outstanding_tokens(self):
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=["last_login"])
+        self.assertEqual(self.client.get(reverse("view-cart"), **self.auth).status_code, 200)
+
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse("view-cart"), **self.auth).status_code, 401)
+        response = self.client.post(reverse("token-refresh"), {"refresh": self.refresh})
+        self.assertEqual(response.status_code, 401)
+
+        # A later login carries the new claims and is accepted ("iat" has one-second resolution)
+        time.sleep(1)
+        access = self.client.post(reverse("login"), {"username": "token-user", "password": "pw"}).json()["access"]
+        self.assertFalse(AccessToken(access)["is_staff"])
+        response = self.client.get(reverse("view-cart"), HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.assertEqual(response.status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse("view-cart"), HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.assertEqual(response.status_code, 401)
+
+
+class AsyncReadEndpointTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("async-shopper", password="pw")
+        parent = Category.objects.create(name="Garden")
+        cls.category = Category.objects.create(name="Tools", parent=parent)
+        cls.products = [
+            make_product(cls.category, name=f"Tool {i}", price=Decimal(10 + i), discount_price=Decimal(8 + i) if i % 2 else None)
+            for i in range(15)
+        ]
+        CartItem.objects.create(user=cls.user, product=cls.products[0], quantity=2)
+        CartItem.objects.create(user=cls.user, product=cls.products[1], quantity=1)
+        order = Order.objects.create(user=cls.user, total_amount=Decimal("20.00"), shipping_address="1 Lane")
+        OrderLine.objects.create(
+            order=order, product=cls.products[2], product_name="Tool 2",
+            unit_price=Decimal("12.00"), quantity=1, line_total=Decimal("12.00"),
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def assertSameResponse(self, sync_name, async_name, query="", **headers):
+        expected = self.client.get(reverse(sync_name) + query, **headers)
+        actual = self.client.get(reverse(async_name) + query, **headers)
+        self.assertEqual(actual.status_code, expected.status_code)
+        body = actual.json()
+        if isinstance(body, dict):
+            for key in ("next", "previous"):
+                if body.get(key):
+                    body[key] = body[key].replace(reverse(async_name), reverse(sync_name))
+        self.assertEqual(body, expected.json())
+
+    def test_product_list_matches_sync(self):
+        self.assertSameResponse("product-list", "async-product-list")
+        self.assertSameResponse("product-list", "async-product-list", "?ordering=price&page=2")
+        self.assertSameResponse("product-list", "async-product-list", f"?category_tree={self.category.parent_id}&search=tool")
+
+    def test_product_list_pagination_modes_and_facets(self):
+        self.assertSameResponse("product-list", "async-product-list", "?page=last&page_size=4")
+        self.assertSameResponse("product-list", "async-product-list", "?page_size=junk")
+        self.assertSameResponse("product-list", "async-product-list", "?facets=true&size=M")
+        self.assertSameResponse("product-list", "async-product-list", "?pagination=cursor&ordering=price&count=true")
+        cursor_page = self.client.get(reverse("product-list") + "?pagination=cursor&ordering=price").json()
+        query = cursor_page["next"].split("?", 1)[1]
+        self.assertSameResponse("product-list", "async-product-list", f"?{query}")
+        self.assertSameResponse("product-list", "async-product-list", "?pagination=cursor&cursor=bogus")
+
+    def test_product_list_invalid_page(self):
+        self.assertEqual(self.client.get(reverse("async-product-list") + "?page=9").status_code, 404)
+
+    def test_category_list_matches_sync(self):
+        self.assertSameResponse("category-list", "async-category-list")
+        self.assertSameResponse("category-list", "async-category-list", "?tree=true")
+
+    def test_cart_and_orders_match_sync(self):
+        self.assertSameResponse("view-cart", "async-view-cart", **self.auth)
+        self.assertSameResponse("track-orders", "async-track-orders", **self.auth)
+
+    def test_requires_authentication(self):
+        self.assertEqual(self.client.get(reverse("async-view-cart")).status_code, 401)
+        response = self.client.get(reverse("async-track-orders"), HTTP_AUTHORIZATION="Bearer nonsense")
+        self.assertEqual(response.status_code, 401)
+
+
+# ---------------------------
+# Image Renditions
+# ---------------------------
+def png_bytes(width, height, color="red"):
+    from io import BytesIO
+
+    from PIL import Image
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class ImageRenditionTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root, PRODUCT_IMAGE_WIDTHS=(160, 320, 640))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.category = Category.objects.create(name="Lamps")
+
+    def upload(self, name, content):
+        return default_storage.save(f"products/{name}", ContentFile(content))
+
+    def test_renditions_are_resized_and_content_hashed(self):
+        product = make_product(self.category, image=self.upload("lamp.png", png_bytes(400, 200)))
+        self.assertEqual(generate_renditions([product], workers=0), 1)
+        product.refresh_from_db()
+        webp = product.image_variants["webp"]
+        self.assertEqual(sorted(webp, key=int), ["160", "320", "400"])  # never upscaled
+        self.assertRegex(webp["160"], r"^products/renditions/lamp\.160w\.[0-9a-f]{12}\.webp$")
+        self.assertTrue(all(default_storage.exists(name) for name in webp.values()))
+
+        body = self.client.get(reverse("product-list")).json()["results"][0]
+        self.assertIn(f"/media/{webp['160']} 160w", body["image_variants"]["webp"])
+        self.assertTrue(body["image_variants"]["webp"].startswith("http://testserver/media/"))
+
+    def test_replaced_upload_is_rerendered_in_background(self):
+        product = make_product(self.category, image=self.upload("a.png", png_bytes(200, 200)))
+        generate_renditions([product], workers=0)
+        product.refresh_from_db()
+        old = set(product.image_variants["webp"].values())
+
+        product.image = self.upload("b.png", png_bytes(200, 200, "blue"))
+        with mock.patch("core.signals.render_in_background") as render_in_background:
+            with self.captureOnCommitCallbacks(execute=True):
+                product.save()
+        render_in_background.assert_called_once_with(product.pk)
+        product.refresh_from_db()
+        self.assertNotEqual(product.image_variants["source"], product.image.name)  # nothing rendered inline
+
+        render_product(product.pk)  # what the pool thread runs
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants["source"], product.image.name)
+        self.assertFalse(any(default_storage.exists(name) for name in old))
+
+    def test_removed_image_and_deleted_product_drop_renditions(self):
+        products = [make_product(self.category, image=self.upload(f"r{i}.png", png_bytes(200, 200))) for i in range(2)]
+        generate_renditions(products, workers=0)
+        files = []
+        for product in products:
+            product.refresh_from_db()
+            files.append(list(product.image_variants["webp"].values()))
+
+        products[0].image = ""
+        with self.captureOnCommitCallbacks(execute=True):
+            products[0].save()
+            products[1].delete()
+        products[0].refresh_from_db()
+        self.assertEqual(products[0].image_variants, {})
+        self.assertFalse(any(default_storage.exists(name) for names in files for name in names))
+
+    def test_backfill_command_skips_done_and_missing_images(self):
+        done = make_product(self.category, image=self.upload("done.png", png_bytes(100, 100)))
+        generate_renditions([done], workers=0)
+        todo = [make_product(self.category, image=self.upload(f"t{i}.png", png_bytes(300, 150))) for i in range(2)]
+        make_product(self.category, image="products/missing.png")
+
+        out = StringIO()
+        with self.assertLogs("core.images", "WARNING"):
+            call_command("generate_image_renditions", "--workers", "2", stdout=out)
+        self.assertIn("Rendered images for 2 products", out.getvalue())
+        for product in todo:
+            product.refresh_from_db()
+            self.assertEqual(sorted(product.image_variants["webp"], key=int), ["160", "300"])
+
+
+# ---------------------------
+# Media Serving
+# ---------------------------
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root, MEDIA_ACCEL_REDIRECT=None)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.write("products/renditions/lamp.160w.0123456789ab.webp", bytes(range(256)) * 4)
+        self.write("products/notes.txt", b"hello media " * 100)
+
+    def write(self, name, content):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+
+    def get(self, name, **headers):
+        return self.client.get(f"/media/{name}", **headers)
+
+    def test_full_response_headers(self):
+        response = self.get("products/renditions/lamp.160w.0123456789ab.webp")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(256)) * 4)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertEqual(self.get("products/notes.txt")["Cache-Control"], "public, max-age=3600")
+
+    def test_conditional_requests(self):
+        etag = self.get("products/notes.txt")["ETag"]
+        self.assertEqual(self.get("products/notes.txt", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_ranges(self):
+        name = "products/renditions/lamp.160w.0123456789ab.webp"
+        response = self.get(name, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-19/1024")
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(10, 20)))
+
+        response = self.get(name, HTTP_RANGE="bytes=-4")
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(252, 256)))
+        self.assertEqual(self.get(name, HTTP_RANGE="bytes=5000-").status_code, 416)
+        # A stale If-Range gets the whole file
+        response = self.get(name, HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_precompressed_variants(self):
+        out = StringIO()
+        call_command("compress_media", stdout=out)
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, "products/notes.txt.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, "products/renditions/lamp.160w.0123456789ab.webp.gz")))
+
+        response = self.get("products/notes.txt", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "text/plain")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertNotIn("Content-Encoding", self.get("products/notes.txt"))
+
+    def test_accept_encoding_weights(self):
+        call_command("compress_media", stdout=StringIO())
+        path = os.path.join(self.media_root, "products/notes.txt")
+        if not os.path.exists(path + ".br"):  # without a Brotli encoder installed
+            shutil.copyfile(path + ".gz", path + ".br")
+        for header, expected in [
+            ("br, gzip", "br"),
+            ("br;q=0.5, gzip;q=0.8", "gzip"),
+            ("br;q=0.9, gzip;q=0.1", "br"),
+            ("gzip;q=0.05", "gzip"),
+            ("gzip;q=0, deflate", None),
+            ("gzip; q=0.000", None),
+            ("*;q=0.1", "br"),
+            ("*, br;q=0", "gzip"),
+        ]:
+            with self.subTest(header=header):
+                response = self.get("products/notes.txt", HTTP_ACCEPT_ENCODING=header)
+                self.assertEqual(response.get("Content-Encoding"), expected)
+
+    def test_accel_redirect_and_traversal(self):
+        with override_settings(MEDIA_ACCEL_REDIRECT="/protected-media/"):
+            response = self.get("products/notes.txt")
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/products/notes.txt")
+        self.assertEqual(response.content, b"")
+        self.assertEqual(self.get("../settings.py").status_code, 404)
+        self.assertEqual(self.get("products/missing.png").status_code, 404)
+
+
+# ---------------------------
+# Facets
+# ---------------------------
+class ProductFacetTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.clothing = Category.objects.create(name="Clothing")
+        cls.shirts = Category.objects.create(name="Shirts", parent=cls.clothing)
+        cls.hats = Category.objects.create(name="Hats")
+        make_product(cls.shirts, name="Red shirt", size="M", color="Red", price=Decimal("20.00"))
+        make_product(cls.shirts, name="Blue shirt", size="L", color="Blue", price=Decimal("30.00"))
+        make_product(cls.clothing, name="Red scarf", size="M", color="Red", price=Decimal("60.00"))
+        make_product(cls.hats, name="Red hat", size="S", color="Red", price=Decimal("15.00"))
+        make_product(cls.hats, name="Hidden hat", size="S", color="Red", is_available=False)
+
+    def facets(self, query):
+        return self.client.get(reverse("product-list") + query).json()["facets"]
+
+    @staticmethod
+    def counts(values):
+        return {v["value"]: v["count"] for v in values if v["count"]}
+
+    def test_counts_exclude_own_filter(self):
+        facets = self.facets("?facets=true&color=Red")
+        # color ignores color=Red; the other facets honour it
+        self.assertEqual(self.counts(facets["color"]), {"Red": 3, "Blue": 1})
+        self.assertEqual(self.counts(facets["size"]), {"M": 2, "S": 1})
+        self.assertEqual(
+            {c["name"]: c["count"] for c in facets["category"]},
+            {"Clothing": 2, "Shirts": 1, "Hats": 1},
+        )
+        self.assertEqual([b["count"] for b in facets["price"]], [2, 0, 1, 0, 0])
+
+    def test_category_and_price_filters(self):
+        facets = self.facets(f"?facets=true&category_tree={self.clothing.pk}&price__lte=40")
+        self.assertEqual(self.counts(facets["color"]), {"Red": 1, "Blue": 1})
+        self.assertEqual({c["name"]: c["count"] for c in facets["category"]}, {"Clothing": 2, "Shirts": 2, "Hats": 1})
+        self.assertEqual([b["count"] for b in facets["price"]], [1, 1, 1, 0, 0])
+
+    def test_fixed_queries_and_shared_cache(self):
+        CategoryTree.get()
+        self.client.get(reverse("product-list") + "?color=Red")
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("product-list") + "?color=Red&facets=true&page_size=1")
+        self.assertEqual(len(ctx.captured_queries), 2 + 4)  # count + page, four facet aggregates
+        # Another page of the same filters reuses the cached facets
+        with CaptureQueriesContext(connection) as ctx:
+            body = self.client.get(reverse("product-list") + "?color=Red&facets=true&page_size=1&page=2").json()
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual(self.counts(body["facets"]["color"]), {"Red": 3, "Blue": 1})
+
+    def test_respects_search(self):
+        facets = self.facets("?facets=true&search=shirt")
+        self.assertEqual(self.counts(facets["color"]), {"Red": 1, "Blue": 1})
+        self.assertEqual({c["name"]: c["count"] for c in facets["category"]}, {"Clothing": 2, "Shirts": 2})
+
+    def test_without_flag_no_facets(self):
+        self.assertNotIn("facets", self.client.get(reverse("product-list")).json())
+
+
+# ---------------------------
+# Catalog Import / Export
+# ---------------------------
+class CatalogImportExportTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user("catalog-admin", password="pw", is_staff=True)
+        cls.clothing = Category.objects.create(name="Clothing")
+        cls.shirts = Category.objects.create(name="Shirts", parent=cls.clothing)
+
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_csv_upsert_in_chunks(self):
+        make_product(self.shirts, name="Old tee", sku="TEE-1", price=Decimal("5.00"))
+        path = self.write("feed.csv", (
+            "sku,name,description,price,discount_price,rating,stock,category,size,color,image,is_available\n"
+            "TEE-1,Tee,Cotton tee,12.50,,4.5,10,Shirts,M,Red,products/tee.png,true\n"
+            "TEE-2,Long tee,Long sleeves,15.00,13.00,0,3,Clothing,L,Blue,,true\n"
+            "TEE-3,Bad tee,,abc,,0,3,Clothing,L,Blue,,true\n"
+            "TEE-4,Lost tee,,9.00,,0,3,Clothing > Socks,L,Blue,,true\n"
+            "TEE-2,Long tee v2,Long sleeves,16.00,,0,5,Clothing,L,Blue,,false\n"
+        ))
+        out, err = StringIO(), StringIO()
+        call_command("import_products", path, "--chunk-size", "2", stdout=out, stderr=err)
+
+        self.assertIn("Created 1, updated 2, skipped 2 products", out.getvalue())
+        self.assertIn("line 4: invalid price 'abc'", err.getvalue())
+        self.assertIn("line 5: unknown category 'Socks'", err.getvalue())
+        tee = Product.objects.get(sku="TEE-1")
+        self.assertEqual((tee.name, tee.price, tee.category_id), ("Tee", Decimal("12.50"), self.shirts.pk))
+        long_tee = Product.objects.get(sku="TEE-2")
+        self.assertEqual((long_tee.name, long_tee.stock, long_tee.is_available), ("Long tee v2", 5, False))
+        # Bulk writes bypass signals, so the importer keeps search in sync itself
+        results = self.client.get(reverse("product-list") + "?search=cotton").json()["results"]
+        self.assertEqual([r["sku"] for r in results], ["TEE-1"])
+
+    def test_reimport_keeps_image_and_bumps_updated_at(self):
+        make_product(self.shirts, name="Tee", sku="TEE-1", image="products/a.png")
+        Product.objects.filter(sku="TEE-1").update(updated_at=timezone.now() - timedelta(days=1))
+        before = Product.objects.get(sku="TEE-1").updated_at
+        path = self.write("feed.csv", (
+            "sku,name,price,stock,category,size,color,image,is_available\n"
+            "TEE-1,Tee v2,11.00,4,Shirts,M,Red,,\n"
+            "TEE-2,New tee,9.00,1,Shirts,M,Red,,\n"
+            "TEE-3,Odd tee,9.00,1,Shirts,M,Red,,maybe\n"
+        ))
+        err = StringIO()
+        call_command("import_products", path, stdout=StringIO(), stderr=err)
+        self.assertIn("invalid is_available 'maybe'", err.getvalue())
+        tee = Product.objects.get(sku="TEE-1")
+        self.assertEqual((tee.name, tee.image.name, tee.is_available), ("Tee v2", "products/a.png", True))
+        self.assertGreater(tee.updated_at, before)
+        self.assertTrue(Product.objects.get(sku="TEE-2").is_available)
+
+    def test_new_image_replaces_renditions(self):
+        variants = {"source": "products/a.png", "webp": {"160": "products/renditions/a.160w.abc.webp"}}
+        tee = make_product(self.shirts, name="Tee", sku="TEE-1", image="products/a.png", image_variants=variants)
+        cap = make_product(self.shirts, name="Cap", sku="CAP-1", image="products/c.png", image_variants=variants)
+        path = self.write("feed.csv", (
+            "sku,name,price,stock,category,size,color,image\n"
+            "TEE-1,Tee,11.00,4,Shirts,M,Red,products/b.png\n"
+            "CAP-1,Cap,11.00,4,Shirts,M,Red,products/c.png\n"
+        ))
+        with mock.patch("core.catalog_io.render_in_background") as render, \
+                mock.patch("core.catalog_io.delete_renditions") as delete, \
+                self.captureOnCommitCallbacks(execute=True):
+            call_command("import_products", path, stdout=StringIO())
+        tee.refresh_from_db()
+        cap.refresh_from_db()
+        self.assertEqual((tee.image.name, tee.image_variants), ("products/b.png", {}))
+        self.assertEqual(cap.image_variants, variants)
+        render.assert_called_once_with(tee.pk)
+        delete.assert_called_once_with(variants)
+
+    def test_jsonl_creates_categories(self):
+        path = self.write("feed.jsonl", json.dumps({
+            "sku": "CAP-1", "name": "Cap", "price": "8.00", "stock": 2,
+            "category": "Accessories > Hats", "size": "S", "color": "Black",
+        }) + "\n")
+        call_command("import_products", path, "--create-categories", stdout=StringIO())
+        cap = Product.objects.select_related("category__parent").get(sku="CAP-1")
+        self.assertEqual((cap.category.name, cap.category.parent.name), ("Hats", "Accessories"))
+
+    def test_export_round_trip(self):
+        make_product(self.shirts, name="Tee, \"classic\"", sku="TEE-9", price=Decimal("9.99"))
+        make_product(self.shirts, name="Unlabelled")
+        path = os.path.join(self.dir, "out.csv")
+        out, err = StringIO(), StringIO()
+        call_command("export_products", path, stdout=out, stderr=err)
+        self.assertIn("Exported 1 products", out.getvalue())
+        self.assertIn("Skipped 1 products without a SKU", err.getvalue())
+        Product.objects.filter(sku="TEE-9").update(name="Changed", price=Decimal("1.00"))
+
+        call_command("import_products", path, stdout=StringIO())
+        product = Product.objects.get(sku="TEE-9")
+        self.assertEqual((product.name, product.price), ('Tee, "classic"', Decimal("9.99")))
+
+    def test_sku_backfill_migration(self):
+        backfill = import_module("core.migrations.0014_backfill_product_sku").backfill_skus
+        first = make_product(self.shirts, name="Old")
+        second = make_product(self.shirts, name="Older", sku="")
+        make_product(self.shirts, name="Taken", sku=f"P{first.pk:06d}")
+        backfill(django_apps, mock.Mock(connection=connection))
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.sku, f"P{first.pk:06d}-1")
+        self.assertEqual(second.sku, f"P{second.pk:06d}")
+        self.assertFalse(Product.objects.filter(sku=None).exists())
+
+    def test_streaming_export_endpoint_is_admin_only(self):
+        make_product(self.shirts, name="Tee", sku="TEE-1")
+        client = APIClient()
+        self.assertEqual(client.get(reverse("export-products")).status_code, 401)
+        client.force_authenticate(self.admin)
+        response = client.get(reverse("export-products") + "?output=jsonl")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual((rows[0]["sku"], rows[0]["category"]), ("TEE-1", "Clothing > Shirts"))
+        self.assertEqual(client.get(reverse("export-products") + "?output=xml").status_code, 400)
+
+
+class OrderExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user("order-admin", password="pw", is_staff=True)
+        cls.buyer = User.objects.create_user("buyer", password="pw", email="buyer@example.com")
+        cls.orders = []
+        for i, (day, order_status) in enumerate([(1, "Pending"), (5, "Shipped"), (9, "Delivered")]):
+            order = Order.objects.create(user=cls.buyer, total_amount=Decimal("20.00"),
+                                         shipping_address=f"{i} Main St, Town", status=order_status)
+            Order.objects.filter(pk=order.pk).update(ordered_at=datetime(2025, 3, day, tzinfo=dt_timezone.utc))
+            cls.orders.append(order)
+        for n in (1, 2):
+            OrderLine.objects.create(order=cls.orders[1], product=None, product_name=f"Item {n}",
+                                     unit_price=Decimal("10.00"), quantity=1, line_total=Decimal("10.00"))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, query=""):
+        response = self.client.get(reverse("export-orders") + query)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_has_a_row_per_line(self):
+        import csv
+        rows = list(csv.DictReader(StringIO(self.export())))
+        self.assertEqual([r["order_id"] for r in rows],
+                         [str(self.orders[0].pk), str(self.orders[1].pk), str(self.orders[1].pk), str(self.orders[2].pk)])
+        self.assertEqual(rows[1]["line_product_name"], "Item 1")
+        self.assertEqual(rows[1]["shipping_address"], "1 Main St, Town")
+        self.assertEqual((rows[0]["email"], rows[0]["line_product_name"]), ("buyer@example.com", ""))
+
+    def test_ndjson_with_date_and_status_filters(self):
+        body = self.export("?output=ndjson&ordered_at__gte=2025-03-02&ordered_at__lt=2025-03-10&status=Shipped&status=Pending")
+        orders = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([o["order_id"] for o in orders], [self.orders[1].pk])
+        self.assertEqual([l["product_name"] for l in orders[0]["lines"]], ["Item 1", "Item 2"])
+
+    def test_queries_do_not_grow_per_order(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.export()
+        self.assertEqual(len(ctx.captured_queries), 2)  # orders + users, then lines
+
+    def test_validation_and_permissions(self):
+        self.assertEqual(self.client.get(reverse("export-orders") + "?status=Lost").status_code, 400)
+        self.assertEqual(self.client.get(reverse("export-orders") + "?output=xlsx").status_code, 400)
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(self.client.get(reverse("export-orders")).status_code, 403)
+
+
+# ---------------------------
+# Request Stats
+# ---------------------------
+@override_settings(QUERY_STATS_ENABLED=True, QUERY_STATS_SLOW_MS=10_000, QUERY_STATS_MAX_QUERIES=50)
+class QueryStatsMiddlewareTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user("stats-admin", password="pw", is_staff=True)
+        cls.category = Category.objects.create(name="Stats")
+        for i in range(3):
+            make_product(cls.category, name=f"Counted {i}")
+
+    def setUp(self):
+        super().setUp()
+        query_stats.reset()
+        self.client = APIClient()
+
+    def test_records_per_endpoint_histograms(self):
+        for _ in range(2):
+            self.client.get(reverse("product-list"))
+        stats = query_stats.snapshot()["product-list"]
+        self.assertEqual(stats["request_duration_seconds"]["count"], 2)
+        self.assertGreater(stats["db_queries"]["sum"], 0)
+        self.assertGreater(stats["serializer_duration_seconds"]["sum"], 0)
+        self.assertEqual(stats["db_queries"]["buckets"][-1], ["+Inf", 2])
+
+    def test_async_views_are_measured_without_adapting(self):
+        async def get_response(request):
+            return None
+
+        self.assertTrue(iscoroutinefunction(QueryStatsMiddleware(get_response)))
+        # The test connection was opened before the ASGI handler loaded the
+        # middleware; connections opened later get the recorder on connect
+        install_query_recorder(connection)
+        async_to_sync(self.async_client.get)(reverse("async-product-list"))
+        stats = query_stats.snapshot()["async-product-list"]
+        self.assertGreater(stats["db_queries"]["sum"], 0)
+        self.assertGreater(stats["serializer_duration_seconds"]["sum"], 0)
+
+    def test_counts_duplicate_queries(self):
+        stats = RequestStats()
+        with connection.execute_wrapper(stats):
+            for _ in range(3):
+                list(Product.objects.filter(pk=1))
+            list(Category.objects.all())
+        self.assertEqual((len(stats.queries), stats.duplicate_count), (4, 2))
+
+    def test_slow_requests_are_logged_with_sql(self):
+        with override_settings(QUERY_STATS_MAX_QUERIES=0), self.assertLogs("core.slow_requests", "WARNING") as logs:
+            APIClient().get(reverse("product-list"))
+        self.assertIn("(product-list)", logs.output[0])
+        self.assertIn('FROM "core_product"', logs.output[0])
+
+    def test_stats_endpoint(self):
+        self.client.get(reverse("product-list"))
+        self.assertEqual(self.client.get(reverse("request-stats")).status_code, 401)
+        self.client.force_authenticate(self.admin)
+        self.assertIn("product-list", self.client.get(reverse("request-stats")).json())
+        text = self.client.get(reverse("request-stats") + "?output=prometheus").content.decode()
+        self.assertIn("# TYPE core_request_duration_seconds histogram", text)
+        self.assertIn('core_db_queries_bucket{endpoint="product-list",le="+Inf"} 1', text)
+
+
+# ---------------------------
+# Database Profiles
+# ---------------------------
+class DatabaseProfileTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.path = os.path.join(self.tmp, "profile.sqlite3")
+        database = {"ENGINE": "django.db.backends.sqlite3", "NAME": self.path}
+        self.connections = ConnectionHandler({"default": {}, "profile": apply_profile(database, "sqlite-prod")})
+        self.addCleanup(self.connections.close_all)
+
+    def pragma(self, conn, name):
+        with conn.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_sqlite_prod_pragmas(self):
+        conn = self.connections["profile"]
+        self.assertEqual(self.pragma(conn, "journal_mode"), "wal")
+        self.assertEqual(self.pragma(conn, "synchronous"), 1)  # NORMAL
+        self.assertEqual(self.pragma(conn, "busy_timeout"), 5000)
+        self.assertEqual(self.pragma(conn, "foreign_keys"), 1)
+        self.assertEqual(conn.settings_dict["CONN_MAX_AGE"], 600)
+        self.assertTrue(conn.settings_dict["CONN_HEALTH_CHECKS"])
+
+    def test_atomic_blocks_take_the_write_lock_up_front(self):
+        import sqlite3
+
+        conn = self.connections["profile"]
+        self.pragma(conn, "journal_mode")  # create the file
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        with mock.patch("django.db.transaction.get_connection", return_value=conn), transaction.atomic():
+            self.pragma(conn, "user_version")  # read only, yet the write lock is already held
+            with self.assertRaisesMessage(sqlite3.OperationalError, "locked"):
+                other.execute("BEGIN IMMEDIATE")
+        other.execute("BEGIN IMMEDIATE")
+        other.execute("ROLLBACK")
+
+    def test_default_profile_is_unchanged_and_unknown_names_fail(self):
+        database = {"ENGINE": "django.db.backends.sqlite3", "NAME": self.path}
+        self.assertEqual(apply_profile(database, "default"), database)
+        with self.assertRaises(ValueError):
+            apply_profile(database, "sqlite-fast")
+
+
+# ---------------------------
+# Read Replicas
+# ---------------------------
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReadReplicaRoutingTests(CatalogTestCase):
+    """
+    A local SQLite file with the test database's schema stands in for a
+    replica. It is connected before being registered, as the test case only
+    allows connections to the aliases it knows about.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        settings_dict = {**connections["default"].settings_dict, "NAME": os.path.join(cls.tmp, "replica.sqlite3")}
+        replica = ConnectionHandler({"default": {}, "replica": settings_dict})["replica"]
+        replica.ensure_connection()
+        connections["default"].ensure_connection()
+        connections["default"].connection.backup(replica.connection)  # schema only, nothing is committed yet
+        super().setUpClass()
+
+        connections.settings["replica"] = replica.settings_dict
+        connections["replica"] = replica
+        # "Replicate" the catalog, plus a row the primary does not have
+        for obj in (cls.category, cls.product):
+            type(obj).objects.using("replica").bulk_create([copy.copy(obj)])
+        Product.objects.using("replica").create(category_id=cls.category.pk, name="Only on replica", price=1,
+                                                stock=1, size="M", color="Red")
+        Category.objects.using("replica").bulk_create([Category(name="Only on replica", path="/999999/")])
+
+    @classmethod
+    def tearDownClass(cls):
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("replica-reader", password="pw")
+        cls.category = Category.objects.create(name="Replicated")
+        cls.product = make_product(cls.category, name="On both")
+
+    def setUp(self):
+        super().setUp()
+        caches["default"].clear()
+        self.client = APIClient()
+
+    def settle_catalog(self):
+        # An empty cache whose last change is older than the replication lag,
+        # so misses may be filled from the replica
+        caches["catalog"].clear()
+        caches["catalog"].set(VERSION_CACHE_KEY, {"version": "settled", "changed_at": time.time() - 60}, None)
+
+    def product_names(self, client=None, settle=True):
+        if settle:
+            self.settle_catalog()
+        response = (client or self.client).get(reverse("product-list"))
+        return {p["name"] for p in response.json()["results"]}
+
+    def test_catalog_reads_use_the_replica(self):
+        self.assertEqual(self.product_names(), {"On both", "Only on replica"})
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.product_names(), {"On both"})
+        self.settle_catalog()
+        self.assertEqual(self.client.get(reverse("category-list")).status_code, 200)
+
+    def test_pinned_users_skip_the_response_cache(self):
+        self.assertEqual(self.product_names(), {"On both", "Only on replica"})  # now cached
+        writer = APIClient()
+        writer.force_authenticate(self.user)
+        pin_to_primary(self.user.pk)
+        self.assertEqual(self.product_names(writer, settle=False), {"On both"})
+        self.assertEqual(self.product_names(settle=False), {"On both", "Only on replica"})
+
+    def test_misses_after_a_change_are_filled_from_the_primary(self):
+        caches["catalog"].clear()
+        bump_catalog_version()
+        self.assertEqual(self.product_names(settle=False), {"On both"})
+        self.assertEqual(self.product_names(settle=False), {"On both"})  # the cached primary page
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            response = self.client.get(reverse("product-list"), {"page": 1})
+        self.assertEqual({p["name"] for p in response.json()["results"]}, {"On both", "Only on replica"})
+
+    def test_category_tree_is_built_from_the_primary(self):
+        CategoryTree.invalidate()
+        with replica_reads():
+            names = {c.name for c in CategoryTree.get().categories()}
+        self.assertEqual(names, {"Replicated"})
+
+    def test_writes_stay_on_the_primary_and_pin_the_writer(self):
+        writer = APIClient()
+        writer.force_authenticate(self.user)
+        self.assertEqual(self.product_names(writer), {"On both", "Only on replica"})
+
+        response = writer.post(reverse("add-to-cart"), {"product_id": self.product.pk, "quantity": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CartItem.objects.using("default").filter(user=self.user).count(), 1)
+        self.assertFalse(CartItem.objects.using("replica").exists())
+
+        # Read-your-writes for the writer only
+        self.assertEqual(self.product_names(writer), {"On both"})
+        self.assertEqual(self.product_names(), {"On both", "Only on replica"})
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            writer.post(reverse("add-to-cart"), {"product_id": self.product.pk, "quantity": 1})
+        self.assertEqual(self.product_names(writer), {"On both", "Only on replica"})
+
+    def test_pin_middleware_is_async_capable_and_unused_without_replicas(self):
+        async def get_response(request):
+            return None
+
+        self.assertTrue(iscoroutinefunction(PinAfterWriteMiddleware(get_response)))
+        with override_settings(DATABASE_REPLICAS=[]), self.assertRaises(MiddlewareNotUsed):
+            PinAfterWriteMiddleware(get_response)
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Product), "default")
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Product), "replica")
+            self.assertEqual(router.db_for_write(Product), "default")
+            self.assertEqual(router.db_for_read(Category, instance=self.product), "default")
+        self.assertFalse(router.allow_migrate("replica", "core"))
+        self.assertTrue(router.allow_migrate("default", "core"))
+
+
+# ---------------------------
+# Effective Price
+# ---------------------------
+class EffectivePriceTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Priced")
+        cls.full = make_product(category, name="Full price", price=Decimal("30.00"))
+        cls.sale = make_product(category, name="On sale", price=Decimal("50.00"), discount_price=Decimal("20.00"))
+        cls.mid = make_product(category, name="Small discount", price=Decimal("26.00"),
+                               discount_price=Decimal("25.00"))
+
+    def names(self, query):
+        response = self.client.get(reverse("product-list") + query)
+        self.assertEqual(response.status_code, 200)
+        return [p["name"] for p in response.json()["results"]]
+
+    def test_generated_columns(self):
+        product = Product.objects.get(pk=self.sale.pk)
+        self.assertEqual((product.effective_price, product.discount_percent), (Decimal("20.00"), 60))
+        self.assertEqual(Product.objects.get(pk=self.full.pk).discount_percent, 0)
+        self.assertEqual(Product.objects.get(pk=self.mid.pk).discount_percent, 4)
+
+        [row] = [p for p in self.client.get(reverse("product-list")).json()["results"] if p["id"] == self.sale.pk]
+        self.assertEqual((row["effective_price"], row["discount_percent"]), ("20.00", 60))
+
+    def test_bulk_updates_stay_consistent(self):
+        Product.objects.filter(pk=self.full.pk).update(discount_price=Decimal("15.00"))
+        Product.objects.filter(pk=self.sale.pk).update(discount_price=None)
+        self.assertEqual(
+            dict(Product.objects.values_list("name", "effective_price")),
+            {"Full price": Decimal("15.00"), "On sale": Decimal("50.00"), "Small discount": Decimal("25.00")},
+        )
+        self.assertEqual(Product.objects.get(pk=self.full.pk).discount_percent, 50)
+
+    def test_ordering_and_filtering(self):
+        self.assertEqual(self.names("?ordering=effective_price"), ["On sale", "Small discount", "Full price"])
+        self.assertEqual(self.names("?ordering=-discount_percent"), ["On sale", "Small discount", "Full price"])
+        self.assertEqual(self.names("?effective_price__lte=25&ordering=effective_price"), ["On sale", "Small discount"])
+        self.assertEqual(self.names("?discount_percent__gte=10"), ["On sale"])
+
+    def test_keyset_pages(self):
+        response = self.client.get(reverse("product-list") + "?pagination=cursor&ordering=effective_price&page_size=2")
+        first = response.json()
+        self.assertEqual([p["name"] for p in first["results"]], ["On sale", "Small discount"])
+        second = self.client.get(first["next"]).json()
+        self.assertEqual([p["name"] for p in second["results"]], ["Full price"])
+
+
+class CountingEmailBackend(locmem.EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return True
+
+
+class FlakyEmailBackend(locmem.EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError("SMTP down")
+
+
+class UnreachableEmailBackend(locmem.EmailBackend):
+    def open(self):
+        raise ConnectionRefusedError("SMTP unreachable")
+
+
+class OutboundEmailTests(TestCase):
+    def contact(self, n=1):
+        for i in range(n):
+            response = self.client.post(reverse("contact"), {
+                "name": "Ann", "email": "ann@example.com", "subject": f"Hello {i}", "message": "Hi",
+            })
+            self.assertEqual(response.status_code, 202)
+
+    def test_contact_form_only_enqueues(self):
+        self.contact()
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutboundEmail.objects.get().status, "Pending")
+
+    @override_settings(EMAIL_BACKEND="core.tests.CountingEmailBackend")
+    def test_worker_sends_batch_over_one_connection(self):
+        self.contact(3)
+        CountingEmailBackend.opened = 0
+        call_command("send_queued_email", stdout=StringIO())
+        self.assertEqual(CountingEmailBackend.opened, 1)
+        self.assertEqual([m.subject for m in mail.outbox], ["Hello 0", "Hello 1", "Hello 2"])
+        self.assertEqual(mail.outbox[0].reply_to, ["ann@example.com"])
+        self.assertEqual(set(OutboundEmail.objects.values_list("status", flat=True)), {"Sent"})
+
+    def test_retries_with_backoff_then_fails(self):
+        self.contact()
+        with self.settings(EMAIL_BACKEND="core.tests.FlakyEmailBackend"):
+            self.assertEqual(send_queued_emails(max_attempts=2), (0, 1))
+            email = OutboundEmail.objects.get()
+            self.assertEqual((email.status, email.attempts), ("Pending", 1))
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertEqual(send_queued_emails(max_attempts=2), (0, 0))  # not due yet
+
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            send_queued_emails(max_attempts=2)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.last_error), ("Failed", 2, "SMTP down"))
+
+    @override_settings(EMAIL_BACKEND="core.tests.UnreachableEmailBackend")
+    def test_connection_failures_count_as_attempts(self):
+        self.contact(2)
+        backoff = timedelta(minutes=1)
+        for attempt in (1, 2):
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            before = timezone.now()
+            self.assertEqual(send_queued_emails(max_attempts=3, backoff=backoff), (0, 2))
+            for email in OutboundEmail.objects.all():
+                self.assertEqual((email.status, email.attempts), ("Pending", attempt))
+                self.assertGreaterEqual(email.next_attempt_at, before + backoff * 2 ** (attempt - 1))
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        send_queued_emails(max_attempts=3, backoff=backoff)
+        self.assertEqual(
+            set(OutboundEmail.objects.values_list("status", "attempts", "last_error")),
+            {("Failed", 3, "SMTP unreachable")},
+        )
+
+    def test_order_status_change_notifies_customer(self):
+        admin = User.objects.create_user("boss", is_staff=True)
+        customer = User.objects.create_user("cust", email="cust@example.com")
+        order = Order.objects.create(user=customer, total_amount=1, shipping_address="x")
+        client = APIClient()
+        client.force_authenticate(admin)
+        client.patch(reverse("update-order-status", args=[order.pk]), {"status": "Shipped"}, format="json")
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.to, ["cust@example.com"])
+        self.assertIn("Shipped", email.subject)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 urlpatterns = [
@@ -7,6 +7,7 @@ urlpatterns = [
     # API Overview
     # ---------------------------
     path("", views.api_overview, name="api-overview"),
+    path("stats/", views.request_stats, name="request-stats"),
 
     # ---------------------------
     # Auth endpoints
@@ -15,6 +16,7 @@ urlpatterns = [
     path("auth/login/", TokenObtainPairView.as_view(), name="login"),  # JWT login
     path("auth/refresh/", TokenRefreshView.as_view(), name="token-refresh"),
     path("auth/profile/", views.get_user_profile, name="profile"),
+    path("auth/logout/", views.logout_user, name="logout"),
 
     # ---------------------------
     # Contact endpoint
@@ -27,6 +29,7 @@ urlpatterns = [
     path("categories/", views.CategoryListAPIView.as_view(), name="category-list"),
     path("products/", views.ProductListAPIView.as_view(), name="product-list"),
     path("products/<int:pk>/", views.ProductDetailAPIView.as_view(), name="product-detail"),
+    path("products/export/", views.export_products, name="export-products"),
 
     # ---------------------------
     # Cart Management
@@ -35,6 +38,8 @@ urlpatterns = [
     path("cart/view/", views.view_cart, name="view-cart"),
     path("cart/update/<int:cart_item_id>/", views.update_cart_item, name="update-cart-item"),
     path("cart/remove/<int:cart_item_id>/", views.remove_from_cart, name="remove-from-cart"),
+    path("cart/bulk/", views.bulk_update_cart, name="bulk-update-cart"),
+    path("cart/reserve/", views.reserve_cart, name="reserve-cart"),
 
     # ---------------------------
     # Orders
@@ -42,4 +47,13 @@ urlpatterns = [
     path("order/place/", views.place_order, name="place-order"),
     path("order/track/", views.track_orders, name="track-orders"),
     path("order/update-status/<int:order_id>/", views.update_order_status, name="update-order-status"),
+    path("order/export/", views.export_orders, name="export-orders"),
+
+    # ---------------------------
+    # Async read endpoints (serve under backend.asgi)
+    # ---------------------------
+    path("async/categories/", async_views.category_list, name="async-category-list"),
+    path("async/products/", async_views.product_list, name="async-product-list"),
+    path("async/cart/view/", async_views.view_cart, name="async-view-cart"),
+    path("async/order/track/", async_views.track_orders, name="async-track-orders"),
 ]
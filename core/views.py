@@ -3,24 +3,32 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAdminUser, AllowAny, IsAuthenticated
 from rest_framework import status, generics, filters
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.pagination import PageNumberPagination
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
 
 from .serializers import (
-    CartItemSerializer, OrderSerializer, RegisterSerializer,
+    CartItemSerializer, OrderSerializer, RegisterSerializer, AddToCartSerializer, BulkCartSerializer,
     CategorySerializer, UserSerializer, ContactSerializer, ProductSerializer
 )
-from .models import Product, Category, CartItem, Order
-
-# ---------------------------
-# Pagination Class
-# ---------------------------
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 50
+from .models import Product, Category, CartItem, Order, OrderLine, StockReservation
+from .authentication import full_user, revoke_token
+from .catalog_io import CONTENT_TYPES, export_rows, render_rows
+from .category_tree import CategoryTree
+from .facets import ProductFacets
+from .filters import OrderExportFilter, ProductFilter, ProductSearchFilter
+from .instrumentation import registry as query_stats
+from .inventory import InsufficientStock, checkout_stock, release_reservations, reserve_stock
+from .cart import apply_cart_operations
+from .mail import enqueue_email
+from .order_export import CSV_COLUMNS, iter_orders, order_rows
+from .pagination import KeysetPagination, StandardResultsSetPagination
+from .response_cache import CachedCatalogMixin
+from .routers import ReplicaReadsMixin
+from .fast_serializers import FastSerializationMixin, serialize
 
 # ---------------------------
 # API Overview
@@ -29,6 +37,17 @@ class StandardResultsSetPagination(PageNumberPagination):
 def api_overview(request):
     return Response({"message": "E-commerce API is running ✅"})
 
+# ---------------------------
+# Request Stats (admin)
+# ---------------------------
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def request_stats(request):
+    # Histograms collected by QueryStatsMiddleware in this worker process
+    if request.query_params.get("output") == "prometheus":
+        return HttpResponse(query_stats.prometheus(), content_type="text/plain; version=0.0.4")
+    return Response(query_stats.snapshot())
+
 # ---------------------------
 # Register User
 # ---------------------------
@@ -47,9 +66,26 @@ def register_user(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_user_profile(request):
-    serializer = UserSerializer(request.user)
+    serializer = UserSerializer(full_user(request.user))
     return Response(serializer.data)
 
+# ---------------------------
+# Logout
+# ---------------------------
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def logout_user(request):
+    refresh = request.data.get("refresh")
+    if refresh:
+        try:
+            RefreshToken(refresh).blacklist()
+        except TokenError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    # The access token stays valid until it expires unless it is denied too
+    if request.auth is not None:
+        revoke_token(request.auth)
+    return Response({"message": "Logged out ✅"}, status=status.HTTP_200_OK)
+
 # ---------------------------
 # Contact Form
 # ---------------------------
@@ -64,17 +100,14 @@ def contact_form(request):
         message = serializer.validated_data["message"]
 
         full_message = f"From: {name} <{email}>\n\nMessage:\n{message}"
-        try:
-            send_mail(
-                subject,
-                full_message,
-                email,                          # from user
-                [settings.EMAIL_HOST_USER],     # to admin
-                fail_silently=False,
-            )
-            return Response({"message": "Email sent successfully ✅"})
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        enqueue_email(
+            subject,
+            full_message,
+            [settings.EMAIL_HOST_USER],     # to admin
+            from_email=email,               # from user
+            reply_to=[email],
+        )
+        return Response({"message": "Message received ✅"}, status=status.HTTP_202_ACCEPTED)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -85,25 +118,33 @@ def contact_form(request):
 @permission_classes([IsAuthenticated])
 def add_to_cart(request):
     user = request.user
-    product_id = request.data.get("product_id")
-    quantity = int(request.data.get("quantity", 1))
-    try:
-        cart_item, created = CartItem.objects.get_or_create(user=user, product_id=product_id)
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
-        serializer = CartItemSerializer(cart_item)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    operation = AddToCartSerializer(data=request.data)
+    if not operation.is_valid():
+        return Response(operation.errors, status=status.HTTP_400_BAD_REQUEST)
+    product_id = operation.validated_data["product_id"]
+    apply_cart_operations(user, [operation.validated_data])
+    serializer = CartItemSerializer(CartItem.objects.for_display().get(user_id=user.pk, product_id=product_id))
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+def cart_response(user):
+    cart_items = CartItem.objects.filter(user_id=user.pk)
+    data = serialize(CartItemSerializer, cart_items.for_display(), many=True)
+    totals = cart_items.totals()
+    return Response({"cart": data, "total_amount": totals["total_amount"], "item_count": totals["item_count"]})
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def view_cart(request):
-    cart_items = CartItem.objects.filter(user=request.user)
-    serializer = CartItemSerializer(cart_items, many=True)
-    total = sum([item.product.price * item.quantity for item in cart_items])
-    return Response({"cart": serializer.data, "total_amount": total})
+    return cart_response(request.user)
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def bulk_update_cart(request):
+    serializer = BulkCartSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    apply_cart_operations(request.user, serializer.validated_data["operations"])
+    return cart_response(request.user)
 
 @api_view(["PATCH"])
 @permission_classes([IsAuthenticated])
@@ -112,10 +153,10 @@ def update_cart_item(request, cart_item_id):
     if quantity < 1:
         return Response({"error": "Quantity must be at least 1"}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        cart_item = CartItem.objects.get(id=cart_item_id, user=request.user)
+        cart_item = CartItem.objects.get(id=cart_item_id, user_id=request.user.pk)
         cart_item.quantity = quantity
         cart_item.save()
-        serializer = CartItemSerializer(cart_item)
+        serializer = CartItemSerializer(CartItem.objects.for_display().get(pk=cart_item.pk))
         return Response(serializer.data, status=status.HTTP_200_OK)
     except CartItem.DoesNotExist:
         return Response({"error": "Item not found in cart"}, status=status.HTTP_404_NOT_FOUND)
@@ -124,12 +165,36 @@ def update_cart_item(request, cart_item_id):
 @permission_classes([IsAuthenticated])
 def remove_from_cart(request, cart_item_id):
     try:
-        cart_item = CartItem.objects.get(id=cart_item_id, user=request.user)
+        cart_item = CartItem.objects.get(id=cart_item_id, user_id=request.user.pk)
         cart_item.delete()
         return Response({"message": "Item removed from cart ✅"}, status=status.HTTP_200_OK)
     except CartItem.DoesNotExist:
         return Response({"error": "Item not found in cart"}, status=status.HTTP_404_NOT_FOUND)
 
+@api_view(["POST", "DELETE"])
+@permission_classes([IsAuthenticated])
+def reserve_cart(request):
+    # POST holds the cart's quantities for STOCK_RESERVATION_TTL seconds
+    # (renewing earlier holds); DELETE releases them. place_order converts them.
+    user = request.user
+    if request.method == "DELETE":
+        with transaction.atomic():
+            release_reservations(StockReservation.objects.filter(user_id=user.pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    quantities = dict(CartItem.objects.filter(user_id=user.pk).values_list("product_id", "quantity"))
+    if not quantities:
+        return Response({"error": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        with transaction.atomic():
+            expires_at = reserve_stock(user.pk, quantities)
+    except InsufficientStock as e:
+        return Response({"error": "Insufficient stock", "products": e.shortages}, status=status.HTTP_409_CONFLICT)
+    return Response({
+        "expires_at": expires_at,
+        "reservations": [{"product_id": pk, "quantity": qty} for pk, qty in sorted(quantities.items())],
+    })
+
 # ---------------------------
 # Orders Management
 # ---------------------------
@@ -138,24 +203,53 @@ def remove_from_cart(request, cart_item_id):
 def place_order(request):
     user = request.user
     shipping_address = request.data.get("shipping_address")
-    cart_items = CartItem.objects.filter(user=user)
-    if not cart_items.exists():
-        return Response({"error": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
+    if not shipping_address:
+        return Response({"error": "Shipping address is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        with transaction.atomic():
+            cart_items = CartItem.objects.select_for_update(of=("self",)).filter(user_id=user.pk)
+            # Prices are snapshotted by the database in one query
+            lines = list(cart_items.with_line_totals().values(
+                "product_id", "product__name", "unit_price", "quantity", "line_total"
+            ))
+            if not lines:
+                return Response({"error": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
+
+            checkout_stock(user.pk, {line["product_id"]: line["quantity"] for line in lines})
+            order = Order.objects.create(
+                user_id=user.pk,
+                total_amount=sum(line["line_total"] for line in lines),
+                shipping_address=shipping_address,
+            )
+            OrderLine.objects.bulk_create([
+                OrderLine(
+                    order=order,
+                    product_id=line["product_id"],
+                    product_name=line["product__name"],
+                    unit_price=line["unit_price"],
+                    quantity=line["quantity"],
+                    line_total=line["line_total"],
+                )
+                for line in lines
+            ])
+            cart_items.delete()
+    except InsufficientStock as e:
+        return Response({"error": "Insufficient stock", "products": e.shortages}, status=status.HTTP_409_CONFLICT)
 
-    total_amount = sum([item.product.price * item.quantity for item in cart_items])
-    order = Order.objects.create(user=user, total_amount=total_amount, shipping_address=shipping_address)
-    order.products.set(cart_items)
-    order.save()
-    cart_items.delete()
     serializer = OrderSerializer(order)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def track_orders(request):
-    orders = Order.objects.filter(user=request.user).order_by('-ordered_at')
-    serializer = OrderSerializer(orders, many=True)
-    return Response(serializer.data)
+    orders = (
+        Order.objects.filter(user_id=request.user.pk)
+        .select_related('user')
+        .prefetch_related('lines')
+        .order_by('-ordered_at')
+    )
+    return Response(serialize(OrderSerializer, orders, many=True))
 
 @api_view(["PATCH"])
 @permission_classes([IsAdminUser])
@@ -164,47 +258,122 @@ def update_order_status(request, order_id):
     if status_value not in ["Pending", "Processing", "Shipped", "Delivered"]:
         return Response({"error": "Invalid status"}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        order = Order.objects.get(id=order_id)
+        order = Order.objects.select_related('user').get(id=order_id)
+        changed = order.status != status_value
         order.status = status_value
         order.save()
+        if changed and order.user.email:
+            enqueue_email(
+                f"Your order #{order.id} is {status_value}",
+                f"Hi {order.user.username},\n\nThe status of order #{order.id} is now {status_value}.",
+                [order.user.email],
+            )
         serializer = OrderSerializer(order)
         return Response(serializer.data, status=status.HTTP_200_OK)
     except Order.DoesNotExist:
         return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
 
+# ---------------------------
+# Order Export (admin)
+# ---------------------------
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def export_orders(request):
+    fmt = request.query_params.get("output", "csv")
+    if fmt not in CONTENT_TYPES:
+        return Response({"error": "output must be csv, jsonl or ndjson"}, status=status.HTTP_400_BAD_REQUEST)
+    filterset = OrderExportFilter(request.query_params, queryset=Order.objects.all())
+    if not filterset.is_valid():
+        return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+    rows = order_rows(iter_orders(filterset.qs), fmt)
+    response = StreamingHttpResponse(render_rows(rows, fmt, columns=CSV_COLUMNS), content_type=CONTENT_TYPES[fmt])
+    response["Content-Disposition"] = f'attachment; filename="orders.{fmt}"'
+    return response
+
 # ---------------------------
 # Category List
 # ---------------------------
-class CategoryListAPIView(generics.ListAPIView):
+class CategoryListAPIView(ReplicaReadsMixin, CachedCatalogMixin, generics.ListAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
+    cache_query_params = ('tree',)
+
+    def get_last_modified(self, state):
+        # Categories have no timestamps; every change bumps the catalog version
+        return state["changed_at"]
+
+    def list(self, request, *args, **kwargs):
+        # Whole hierarchy comes from the cached tree (at most one query)
+        tree = CategoryTree.get()
+        if request.query_params.get('tree') in ('1', 'true'):
+            return Response(tree.as_nested())
+        serializer = self.get_serializer(tree.categories(), many=True)
+        return Response(serializer.data)
 
 # ---------------------------
 # Product List with Pagination, Filtering, Sorting
 # ---------------------------
-class ProductListAPIView(generics.ListAPIView):
-    queryset = Product.objects.filter(is_available=True)
+class ProductListAPIView(ReplicaReadsMixin, CachedCatalogMixin, FastSerializationMixin, generics.ListAPIView):
+    queryset = Product.objects.filter(is_available=True).select_related('category')
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]
     pagination_class = StandardResultsSetPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-
-    filterset_fields = {
-        'category': ['exact'],
-        'size': ['exact'],
-        'color': ['exact'],
-        'price': ['gte', 'lte'],
-        'rating': ['gte', 'lte'],
-    }
+    # Search runs last so it can order by relevance when no ordering is requested
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, ProductSearchFilter]
+
+    filterset_class = ProductFilter
     search_fields = ['name', 'description']
-    ordering_fields = ['price', 'rating', 'created_at', 'discount_price']
-    ordering = ['created_at']  # newest first
+    ordering_fields = ['price', 'rating', 'created_at', 'discount_price', 'effective_price', 'discount_percent']
+    ordering = ['-created_at']  # newest first, matches Product.Meta.ordering
+    cache_query_params = (
+        'ordering', 'search', 'page', 'page_size', 'cursor', 'pagination', 'count', 'facets',
+    )
+
+    @property
+    def paginator(self):
+        """
+        Page-number pagination by default; ``?pagination=cursor`` (or any
+        ``?cursor=``) switches to keyset pagination for infinite scroll.
+        """
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or KeysetPagination.cursor_query_param in params:
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def list(self, request, *args, **kwargs):
+        # ?facets=true adds per-facet counts for the current filters to the page
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets') in ('1', 'true'):
+            response.data['facets'] = ProductFacets(self, request).get()
+        return response
+
+# ---------------------------
+# Product Export (admin)
+# ---------------------------
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def export_products(request):
+    # ``output`` rather than ``format``, which DRF reserves for renderer selection
+    fmt = request.query_params.get("output", "csv")
+    if fmt not in CONTENT_TYPES:
+        return Response({"error": "output must be csv, jsonl or ndjson"}, status=status.HTTP_400_BAD_REQUEST)
+    response = StreamingHttpResponse(render_rows(export_rows(), fmt), content_type=CONTENT_TYPES[fmt])
+    response["Content-Disposition"] = f'attachment; filename="products.{fmt}"'
+    return response
 
 # ---------------------------
 # Product Detail
 # ---------------------------
-class ProductDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Product.objects.all()
+class ProductDetailAPIView(CachedCatalogMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Product.objects.select_related('category')
     serializer_class = ProductSerializer
     permission_classes = [IsAdminUser]  # admin only
+    cache_control = {"private": True, "max_age": 0, "must_revalidate": True}
+
+    def get_last_modified(self, state):
+        updated_at = Product.objects.filter(pk=self.kwargs['pk']).values_list('updated_at', flat=True).first()
+        return updated_at.timestamp() if updated_at else state["changed_at"]